@@ -0,0 +1,39 @@
+import unittest
+
+from workers.local_platform_worker.benchmarks.suite import compare
+
+
+class BenchmarkSuiteTests(unittest.TestCase):
+  def test_compare_flags_regressions_beyond_tolerance_and_slack(self):
+    baseline = {
+      "stdio.throughput.32": {"eventsPerSecond": 4000.0},
+      "stdio.latency.8": {"p50Ms": 0.4, "p99Ms": 10.0},
+      "stdio.scan.32": {"wallMs": 800.0},
+    }
+    results = {
+      "stdio.throughput.32": {"eventsPerSecond": 2500.0},
+      "stdio.latency.8": {"events": 800, "p50Ms": 1.2, "p99Ms": 15.0},
+      "stdio.scan.32": {"wallMs": 300.0},
+      "stdio.connectMany.32": {"wallMs": 9000.0},
+    }
+    self.assertEqual(compare(results, baseline), [
+      {"scenario": "stdio.throughput.32", "metric": "eventsPerSecond", "baseline": 4000.0, "current": 2500.0},
+      {"scenario": "stdio.latency.8", "metric": "p99Ms", "baseline": 10.0, "current": 15.0},
+    ])
+    self.assertEqual(compare(results, baseline, tolerance=1.0), [])
+    self.assertEqual(compare(results, baseline, p99=False), [
+      {"scenario": "stdio.throughput.32", "metric": "eventsPerSecond", "baseline": 4000.0, "current": 2500.0},
+    ])
+
+  def test_compare_skips_p99_from_too_few_samples(self):
+    baseline = {"stdio.latency.8": {"p50Ms": 0.5, "p99Ms": 0.9}}
+    results = {"stdio.latency.8": {"events": 160, "p50Ms": 0.6, "p99Ms": 3.2}}
+    self.assertEqual(compare(results, baseline), [])
+    results["stdio.latency.8"]["p50Ms"] = 2.0
+    self.assertEqual(compare(results, baseline), [
+      {"scenario": "stdio.latency.8", "metric": "p50Ms", "baseline": 0.5, "current": 2.0},
+    ])
+
+
+if __name__ == "__main__":
+  unittest.main()
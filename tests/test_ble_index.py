@@ -0,0 +1,30 @@
+import unittest
+
+from workers.local_platform_worker.ft_worker.ble_index import BleAdvertisementIndex
+
+
+class Device:
+  def __init__(self, address):
+    self.address = address
+
+
+class BleAdvertisementIndexTests(unittest.TestCase):
+  def test_smooths_rssi_and_evicts_silent_addresses(self):
+    index = BleAdvertisementIndex(ttl=5.0, smoothing=0.5)
+    index.observe(Device("AA"), "Counter-A", -80, now=0.0)
+    index.observe(Device("AA"), "Counter-A", -40, now=1.0)
+    index.observe(Device("BB"), "Counter-B", None, now=1.0)
+    self.assertEqual(index.get("AA", now=2.0).rssi, -60.0)
+    self.assertEqual(index.get("BB", now=2.0).rssi, -1000.0)
+
+    index.observe(Device("AA"), "Counter-A2", -40, now=5.5)
+    self.assertIsNone(index.get("BB", now=6.5))
+    self.assertEqual([entry.name for entry in index.snapshot(now=6.5)], ["Counter-A2"])
+    self.assertEqual(list(index.entries), ["AA"])
+
+    index.observe(Device("AA"), "Counter-A2", -90, now=20.0)
+    self.assertEqual(index.get("AA", now=20.0).rssi, -90.0)
+
+
+if __name__ == "__main__":
+  unittest.main()
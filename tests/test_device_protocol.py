@@ -3,6 +3,9 @@ import unittest
 
 from workers.local_platform_worker.ft_worker.device_protocol import (
   USB_EVT_COUNTER,
+  USB_RSP_COMMAND,
+  ClickerEventBatch,
+  UsbFrameParser,
   build_usb_frame,
   extract_usb_frames,
   parse_identify_payload,
@@ -22,6 +25,22 @@ class DeviceProtocolTests(unittest.TestCase):
     self.assertEqual(event.total_minus, 7)
     self.assertEqual(event.timestamp_ms, 123456)
 
+  def test_event_batch_parses_payloads_into_columns_and_round_trips(self):
+    payloads = [
+      struct.pack("<ibiiI", -3, -1, 4, 7, 123456),
+      struct.pack("<ibiiI", -2, 1, 5, 7, 4294967295),
+    ]
+
+    batch = ClickerEventBatch.from_payloads(payloads)
+
+    self.assertEqual(len(batch), 2)
+    self.assertEqual(list(batch.total_plus), [4, 5])
+    self.assertEqual(batch.event(1), parse_notification_data(payloads[1]))
+    self.assertEqual(list(batch.rows())[0], (-3, -1, 4, 7, 123456))
+    self.assertEqual(batch.to_bytes(), b"".join(payloads))
+    with self.assertRaises(ValueError):
+      batch.extend(payloads[0][:-1])
+
   def test_extracts_fragmented_usb_frame_and_keeps_partial_data(self):
     frame = build_usb_frame(USB_EVT_COUNTER, b"counter-event")
     buffer = bytearray(b"noise" + frame[:8])
@@ -39,6 +58,70 @@ class DeviceProtocolTests(unittest.TestCase):
     self.assertEqual(extract_usb_frames(frame), [])
     self.assertEqual(frame, bytearray())
 
+  def test_incremental_parser_handles_fragments_and_split_magic(self):
+    frame = build_usb_frame(USB_EVT_COUNTER, b"counter-event")
+    parser = UsbFrameParser(capacity=16)
+
+    self.assertEqual(parser.feed(b"noise" + frame[:2]), [])
+    self.assertEqual(parser.feed(frame[2:9]), [])
+    frames = parser.feed(frame[9:] + frame)
+    self.assertEqual(
+      [(frame_type, bytes(payload)) for frame_type, payload in frames],
+      [(USB_EVT_COUNTER, b"counter-event")] * 2,
+    )
+    self.assertEqual(parser.pending, 0)
+    self.assertEqual(parser.snapshot(), {
+      "frames": 2,
+      "resyncs": 1,
+      "discardedBytes": 5,
+      "checksumFailures": 0,
+    })
+
+  def test_incremental_parser_recovers_frame_after_bad_checksum(self):
+    corrupt = bytearray(build_usb_frame(USB_EVT_COUNTER, bytes(17)))
+    corrupt[-1] ^= 0xFF
+    valid = build_usb_frame(USB_RSP_COMMAND, b"\x02\x00")
+    parser = UsbFrameParser()
+
+    frames = parser.feed(bytes(corrupt) + valid)
+    self.assertEqual([(frame_type, bytes(payload)) for frame_type, payload in frames], [
+      (USB_RSP_COMMAND, b"\x02\x00"),
+    ])
+    self.assertEqual(parser.checksum_failures, 1)
+    self.assertEqual(parser.pending, 0)
+
+  def test_incremental_parser_checks_every_payload_length(self):
+    parser = UsbFrameParser()
+    for length in range(256):
+      payload = bytes((index * 37 + length) & 0xFF for index in range(length))
+      corrupt = bytearray(build_usb_frame(USB_RSP_COMMAND, payload))
+      corrupt[-1] ^= 0x01
+      frames = parser.feed(bytes(corrupt) + build_usb_frame(USB_RSP_COMMAND, payload))
+      self.assertEqual([bytes(frame) for _frame_type, frame in frames], [payload])
+    self.assertEqual(parser.checksum_failures, 256)
+
+  def test_incremental_parser_handles_one_frame_reads_between_noise(self):
+    frames = [build_usb_frame(USB_EVT_COUNTER, struct.pack("<ibiiI", index, 1, index, 0, index)) for index in range(3)]
+    parser = UsbFrameParser()
+
+    payloads = []
+    for read in (frames[0], b"noise", frames[1], b"junkFT", frames[2][2:]):
+      payloads.extend(bytes(payload) for _frame_type, payload in parser.feed(read))
+    self.assertEqual(payloads, [frame[6:-1] for frame in frames])
+    self.assertEqual(parser.pending, 0)
+    self.assertEqual(parser.snapshot(), {
+      "frames": 3,
+      "resyncs": 1,
+      "discardedBytes": 9,
+      "checksumFailures": 0,
+    })
+
+  def test_incremental_parser_payload_views_survive_buffer_growth(self):
+    parser = UsbFrameParser(capacity=8)
+    frames = parser.feed(build_usb_frame(USB_EVT_COUNTER, b"first") + b"FTE1")
+    parser.feed(b"x" * 64)
+    self.assertEqual(bytes(frames[0][1]), b"first")
+
   def test_parses_stable_usb_identity(self):
     name = "Counter-A1B2".encode("utf-8")
     payload = bytes.fromhex("AABBCCDDEEFF") + bytes((len(name),)) + name
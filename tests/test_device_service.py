@@ -2,6 +2,7 @@ import asyncio
 import struct
 import time
 import unittest
+from unittest.mock import patch
 
 from workers.local_platform_worker.ft_worker.device_protocol import (
   USB_CMD_IDENTIFY,
@@ -12,11 +13,24 @@ from workers.local_platform_worker.ft_worker.device_protocol import (
   USB_RSP_IDENTIFY,
   build_usb_frame,
 )
+from workers.local_platform_worker.ft_worker import devices as devices_module
 from workers.local_platform_worker.ft_worker.devices import (
   CHARACTERISTIC_UUID,
   SERVICE_UUID,
+  DeviceError,
   DeviceService,
+  RecentEventIds,
 )
+from workers.local_platform_worker.ft_worker.serial_io import SERIAL_READ_BULK, _read_serial_chunk
+
+
+async def wait_until(predicate, timeout=2.0):
+  deadline = asyncio.get_running_loop().time() + timeout
+  while asyncio.get_running_loop().time() < deadline:
+    if predicate():
+      return True
+    await asyncio.sleep(0.01)
+  return predicate()
 
 
 class FakeBleDevice:
@@ -105,6 +119,10 @@ class FakeSerial:
   def flush(self):
     return None
 
+  @property
+  def in_waiting(self):
+    return len(self.buffer)
+
   def read(self, size):
     if not self.buffer:
       time.sleep(0.002)
@@ -148,6 +166,90 @@ class DeviceServiceTests(unittest.TestCase):
     self.assertEqual(SERVICE_UUID, "015018d0-6951-4a81-de4f-453d8dae9128")
     self.assertEqual(CHARACTERISTIC_UUID, "025018d0-6951-4a81-de4f-453d8dae9128")
 
+  def test_recent_event_ids_drop_repeats_inside_the_window(self):
+    recent = RecentEventIds(size=2)
+    self.assertFalse(recent.seen("a"))
+    self.assertFalse(recent.seen("b"))
+    self.assertTrue(recent.seen("a"))
+    self.assertFalse(recent.seen("c"))
+    self.assertFalse(recent.seen("a"))
+    self.assertEqual(recent.duplicates, 1)
+    self.assertEqual(recent.ids, {"c", "a"})
+
+  def test_latency_read_returns_buffered_frame_without_waiting_for_full_chunk(self):
+    serial_handle = FakeSerial()
+    serial_handle.inject_counter(struct.pack("<ibiiI", 1, 1, 1, 0, 10))
+    frame_len = len(serial_handle.buffer)
+    serial_handle.buffer.extend(b"FT")
+
+    self.assertEqual(len(_read_serial_chunk(serial_handle)), frame_len + 2)
+    serial_handle.inject_counter(struct.pack("<ibiiI", 2, 1, 2, 0, 20))
+    self.assertEqual(len(_read_serial_chunk(serial_handle, SERIAL_READ_BULK)), frame_len)
+
+  def test_connect_many_limits_orders_and_retries_per_transport(self):
+    async def scenario():
+      async def emit(*_event):
+        return None
+
+      service = DeviceService(FakeBleAdapter(), emit)
+      service.connect_limits = {"BLE": 2, "USB": 3}
+      active = {"BLE": 0, "USB": 0}
+      peak = {"BLE": 0, "USB": 0}
+      started = []
+      failures = {"ble-flaky": 1, "ble-taken": 3}
+
+      async def connect(connection_id, device_id):
+        transport = "USB" if device_id.startswith("usb:") else "BLE"
+        started.append(connection_id)
+        active[transport] += 1
+        peak[transport] = max(peak[transport], active[transport])
+        try:
+          await asyncio.sleep(0.01)
+          if failures.get(device_id):
+            failures[device_id] -= 1
+            code = "DEVICE_ALREADY_CONNECTED" if device_id == "ble-taken" else "BLE_CONNECTION_TIMEOUT"
+            raise DeviceError(code, "failed")
+          return {"connectionId": connection_id, "deviceId": device_id}
+        finally:
+          active[transport] -= 1
+
+      service.connect = connect
+      connections = [
+        {"connectionId": f"judge-{index}-secondary", "deviceId": f"ble-{index}"} for index in range(4)
+      ] + [
+        {"connectionId": "judge-flaky-primary", "deviceId": "ble-flaky", "priority": 1},
+        {"connectionId": "judge-taken-primary", "deviceId": "ble-taken", "priority": 1},
+      ] + [
+        {"connectionId": f"usb-{index}", "deviceId": f"usb:{index}"} for index in range(6)
+      ]
+      progress = []
+
+      async def on_progress(result):
+        progress.append(result)
+
+      with patch.object(devices_module, "CONNECT_RETRY_DELAY", 0.0):
+        connected = await service.connect_many(connections, retries=2, on_progress=on_progress)
+
+      results = connected["connections"]
+      self.assertEqual([result["connectionId"] for result in results], [
+        value["connectionId"] for value in connections
+      ])
+      self.assertEqual(peak, {"BLE": 2, "USB": 3})
+      self.assertEqual(started[:2], ["judge-flaky-primary", "judge-taken-primary"])
+      self.assertEqual(results[4]["status"], "connected")
+      self.assertEqual(results[4]["attempts"], 2)
+      self.assertEqual(results[5]["error"], "DEVICE_ALREADY_CONNECTED")
+      self.assertEqual(results[5]["attempts"], 1)
+      self.assertEqual(len(progress), len(connections))
+      self.assertEqual([result["completed"] for result in progress], list(range(1, len(connections) + 1)))
+      self.assertEqual(progress[-1]["total"], len(connections))
+
+      limited = await service.connect_many(connections[:4], limits={"BLE": 1})
+      self.assertNotIn("attempts", limited["connections"][0])
+      self.assertEqual(peak["BLE"], 2)
+
+    asyncio.run(scenario())
+
   def test_ble_scan_session_commands_and_deterministic_events(self):
     async def scenario():
       emitted = []
@@ -168,13 +270,17 @@ class DeviceServiceTests(unittest.TestCase):
       payload = struct.pack("<ibiiI", 2, 1, 3, 1, 1234)
       adapter.client.notify(None, payload)
       adapter.client.notify(None, payload)
+      adapter.client.notify(None, struct.pack("<ibiiI", 3, 1, 4, 1, 1300))
       await asyncio.sleep(0)
       await asyncio.sleep(0)
 
       counter_events = [event for event in emitted if event[0] == "device.counter"]
       self.assertEqual(len(counter_events), 2)
       self.assertEqual(counter_events[0][1]["totalPlus"], 3)
-      self.assertEqual(counter_events[0][2], counter_events[1][2])
+      self.assertEqual(len(counter_events[0][2]), 32)
+      self.assertEqual(counter_events[0][2][6:], "d2040000030000000100000001")
+      self.assertNotEqual(counter_events[0][2], counter_events[1][2])
+      self.assertEqual(service.metrics()["judge-1-primary"]["duplicates"], 1)
 
       reset = await service.reset_all()
       self.assertEqual(reset["connections"][0]["status"], "ok")
@@ -215,6 +321,12 @@ class DeviceServiceTests(unittest.TestCase):
       counter = next(event for event in emitted if event[0] == "device.counter")
       self.assertEqual(counter[1]["transport"], "USB")
       self.assertEqual(counter[1]["currentTotal"], -1)
+      await asyncio.sleep(0)
+      metrics = service.metrics()["judge-2-primary"]
+      self.assertEqual(metrics["receiveLatency"]["count"], 1)
+      self.assertEqual(metrics["counters"]["total"], 1)
+      self.assertEqual(metrics["frames"]["checksumFailures"], 0)
+      self.assertEqual(metrics["reconnectAttempts"], 0)
 
       await service.reset("judge-2-primary")
       await service.rename("judge-2-primary", "Counter-USB")
@@ -227,6 +339,311 @@ class DeviceServiceTests(unittest.TestCase):
 
     asyncio.run(scenario())
 
+  def test_usb_commands_keep_buffered_counter_events(self):
+    async def scenario():
+      emitted = []
+
+      async def emit(*event):
+        emitted.append(event)
+
+      adapter = FakeUsbAdapter()
+      service = DeviceService(adapter, emit)
+      await service.scan()
+      await service.connect("judge-3-primary", "usb:AABBCCDDEEFF")
+      active_serial = adapter.serial_handles[-1]
+      active_serial.inject_counter(struct.pack("<ibiiI", 1, 1, 1, 0, 100))
+      active_serial.inject_counter(struct.pack("<ibiiI", 2, 1, 2, 0, 200))
+
+      await service.rename("judge-3-primary", "Counter-Keep")
+      for _ in range(20):
+        if len([event for event in emitted if event[0] == "device.counter"]) == 2:
+          break
+        await asyncio.sleep(0.01)
+
+      counters = [event[1] for event in emitted if event[0] == "device.counter"]
+      self.assertEqual([value["deviceTimestampMs"] for value in counters], [100, 200])
+      self.assertFalse(service.sessions["judge-3-primary"].pending_responses[
+        (USB_RSP_COMMAND, USB_CMD_RENAME)
+      ])
+      await service.close()
+
+    asyncio.run(scenario())
+
+  def test_usb_scan_identifies_ports_in_parallel_within_deadline(self):
+    class NumberedPort(FakePort):
+      def __init__(self, index):
+        self.device = f"COM{index}"
+
+    class SlowSerial(FakeSerial):
+      def __init__(self, index, delay):
+        super().__init__()
+        self.index = index
+        self.delay = delay
+
+      def write(self, frame):
+        time.sleep(self.delay)
+        name = f"Counter-{self.index}".encode("utf-8")
+        identity = bytes((0xAA, 0, 0, 0, 0, self.index)) + bytes((len(name),)) + name
+        self.buffer.extend(build_usb_frame(USB_RSP_IDENTIFY, identity))
+
+    class SlowUsbAdapter(FakeUsbAdapter):
+      def list_serial_ports(self):
+        return [NumberedPort(index) for index in range(1, 11)]
+
+      def open_serial(self, port_path):
+        index = int(port_path.removeprefix("COM"))
+        return SlowSerial(index, 1.0 if index == 10 else 0.2)
+
+    async def scenario():
+      async def emit(*_event):
+        return None
+
+      service = DeviceService(SlowUsbAdapter(), emit)
+      service.usb_scan_deadline = 0.6
+      started = time.perf_counter()
+      scanned = await service.scan()
+      elapsed = time.perf_counter() - started
+      device_ids = [device["deviceId"] for device in scanned["devices"]]
+      self.assertLess(elapsed, 0.9)
+      self.assertEqual(device_ids[:9], [f"usb:AA00000000{index:02X}" for index in range(1, 10)])
+      self.assertEqual(device_ids[9], "usbport:COM10")
+
+    asyncio.run(scenario())
+
+  def test_usb_scan_reuses_cached_identities_until_mismatch(self):
+    class SerialPort(FakePort):
+      serial_number = "AABBCCDDEEFF"
+      location = "1-1:1.0"
+      hwid = "USB VID:PID=303A:1001 SER=AABBCCDDEEFF"
+
+    class CachedPortAdapter(FakeUsbAdapter):
+      def list_serial_ports(self):
+        return [SerialPort()]
+
+    async def scenario():
+      async def emit(*_event):
+        return None
+
+      adapter = CachedPortAdapter()
+      service = DeviceService(adapter, emit)
+      first = await service.scan()
+      self.assertEqual(len(adapter.serial_handles), 1)
+      second = await service.scan()
+      self.assertEqual(len(adapter.serial_handles), 1)
+      self.assertEqual(second["devices"], first["devices"])
+      entry = next(iter(service.identity_cache.entries.values()))
+      entry["name"] = "Stale"
+      flushed = await service.scan(flush=True)
+      self.assertEqual(len(adapter.serial_handles), 2)
+      self.assertEqual(flushed["devices"], first["devices"])
+      self.assertEqual(next(iter(service.identity_cache.entries.values()))["name"], first["devices"][0]["name"])
+
+      service.usb_devices.clear()
+      self.assertEqual(await service._resolve_usb_path("usb:AABBCCDDEEFF"), "COM9")
+
+      service.identity_cache.entries[next(iter(service.identity_cache.entries))]["deviceId"] = "usb:000000000001"
+      with self.assertRaises(Exception):
+        await service.connect("judge-1", "usb:000000000001")
+      self.assertEqual(service.identity_cache.entries, {})
+      await service.scan()
+      self.assertEqual(len(adapter.serial_handles), 4)
+      await service.close()
+
+    asyncio.run(scenario())
+
+  def test_usb_resolution_probes_only_unowned_ports_without_ble_scan(self):
+    class NumberedPort(FakePort):
+      def __init__(self, path):
+        self.device = path
+
+    class IndexedSerial(FakeSerial):
+      def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+      def write(self, frame):
+        self.writes.append(bytes(frame))
+        if frame[4] == USB_CMD_IDENTIFY:
+          name = f"Counter-{self.index}".encode("utf-8")
+          identity = bytes((0xAA, 0, 0, 0, 0, self.index)) + bytes((len(name),)) + name
+          self.buffer.extend(build_usb_frame(USB_RSP_IDENTIFY, identity))
+
+    class MovingUsbAdapter(FakeUsbAdapter):
+      ble_available = True
+
+      def __init__(self):
+        super().__init__()
+        self.ble_scans = 0
+        self.wiring = {"COM1": 1, "COM2": 2}
+        self.opened = []
+
+      async def scan_ble(self, timeout):
+        self.ble_scans += 1
+        return []
+
+      def list_serial_ports(self):
+        return [NumberedPort(path) for path in self.wiring]
+
+      def open_serial(self, port_path):
+        if port_path not in self.wiring:
+          raise OSError("missing port")
+        self.opened.append(port_path)
+        return IndexedSerial(self.wiring[port_path])
+
+      def map_ble_error(self, error):
+        return "BLE_UNAVAILABLE"
+
+    async def scenario():
+      async def emit(*_event):
+        return None
+
+      adapter = MovingUsbAdapter()
+      service = DeviceService(adapter, emit)
+      await service.scan()
+      await service.connect("judge-1", "usb:AA0000000001")
+      adapter.wiring = {"COM1": 1, "COM3": 3, "COM5": 2}
+      adapter.opened.clear()
+
+      self.assertEqual(await service._resolve_usb_path("usb:AA0000000002"), "COM5")
+      self.assertEqual(adapter.ble_scans, 1)
+      self.assertNotIn("COM1", adapter.opened)
+      self.assertEqual(service.usb_devices["usb:AA0000000001"], "COM1")
+      self.assertIsNone(await service._resolve_usb_path("usb:AA0000000009"))
+      await service.close()
+
+    asyncio.run(scenario())
+
+  def test_port_watcher_reports_changes_and_wakes_reconnects(self):
+    class NumberedPort(FakePort):
+      def __init__(self, path):
+        self.device = path
+
+    class PluggableSerial(FakeSerial):
+      def __init__(self, adapter, path):
+        super().__init__()
+        self.adapter = adapter
+        self.path = path
+
+      def write(self, frame):
+        index = self.adapter.wiring[self.path]
+        name = f"Counter-{index}".encode("utf-8")
+        identity = bytes((0xAA, 0, 0, 0, 0, index)) + bytes((len(name),)) + name
+        self.buffer.extend(build_usb_frame(USB_RSP_IDENTIFY, identity))
+
+      @property
+      def in_waiting(self):
+        if self.path not in self.adapter.wiring:
+          raise OSError("unplugged")
+        return len(self.buffer)
+
+    class PluggableUsbAdapter(FakeUsbAdapter):
+      def __init__(self):
+        super().__init__()
+        self.wiring = {"COM1": 1, "COM2": 2}
+        self.opened = []
+
+      def list_serial_ports(self):
+        return [NumberedPort(path) for path in list(self.wiring)]
+
+      def open_serial(self, port_path):
+        if port_path not in self.wiring:
+          raise OSError("missing port")
+        self.opened.append(port_path)
+        return PluggableSerial(self, port_path)
+
+    async def scenario():
+      events = []
+
+      async def emit(event, payload, *_args):
+        events.append((event, payload))
+
+      adapter = PluggableUsbAdapter()
+      service = DeviceService(adapter, emit)
+      await service.connect("judge-1", "usb:AA0000000001")
+      adapter.opened.clear()
+      self.assertEqual(
+        await service.watch(0.05, {"usb:AA0000000002": "Judge B"}), {"watching": True, "ble": False}
+      )
+      self.assertTrue(await wait_until(lambda: sum(event == "device.discovered" for event, _ in events) == 2))
+      discovered = {payload["deviceId"]: payload for event, payload in events if event == "device.discovered"}
+      self.assertEqual(discovered["usb:AA0000000002"]["remark"], "Judge B")
+      self.assertEqual(adapter.opened, ["COM2"])
+
+      del adapter.wiring["COM1"]
+      self.assertTrue(await wait_until(lambda: ("device.lost", {
+        "deviceId": "usb:AA0000000001", "address": "usb:AA0000000001", "transport": "USB",
+      }) in events))
+      self.assertTrue(await wait_until(lambda: service.sessions["judge-1"].reconnecting))
+      adapter.opened.clear()
+      adapter.wiring["COM7"] = 1
+      started = time.perf_counter()
+      self.assertTrue(await wait_until(lambda: service.sessions["judge-1"].serial is not None))
+      self.assertLess(time.perf_counter() - started, 2.0)
+      self.assertEqual(service.sessions["judge-1"].port_path, "COM7")
+      self.assertNotIn("COM2", adapter.opened)
+      await service.close()
+      self.assertIsNone(service.watch_task)
+
+    asyncio.run(scenario())
+
+  def test_passive_ble_index_serves_scans_and_connects(self):
+    class WatchedBleAdapter(FakeBleAdapter):
+      def __init__(self):
+        super().__init__()
+        self.active_scans = 0
+        self.lookups = 0
+        self.callback = None
+        self.stopped = False
+
+      async def scan_ble(self, timeout):
+        self.active_scans += 1
+        return await super().scan_ble(timeout)
+
+      async def find_ble(self, device_id, timeout):
+        self.lookups += 1
+        return await super().find_ble(device_id, timeout)
+
+      async def watch_ble(self, callback):
+        self.callback = callback
+        adapter = self
+
+        class Watch:
+          async def stop(self):
+            adapter.stopped = True
+
+        return Watch()
+
+    class OtherAdvertisement:
+      local_name = "Speaker"
+      service_uuids = []
+      rssi = -30
+
+    async def scenario():
+      async def emit(*_event):
+        return None
+
+      adapter = WatchedBleAdapter()
+      service = DeviceService(adapter, emit)
+      self.assertEqual(await service.watch(0, ble=True), {"watching": False, "ble": True})
+      adapter.callback(adapter.device, FakeAdvertisement())
+      adapter.callback(FakeBleDevice(), OtherAdvertisement())
+      scanned = await service.scan()
+      self.assertEqual([device["deviceId"] for device in scanned["devices"]], ["ble-device-1"])
+      self.assertEqual(scanned["devices"][0]["rssi"], -42)
+      self.assertEqual(adapter.active_scans, 0)
+
+      service.ble_devices.clear()
+      await service.connect("judge-1", "ble-device-1")
+      self.assertEqual(adapter.lookups, 0)
+      await service.watch(0)
+      self.assertTrue(adapter.stopped)
+      self.assertIsNone(service.ble_index)
+      await service.scan()
+      self.assertEqual(adapter.active_scans, 1)
+      await service.close()
+
+    asyncio.run(scenario())
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import unittest
+
+from workers.local_platform_worker.ft_worker.handoff import LoopHandoff
+
+
+class LoopHandoffTests(unittest.TestCase):
+  def test_thread_pushes_arrive_in_order_with_few_wakeups(self):
+    async def scenario():
+      loop = asyncio.get_running_loop()
+      received = []
+      done = loop.create_future()
+
+      async def consume(index, received_at, dispatched_at):
+        self.assertGreaterEqual(dispatched_at, received_at)
+        received.append(index)
+        if len(received) == 5000:
+          done.set_result(None)
+
+      handoff = LoopHandoff(loop, consume)
+      producer = threading.Thread(target=lambda: [handoff.push(index, 0.0) for index in range(5000)])
+      producer.start()
+      await asyncio.wait_for(done, 5.0)
+      producer.join()
+      self.assertEqual(received, list(range(5000)))
+      snapshot = handoff.snapshot()
+      self.assertEqual(snapshot["items"], 5000)
+      self.assertEqual(snapshot["pending"], 0)
+      self.assertLess(snapshot["wakeups"], 5000)
+
+    asyncio.run(scenario())
+
+  def test_drain_yields_to_other_tasks_during_a_flood(self):
+    async def scenario():
+      loop = asyncio.get_running_loop()
+      order = []
+
+      async def writer():
+        order.append("writer")
+
+      async def consume(index, _received_at, _dispatched_at):
+        if index == 0:
+          loop.create_task(writer())
+        order.append(index)
+
+      handoff = LoopHandoff(loop, consume)
+      for index in range(1000):
+        handoff.push(index, 0.0)
+      await asyncio.sleep(0.05)
+      self.assertEqual(len(order), 1001)
+      self.assertLess(order.index("writer"), 300)
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from workers.local_platform_worker.ft_worker.identity_cache import (
+  UsbIdentityCache,
+  port_hardware_key,
+)
+
+
+class HardwarePort:
+  def __init__(self, device="COM7", serial_number="A1B2", location="1-1:1.0"):
+    self.device = device
+    self.vid = 0x303A
+    self.pid = 0x1001
+    self.serial_number = serial_number
+    self.location = location
+    self.hwid = f"USB VID:PID=303A:1001 SER={serial_number}"
+
+
+class UsbIdentityCacheTests(unittest.TestCase):
+  def test_persists_identities_between_runs_and_invalidates_changed_ports(self):
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "worker", "usb-identities.json")
+      cache = UsbIdentityCache(path)
+      cache.store(HardwarePort(), "usb:AABBCCDDEEFF", "Counter-A")
+
+      reloaded = UsbIdentityCache(path)
+      self.assertEqual(reloaded.lookup(HardwarePort(device="COM9")), ("usb:AABBCCDDEEFF", "Counter-A"))
+      self.assertIsNone(reloaded.lookup(HardwarePort(serial_number="FFFF")))
+      self.assertEqual(reloaded.find_path("usb:AABBCCDDEEFF", [HardwarePort(device="COM9")]), "COM9")
+
+      reloaded.rename("usb:AABBCCDDEEFF", "Counter-B")
+      self.assertEqual(UsbIdentityCache(path).lookup(HardwarePort())[1], "Counter-B")
+      reloaded.invalidate("usb:AABBCCDDEEFF")
+      self.assertIsNone(UsbIdentityCache(path).lookup(HardwarePort()))
+
+  def test_saves_from_the_event_loop_run_in_the_executor(self):
+    async def scenario(path):
+      cache = UsbIdentityCache(path)
+      cache.store(HardwarePort(), "usb:AABBCCDDEEFF", "Counter-A")
+      cache.rename("usb:AABBCCDDEEFF", "Counter-B")
+      self.assertIsNotNone(cache.pending_save)
+      await cache.pending_save
+      self.assertEqual(cache.saved_revision, cache.revision)
+
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "usb-identities.json")
+      asyncio.run(scenario(path))
+      self.assertEqual(UsbIdentityCache(path).lookup(HardwarePort()), ("usb:AABBCCDDEEFF", "Counter-B"))
+      self.assertFalse(os.path.exists(f"{path}.tmp"))
+
+  def test_ignores_ports_without_hardware_attributes_and_unknown_files(self):
+    class BarePort:
+      device = "COM3"
+      vid = 0x303A
+
+    self.assertIsNone(port_hardware_key(BarePort()))
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "usb-identities.json")
+      with open(path, "w", encoding="utf-8") as target:
+        json.dump({"version": 99, "entries": {"x": {"deviceId": "usb:1", "name": "n"}}}, target)
+      cache = UsbIdentityCache(path)
+      self.assertEqual(cache.entries, {})
+      cache.store(BarePort(), "usb:AABBCCDDEEFF", "Counter-A")
+      self.assertEqual(cache.entries, {})
+
+
+if __name__ == "__main__":
+  unittest.main()
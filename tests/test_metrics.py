@@ -0,0 +1,54 @@
+import asyncio
+import time
+import unittest
+
+from workers.local_platform_worker.ft_worker.metrics import (
+  LatencyHistogram,
+  LoopLagMonitor,
+  RateMeter,
+)
+
+
+class MetricsTests(unittest.TestCase):
+  def test_histogram_quantiles_are_capped_at_observed_max(self):
+    histogram = LatencyHistogram()
+    for value in (0.3, 0.4, 0.6, 7.0):
+      histogram.record(value)
+    snapshot = histogram.snapshot()
+    self.assertEqual(snapshot["count"], 4)
+    self.assertEqual(snapshot["p50Ms"], 0.5)
+    self.assertEqual(snapshot["p99Ms"], 7.0)
+    self.assertEqual(snapshot["maxMs"], 7.0)
+
+  def test_rate_meter_reports_completed_window_and_decays_when_idle(self):
+    meter = RateMeter(window=1.0)
+    for index in range(50):
+      meter.mark(10.0 + index * 0.02)
+    meter.mark(11.0)
+    self.assertAlmostEqual(meter.per_second(11.5), 50.0)
+    self.assertAlmostEqual(meter.per_second(15.0), 0.25)
+    self.assertEqual(meter.snapshot(11.5), {"total": 51, "perSecond": 50.0})
+    self.assertEqual(RateMeter().per_second(1.0), 0.0)
+
+    warming = RateMeter(window=1.0)
+    for index in range(10):
+      warming.mark(index * 0.05)
+    self.assertAlmostEqual(warming.per_second(0.5), 20.0)
+
+  def test_loop_lag_monitor_records_blocked_loop(self):
+    async def scenario():
+      monitor = LoopLagMonitor(interval=0.01)
+      monitor.start()
+      await asyncio.sleep(0)
+      time.sleep(0.05)
+      await asyncio.sleep(0.02)
+      monitor.stop()
+      return monitor.snapshot()
+
+    snapshot = asyncio.run(scenario())
+    self.assertGreaterEqual(snapshot["count"], 1)
+    self.assertGreaterEqual(snapshot["maxMs"], 30.0)
+
+
+if __name__ == "__main__":
+  unittest.main()
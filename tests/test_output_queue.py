@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+
+from workers.local_platform_worker.ft_worker.output import OutputQueue
+from workers.local_platform_worker.ft_worker.platform.contract import PlatformServices
+from workers.local_platform_worker.ft_worker.protocol import (
+  event_message,
+  success_response,
+)
+from workers.local_platform_worker.ft_worker.runtime import WorkerRuntime
+
+
+def status(connection_id, value):
+  return event_message("device.status", {"connectionId": connection_id, "status": value})
+
+
+def drain(queue):
+  messages = []
+  while True:
+    try:
+      messages.append(queue.get_nowait())
+    except asyncio.QueueEmpty:
+      return messages
+
+
+class OutputQueueTests(unittest.TestCase):
+  def test_counters_and_responses_overtake_status_and_other_events(self):
+    queue = OutputQueue()
+    queue.put_nowait(event_message("system.metrics", {"methods": {}}))
+    queue.put_nowait(status("judge-1", "connecting"))
+    queue.put_nowait(event_message("device.counter", {"totalPlus": 1}, "event-1"))
+    queue.put_nowait(event_message("device.discovered", {"deviceId": "device-1", "scanId": "request-1"}))
+    queue.put_nowait(success_response("request-1", {}))
+
+    self.assertEqual([message.get("event", message.get("id")) for message in drain(queue)], [
+      "device.counter",
+      "device.discovered",
+      "request-1",
+      "device.status",
+      "system.metrics",
+    ])
+
+  def test_status_keeps_latest_value_per_connection(self):
+    queue = OutputQueue()
+    for value in ("connecting", "error", "connecting", "error"):
+      queue.put_nowait(status("judge-1", value))
+    queue.put_nowait(status("judge-2", "connected"))
+
+    self.assertEqual([message["payload"]["status"] for message in drain(queue)], [
+      "error",
+      "connected",
+    ])
+    self.assertEqual(queue.stats()["coalescedStatus"], 3)
+
+  def test_events_beyond_capacity_are_dropped_and_counted(self):
+    queue = OutputQueue(event_capacity=2)
+    for index in range(4):
+      queue.put_nowait(event_message("system.metrics", {"index": index}))
+    queue.put_nowait(success_response("request-1", {}))
+
+    self.assertEqual(len(drain(queue)), 3)
+    self.assertEqual(queue.stats(), {
+      "depth": 0,
+      "highWater": 3,
+      "eventCapacity": 2,
+      "coalescedStatus": 0,
+      "dropped": {"system.metrics": 2},
+    })
+    queue.put_nowait(event_message("system.metrics", {"index": 5}))
+    self.assertEqual(len(queue), 1)
+
+  def test_full_queue_evicts_normal_events_and_never_drops_counters_or_status(self):
+    queue = OutputQueue(event_capacity=2)
+    queue.put_nowait(event_message("system.metrics", {"index": 0}))
+    queue.put_nowait(event_message("system.metrics", {"index": 1}))
+    queue.put_nowait(event_message("device.counter", {"totalPlus": 1}, "event-1"))
+    queue.put_nowait(event_message("device.discovered", {"deviceId": "device-1"}))
+    queue.put_nowait(event_message("device.counter", {"totalPlus": 2}, "event-2"))
+    queue.put_nowait(status("judge-1", "disconnected"))
+    queue.put_nowait(event_message("device.connectProgress", {"connectionId": "judge-2"}))
+
+    self.assertEqual([message["event"] for message in drain(queue)], [
+      "device.counter", "device.discovered", "device.counter", "device.status",
+    ])
+    self.assertEqual(queue.stats()["dropped"], {"system.metrics": 2, "device.connectProgress": 1})
+
+  def test_shutdown_marker_waits_for_every_lane(self):
+    queue = OutputQueue()
+    queue.put_nowait(status("judge-1", "disconnected"))
+    queue.put_nowait(event_message("system.metrics", {"methods": {}}))
+    queue.put_nowait(None)
+    queue.put_nowait(success_response("request-1", {}))
+
+    self.assertEqual([message and message.get("event", message.get("id")) for message in drain(queue)], [
+      "request-1", "device.status", "system.metrics", None,
+    ])
+
+  def test_get_waits_for_next_message(self):
+    async def scenario():
+      queue = OutputQueue()
+      waiter = asyncio.create_task(queue.get())
+      await asyncio.sleep(0)
+      await queue.put(success_response("request-1", {"echo": 1}))
+      self.assertEqual((await waiter)["id"], "request-1")
+
+    asyncio.run(scenario())
+
+  def test_metrics_report_output_queue(self):
+    runtime = WorkerRuntime(PlatformServices("linux", None, False, False))
+    runtime.output_queue = OutputQueue(event_capacity=8)
+    runtime.output_queue.put_nowait(status("judge-1", "connected"))
+    request = '{"protocolVersion":1,"id":"request-1","method":"system.metrics","params":{}}'
+    response = asyncio.run(runtime.handle_line(request))
+    self.assertEqual(response["result"]["outputQueue"]["depth"], 1)
+    self.assertEqual(response["result"]["outputQueue"]["eventCapacity"], 8)
+
+
+if __name__ == "__main__":
+  unittest.main()
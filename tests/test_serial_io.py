@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+import unittest
+
+from workers.local_platform_worker.ft_worker.serial_io import SERIAL_READ_BULK, SerialIoEngine
+
+
+class PipeSerial:
+  def __init__(self):
+    self.read_fd, self.write_fd = os.pipe()
+    self.fail = False
+    self.waiting = 0
+    self.requested = []
+
+  def fileno(self):
+    return self.read_fd
+
+  @property
+  def in_waiting(self):
+    return self.waiting
+
+  def read(self, size):
+    if self.fail:
+      raise OSError("device unplugged")
+    self.requested.append(size)
+    chunk = os.read(self.read_fd, size)
+    self.waiting -= len(chunk)
+    return chunk
+
+  def feed(self, data):
+    self.waiting += len(data)
+    os.write(self.write_fd, data)
+
+  def close(self):
+    os.close(self.read_fd)
+    os.close(self.write_fd)
+
+
+def wait_for(predicate, timeout=1.0):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    if predicate():
+      return True
+    time.sleep(0.002)
+  return predicate()
+
+
+@unittest.skipIf(os.name == "nt", "selector engine requires selectable pipes")
+class SerialIoEngineTests(unittest.TestCase):
+  def setUp(self):
+    self.engine = SerialIoEngine()
+    self.ports = [PipeSerial() for _ in range(8)]
+    self.received = {index: bytearray() for index in range(len(self.ports))}
+    self.errors = []
+
+  def tearDown(self):
+    self.engine.close()
+    for port in self.ports:
+      port.close()
+
+  def register(self, index, **options):
+    self.engine.register(
+      self.ports[index],
+      lambda chunk, _received_at: self.received[index].extend(chunk),
+      self.errors.append,
+      **options,
+    )
+
+  def test_reads_many_ports_from_one_thread(self):
+    threads_before = threading.active_count()
+    for index in range(len(self.ports)):
+      self.register(index)
+    self.assertEqual(self.engine.selected_count, len(self.ports))
+    self.assertEqual(threading.active_count(), threads_before + 1)
+
+    for index, port in enumerate(self.ports):
+      port.feed(bytes((index,)) * 3)
+    self.assertTrue(wait_for(lambda: all(
+      bytes(self.received[index]) == bytes((index,)) * 3 for index in self.received
+    )))
+
+  def test_bulk_port_reads_only_buffered_bytes_on_selector_thread(self):
+    self.register(0, read_mode=SERIAL_READ_BULK)
+    self.ports[0].feed(b"frame")
+    self.assertTrue(wait_for(lambda: bytes(self.received[0]) == b"frame"))
+    self.assertEqual(self.ports[0].requested, [5])
+
+  def test_read_failure_reports_error_and_drops_port(self):
+    self.register(0)
+    self.ports[0].fail = True
+    self.ports[0].feed(b"x")
+    self.assertTrue(wait_for(lambda: len(self.errors) == 1))
+    self.assertEqual(self.engine.selected_count, 0)
+
+  def test_unregistered_port_is_no_longer_read(self):
+    self.register(0)
+    self.engine.unregister(self.ports[0])
+    self.ports[0].feed(b"late")
+    time.sleep(0.05)
+    self.assertEqual(self.received[0], bytearray())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import os
+import select
+import subprocess
+import sys
+import time
+import unittest
+
+from workers.local_platform_worker.ft_worker.device_protocol import (
+  USB_CMD_IDENTIFY,
+  USB_EVT_COUNTER,
+  USB_RSP_IDENTIFY,
+  UsbFrameParser,
+  build_usb_frame,
+  parse_identify_payload,
+)
+from workers.local_platform_worker.ft_worker.devices import DeviceService
+from workers.local_platform_worker.ft_worker.platform import create_platform_services
+from workers.local_platform_worker.ft_worker.platform.contract import PlatformServices
+from workers.local_platform_worker.ft_worker.platform.simulated.clicker import (
+  SimulationConfig,
+  VirtualClicker,
+  parse_simulation_config,
+)
+from workers.local_platform_worker.ft_worker.platform.simulated.device_adapter import (
+  SimulatedDeviceAdapter,
+)
+from workers.local_platform_worker.ft_worker.platform.unsupported import UnsupportedWindowTracker
+from workers.local_platform_worker.ft_worker.runtime import WorkerRuntime
+
+
+async def wait_until(predicate, timeout=2.0):
+  deadline = asyncio.get_running_loop().time() + timeout
+  while asyncio.get_running_loop().time() < deadline:
+    if predicate():
+      return True
+    await asyncio.sleep(0.01)
+  return predicate()
+
+
+class SimulationConfigTests(unittest.TestCase):
+  def test_parses_options_and_rejects_invalid_values(self):
+    config = parse_simulation_config("ble=4, usb=8,rate=20,burst=5,disconnectEvery=30,noise=0.01")
+    self.assertEqual(config, SimulationConfig(
+      ble=4, usb=8, rate=20.0, burst=5, disconnect_every=30.0, noise=0.01,
+    ))
+    self.assertEqual(parse_simulation_config(None), SimulationConfig())
+    for spec in ("bluetooth=1", "rate=0", "noise=2", "usb=x", "ble"):
+      with self.assertRaises(ValueError):
+        parse_simulation_config(spec)
+
+  def test_clicker_counts_presses_and_answers_commands(self):
+    clicker = VirtualClicker("USB", 3)
+    clicker.press(True)
+    payload = clicker.press(False)
+    self.assertEqual(payload[:13], bytes.fromhex("00000000ff0100000001000000"))
+    self.assertEqual(clicker.handle_usb_command(0x02, b"Counter-Arena")[6:8], b"\x02\x00")
+    self.assertEqual(clicker.name, "Counter-Arena")
+    clicker.handle_usb_command(0x01, b"")
+    self.assertEqual((clicker.total_plus, clicker.total_minus), (0, 0))
+
+
+@unittest.skipIf(os.name == "nt", "simulated serial handles require pipes")
+class SimulatedPlatformTests(unittest.TestCase):
+  def test_device_service_streams_counters_from_both_transports(self):
+    async def scenario():
+      emitted = []
+
+      async def emit(*event):
+        emitted.append(event)
+
+      adapter = SimulatedDeviceAdapter(SimulationConfig(ble=1, usb=1, rate=200.0, burst=2, noise=0.2))
+      service = DeviceService(adapter, emit)
+      scanned = await service.scan()
+      device_ids = [device["deviceId"] for device in scanned["devices"]]
+      self.assertEqual(device_ids, ["5E:1A:B1:00:00:01", "usb:5E1A0B000001"])
+
+      connected = await service.connect_many([
+        {"connectionId": f"judge-{index}", "deviceId": device_id}
+        for index, device_id in enumerate(device_ids)
+      ])
+      self.assertEqual({value["status"] for value in connected["connections"]}, {"connected"})
+
+      def counted(connection_id):
+        return sum(1 for event in emitted if event[0] == "device.counter" and event[1]["connectionId"] == connection_id)
+
+      self.assertTrue(await wait_until(lambda: counted("judge-0") >= 10 and counted("judge-1") >= 10))
+      self.assertTrue(await wait_until(
+        lambda: service.metrics()["judge-1"]["frames"]["checksumFailures"] > 0
+      ))
+      await service.rename("judge-1", "Counter-USB")
+      self.assertEqual(adapter.usb_clickers[0].name, "Counter-USB")
+      await service.close()
+
+    asyncio.run(scenario())
+
+  def test_forced_disconnects_report_error_status(self):
+    async def scenario():
+      emitted = []
+
+      async def emit(*event):
+        emitted.append(event)
+
+      adapter = SimulatedDeviceAdapter(SimulationConfig(
+        ble=0, usb=1, rate=50.0, disconnect_every=0.2, seed=3,
+      ))
+      service = DeviceService(adapter, emit)
+      await service.connect("judge-1", "usbport:sim-usb-1")
+      self.assertTrue(await wait_until(
+        lambda: any(event[0] == "device.status" and event[1]["status"] == "error" for event in emitted)
+      ))
+      await service.close()
+
+    asyncio.run(scenario())
+
+  def test_streaming_scan_reports_devices_before_the_summary(self):
+    async def scenario():
+      adapter = SimulatedDeviceAdapter(SimulationConfig(ble=2, usb=2))
+      services = PlatformServices("simulated", UnsupportedWindowTracker(), True, True, adapter)
+      discovered = []
+      progress = []
+
+      async def sink(message):
+        if message.get("event") == "device.discovered":
+          discovered.append((time.perf_counter(), message["payload"]))
+        elif message.get("event") == "device.connectProgress":
+          progress.append(message["payload"])
+
+      runtime = WorkerRuntime(services, event_sink=sink)
+      started = time.perf_counter()
+      response = await runtime.handle_line(json.dumps({
+        "protocolVersion": 1, "id": "scan-1", "method": "device.scan", "params": {"stream": True},
+      }))
+      finished = time.perf_counter()
+      self.assertEqual(response["result"], {"scanId": "scan-1", "deviceCount": 4, "errors": []})
+      self.assertEqual({payload["scanId"] for _at, payload in discovered}, {"scan-1"})
+      self.assertEqual(sorted(payload["deviceId"] for _at, payload in discovered), [
+        "5E:1A:B1:00:00:01", "5E:1A:B1:00:00:02", "usb:5E1A0B000001", "usb:5E1A0B000002",
+      ])
+      self.assertLess(discovered[0][0] - started, 0.3)
+      self.assertGreater(finished - started, 0.7)
+
+      connected = await runtime.handle_line(json.dumps({
+        "protocolVersion": 1, "id": "connect-1", "method": "device.connectMany", "params": {
+          "connections": [
+            {"connectionId": f"judge-{index}", "deviceId": payload["deviceId"]}
+            for index, (_at, payload) in enumerate(discovered)
+          ],
+          "progress": True,
+        },
+      }))
+      self.assertEqual({value["status"] for value in connected["result"]["connections"]}, {"connected"})
+      self.assertEqual([payload["completed"] for payload in progress], [1, 2, 3, 4])
+      self.assertEqual({payload["requestId"] for payload in progress}, {"connect-1"})
+
+      # A match stop disconnects sessions but keeps the watcher for the next match.
+      for request_id, method, params in (
+        ("watch-1", "device.watch", {"intervalMs": 500}),
+        ("stop-1", "device.disconnectAll", {}),
+      ):
+        await runtime.handle_line(json.dumps({
+          "protocolVersion": 1, "id": request_id, "method": method, "params": params,
+        }))
+      self.assertEqual(runtime.device_service.sessions, {})
+      self.assertFalse(runtime.device_service.watch_task.done())
+      await runtime.close()
+      self.assertIsNone(runtime.device_service.watch_task)
+
+    asyncio.run(scenario())
+
+  def test_stdio_worker_runs_on_simulated_platform(self):
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    request = json.dumps({"protocolVersion": 1, "id": "hello", "method": "system.hello", "params": {}})
+    completed = subprocess.run(
+      [sys.executable, "-m", "workers.local_platform_worker.ft_worker", "--platform", "simulated"],
+      cwd=project_root, input=request.encode("utf-8") + b"\n", capture_output=True, timeout=20, check=True,
+      env={**os.environ, "FT_WORKER_SIMULATION": "ble=1,usb=0"},
+    )
+    result = json.loads(completed.stdout)["result"]
+    self.assertEqual(result["platform"], "simulated")
+    self.assertEqual(result["capabilities"]["ble"], True)
+    self.assertEqual(result["capabilities"]["usb"], False)
+    self.assertEqual(create_platform_services("simulated").platform, "simulated")
+
+
+@unittest.skipIf(os.name == "nt", "pseudo-terminals are unavailable on Windows")
+class PtyClickerFarmTests(unittest.TestCase):
+  def test_pty_clicker_identifies_and_streams_counter_frames(self):
+    from workers.local_platform_worker.benchmarks.tools.pty_clickers import PtyClickerFarm
+
+    config = SimulationConfig(ble=0, usb=2, rate=200.0)
+    with PtyClickerFarm(2, config, record_sent=True) as farm:
+      fd = os.open(farm.paths[1], os.O_RDWR | os.O_NOCTTY)
+      try:
+        os.write(fd, build_usb_frame(USB_CMD_IDENTIFY))
+        parser = UsbFrameParser()
+        frames = []
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline and (
+          USB_RSP_IDENTIFY not in [frame[0] for frame in frames] or len(frames) < 10
+        ):
+          if select.select([fd], [], [], 0.05)[0]:
+            frames.extend((frame_type, bytes(payload)) for frame_type, payload in parser.feed(os.read(fd, 4096)))
+      finally:
+        os.close(fd)
+      identify = next(payload for frame_type, payload in frames if frame_type == USB_RSP_IDENTIFY)
+      self.assertEqual(parse_identify_payload(identify), ("usb:5E1A0B000002", "Counter-SU02"))
+      self.assertGreaterEqual(sum(1 for frame in frames if frame[0] == USB_EVT_COUNTER), 9)
+      self.assertTrue(farm.sent)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,15 +1,31 @@
 import asyncio
 import json
+import os
+import subprocess
+import sys
 import unittest
 
+from workers.local_platform_worker.ft_worker.batching import CounterBatcher
+from workers.local_platform_worker.ft_worker.codec import (
+  FRAME_COUNTER,
+  FRAME_HEADER,
+  FRAME_JSON,
+  BinaryFrameCodec,
+  JsonLineCodec,
+  decode_frame,
+)
 from workers.local_platform_worker.ft_worker.platform.contract import PlatformServices
 from workers.local_platform_worker.ft_worker.protocol import (
   PROTOCOL_VERSION,
+  MessageEncoder,
   ProtocolError,
   encode_message,
+  event_message,
   parse_request_line,
+  success_response,
 )
 from workers.local_platform_worker.ft_worker.runtime import WorkerRuntime
+from workers.local_platform_worker.ft_worker.tracing import TRACE_KEY
 
 
 class FakeWindowTracker:
@@ -32,17 +48,27 @@ class FakeDeviceService:
     self.last_scan = None
     self.last_connections = None
     self.renamed = None
+    self.last_watch = None
 
   async def scan(self, flush=False, remarks=None):
     self.last_scan = {"flush": flush, "remarks": remarks}
     return {"devices": [], "errors": []}
 
+  async def watch(self, interval, remarks=None, ble=False):
+    self.last_watch = {"interval": interval, "remarks": remarks, "ble": ble}
+    return {"watching": interval > 0, "ble": ble}
+
   async def connect(self, connection_id, device_id):
     return {"connectionId": connection_id, "deviceId": device_id}
 
-  async def connect_many(self, connections):
+  async def connect_many(self, connections, retries=0, limits=None, on_progress=None):
     self.last_connections = connections
-    return {"connections": [{**value, "status": "connected"} for value in connections]}
+    self.last_connect_options = {"retries": retries, "limits": limits}
+    results = [{**value, "status": "connected"} for value in connections]
+    if on_progress is not None:
+      for completed, result in enumerate(results, 1):
+        await on_progress({**result, "completed": completed, "total": len(results)})
+    return {"connections": results}
 
   async def reset_all(self):
     return {"connections": []}
@@ -139,6 +165,12 @@ class WorkerProtocolTests(unittest.TestCase):
     invalid = self.dispatch(method="device.connect", params={"deviceId": "device-1"})
     self.assertEqual(invalid["error"]["code"], "INVALID_PARAMS")
 
+    watching = self.dispatch(method="device.watch", params={"intervalMs": 500, "ble": True})
+    self.assertEqual(watching["result"], {"watching": True, "ble": True, "intervalMs": 500})
+    self.assertEqual(devices.last_watch, {"interval": 0.5, "remarks": {}, "ble": True})
+    invalid = self.dispatch(method="device.watch", params={"intervalMs": 10})
+    self.assertEqual(invalid["error"]["code"], "INVALID_PARAMS")
+
     connected = self.dispatch(method="device.connectMany", params={
       "connections": [{"connectionId": "judge-1-primary", "deviceId": "device-1"}],
     })
@@ -152,6 +184,26 @@ class WorkerProtocolTests(unittest.TestCase):
       ],
     })
     self.assertEqual(duplicate["error"]["code"], "INVALID_PARAMS")
+    scheduled = self.dispatch(method="device.connectMany", params={
+      "connections": [
+        {"connectionId": "judge-1-primary", "deviceId": "device-1", "priority": 1},
+        {"connectionId": "judge-1-secondary", "deviceId": "device-2"},
+      ],
+      "retries": 2,
+      "limits": {"ble": 4},
+    })
+    self.assertEqual(len(scheduled["result"]["connections"]), 2)
+    self.assertEqual(devices.last_connections[0]["priority"], 1)
+    self.assertNotIn("priority", devices.last_connections[1])
+    self.assertEqual(devices.last_connect_options, {"retries": 2, "limits": {"BLE": 4}})
+    for params in (
+      {"retries": 4},
+      {"limits": {"ble": 0}},
+      {"limits": {"wifi": 2}},
+      {"progress": "yes"},
+    ):
+      invalid = self.dispatch(method="device.connectMany", params={"connections": [], **params})
+      self.assertEqual(invalid["error"]["code"], "INVALID_PARAMS")
 
     reset = self.dispatch(method="device.resetAll")
     self.assertEqual(reset["result"], {"connections": []})
@@ -161,12 +213,292 @@ class WorkerProtocolTests(unittest.TestCase):
     )
     self.assertEqual(renamed["result"]["name"], "Counter Arena")
 
+  def test_hello_negotiates_counter_batches(self):
+    async def scenario():
+      sent = []
+
+      async def sink(message):
+        sent.append(message)
+
+      runtime = WorkerRuntime(PlatformServices("windows", FakeWindowTracker(), True, True), sink)
+      hello = await runtime.handle_line(request_line(
+        method="system.hello", params={"counterBatch": {"latencyMs": 2, "maxEvents": 3}},
+      ))
+      self.assertEqual(hello["result"]["counterBatch"], {"latencyMs": 2, "maxEvents": 3})
+
+      for index in range(4):
+        await runtime._emit_device_event("device.counter", {"totalPlus": index}, f"event-{index}")
+      self.assertEqual([message["event"] for message in sent], ["device.counterBatch"])
+      self.assertEqual(
+        [value["eventId"] for value in sent[0]["payload"]["events"]],
+        ["event-0", "event-1", "event-2"],
+      )
+
+      await asyncio.sleep(0.02)
+      self.assertEqual(sent[1]["payload"]["events"][0]["payload"], {"totalPlus": 3})
+
+      await runtime._emit_device_event("device.counter", {"totalPlus": 4}, "event-4")
+      await runtime._emit_device_event("device.status", {"status": "error"})
+      self.assertEqual([message["event"] for message in sent[2:]], [
+        "device.counterBatch",
+        "device.status",
+      ])
+
+      invalid = await runtime.handle_line(request_line(
+        method="system.hello", params={"counterBatch": {"latencyMs": 0}},
+      ))
+      self.assertEqual(invalid["error"]["code"], "INVALID_PARAMS")
+
+    asyncio.run(scenario())
+
+  def test_counter_batcher_keeps_timer_flush_task_and_close_awaits_it(self):
+    async def scenario():
+      sent = []
+      release = asyncio.Event()
+
+      async def sink(message):
+        await release.wait()
+        sent.append(message)
+
+      batcher = CounterBatcher(sink, latency_ms=1, max_events=8)
+      await batcher.add({"totalPlus": 1}, "event-1")
+      await asyncio.sleep(0.01)
+      self.assertIsNotNone(batcher.task)
+      self.assertFalse(batcher.task.done())
+
+      # Events arriving while the sink is blocked ride on the same task.
+      await batcher.add({"totalPlus": 2}, "event-2")
+      await asyncio.sleep(0.01)
+      closing = asyncio.create_task(batcher.close())
+      await asyncio.sleep(0)
+      release.set()
+      await closing
+      self.assertIsNone(batcher.task)
+      self.assertEqual([len(message["payload"]["events"]) for message in sent], [1, 1])
+
+    asyncio.run(scenario())
+
+  def test_binary_codec_packs_counter_events_and_round_trips(self):
+    codec = BinaryFrameCodec()
+    counter = event_message("device.counter", {
+      "connectionId": "judge-1-primary",
+      "deviceId": "usb:AABBCCDDEEFF",
+      "transport": "USB",
+      "currentTotal": -2,
+      "eventType": -1,
+      "totalPlus": 3,
+      "totalMinus": 5,
+      "deviceTimestampMs": 4294967295,
+    }, "0123456789abcdef0123456789abcdef")
+
+    encoded = codec.encode(counter)
+    self.assertEqual(FRAME_HEADER.unpack_from(encoded)[1], FRAME_COUNTER)
+    self.assertLess(len(encoded), len(encode_message(counter).encode("utf-8")) // 2)
+    self.assertEqual(decode_frame(encoded), (counter, len(encoded)))
+
+    status = event_message("device.status", {"connectionId": "计分", "status": "connected"})
+    encoded_status = codec.encode(status)
+    self.assertEqual(FRAME_HEADER.unpack_from(encoded_status)[1], FRAME_JSON)
+    self.assertEqual(decode_frame(encoded_status)[0], status)
+
+  def test_binary_codec_reads_length_prefixed_requests(self):
+    async def scenario():
+      body = request_line().encode("utf-8")
+      reader = asyncio.StreamReader()
+      reader.feed_data(
+        FRAME_HEADER.pack(len(body), FRAME_JSON) + body + FRAME_HEADER.pack(len(body), FRAME_JSON)
+      )
+      reader.feed_eof()
+      codec = BinaryFrameCodec()
+      self.assertEqual(codec.decode_request(await codec.read_request(reader)).method, "system.ping")
+      self.assertEqual(await codec.read_request(reader), b"")
+
+    asyncio.run(scenario())
+
+  def test_line_codec_discards_whole_oversized_line(self):
+    async def scenario():
+      reader = asyncio.StreamReader(limit=128)
+      codec = JsonLineCodec()
+      reader.feed_data(b"x" * 200)
+      read = asyncio.create_task(codec.read_request(reader))
+      await asyncio.sleep(0)
+      reader.feed_data(b"y" * 200 + b"\n" + request_line().encode("utf-8"))
+      reader.feed_eof()
+      with self.assertRaises(ProtocolError) as too_large:
+        await read
+      self.assertEqual(too_large.exception.code, "MESSAGE_TOO_LARGE")
+      self.assertEqual(codec.decode_request(await codec.read_request(reader)).method, "system.ping")
+      self.assertEqual(await codec.read_request(reader), b"")
+
+    asyncio.run(scenario())
+
+  def test_hello_requests_binary_transport(self):
+    response = self.dispatch(method="system.hello", params={"transport": "binary"})
+    self.assertEqual(response["result"]["transport"], "binary")
+    self.assertEqual(self.runtime.requested_codec.name, "binary")
+
+    invalid = self.dispatch(method="system.hello", params={"transport": "xml"})
+    self.assertEqual(invalid["error"]["code"], "INVALID_PARAMS")
+
+  def test_stdio_switches_to_binary_frames_after_hello(self):
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ping = request_line("request-2", params={"echo": "binary"}).encode("utf-8")
+    stdin = (
+      request_line(method="system.hello", params={"transport": "binary"}).encode("utf-8") + b"\n" +
+      FRAME_HEADER.pack(len(ping), FRAME_JSON) + ping
+    )
+    completed = subprocess.run(
+      [sys.executable, "-m", "workers.local_platform_worker.worker_entry"],
+      cwd=project_root, input=stdin, capture_output=True, timeout=20, check=True,
+    )
+    hello_line, frames = completed.stdout.split(b"\n", 1)
+    self.assertEqual(json.loads(hello_line)["result"]["transport"], "binary")
+    self.assertEqual(decode_frame(frames)[0]["result"], {"echo": "binary"})
+
+  def test_slow_scans_do_not_block_unrestricted_requests(self):
+    class SlowScanService(FakeDeviceService):
+      def __init__(self):
+        super().__init__()
+        self.active_scans = 0
+        self.max_active_scans = 0
+
+      async def scan(self, flush=False, remarks=None):
+        self.active_scans += 1
+        self.max_active_scans = max(self.max_active_scans, self.active_scans)
+        await asyncio.sleep(0.05)
+        self.active_scans -= 1
+        return {"devices": [], "errors": []}
+
+    async def scenario():
+      devices = SlowScanService()
+      self.runtime.device_service = devices
+      completed = []
+
+      async def run(request_id, method):
+        response = await self.runtime.handle_line(request_line(request_id, method))
+        completed.append(response["id"])
+
+      await asyncio.gather(
+        run("scan-1", "device.scan"),
+        run("scan-2", "device.scan"),
+        run("ping", "system.ping"),
+      )
+      self.assertEqual(completed, ["ping", "scan-1", "scan-2"])
+      self.assertEqual(devices.max_active_scans, 1)
+
+    self.assertEqual(self.runtime.concurrency_class("window.getBounds"), "unlimited")
+    self.assertEqual(self.runtime.concurrency_class("system.hello"), "control")
+    asyncio.run(scenario())
+
+  def test_metrics_count_methods_and_publish_periodically(self):
+    async def scenario():
+      events = []
+
+      async def sink(message):
+        events.append(message)
+
+      self.runtime.event_sink = sink
+      await self.runtime.handle_line(request_line("ping-1"))
+      await self.runtime.handle_line(request_line("bounds", "window.getBounds"))
+      invalid = await self.runtime.handle_line(
+        request_line("metrics-1", "system.metrics", {"intervalMs": 5})
+      )
+      self.assertEqual(invalid["error"]["code"], "INVALID_PARAMS")
+      response = await self.runtime.handle_line(
+        request_line("metrics-2", "system.metrics", {"intervalMs": 100})
+      )
+      result = response["result"]
+      self.assertEqual(result["intervalMs"], 100)
+      self.assertEqual(result["methods"]["system.ping"]["count"], 1)
+      self.assertEqual(result["methods"]["window.getBounds"]["errors"], 1)
+      self.assertEqual(result["methods"]["system.metrics"]["errors"], 1)
+      self.assertEqual(result["connections"], {})
+      await asyncio.sleep(0.15)
+      self.runtime.stop_metrics()
+      self.assertEqual(events[0]["event"], "system.metrics")
+      self.assertEqual(events[0]["payload"]["methods"]["system.metrics"]["count"], 2)
+
+    asyncio.run(scenario())
+
+  def test_trace_stamps_counter_stages_when_requested(self):
+    async def scenario():
+      events = []
+
+      async def sink(message):
+        events.append(message)
+
+      self.runtime.event_sink = sink
+      payload = {"connectionId": "judge-1", "totalPlus": 1}
+      await self.runtime._emit_device_event("device.counter", payload, "event-1", (1.0, 1.001, 1.002))
+      self.assertNotIn(TRACE_KEY, events[-1])
+
+      hello = await self.runtime.handle_line(
+        request_line(method="system.hello", params={"trace": {"stamps": True}})
+      )
+      self.assertEqual(hello["result"]["trace"], {"stamps": True})
+      await self.runtime._emit_device_event("device.counter", payload, "event-2", (1.0, 1.001, 1.002))
+      message = events[-1]
+      self.assertEqual(message["trace"], {"receivedMs": 1000.0, "dispatchedMs": 1001.0, "emittedMs": 1002.0})
+      self.assertEqual(BinaryFrameCodec().encode(message)[4], FRAME_JSON)
+      stamps = message.pop(TRACE_KEY)[0]
+      self.assertEqual(len(stamps), 4)
+      self.runtime.tracer.record(stamps + [stamps[-1] + 0.004])
+      spans = self.runtime.metrics_snapshot()["trace"]
+      self.assertEqual(spans["threadHop"]["count"], 1)
+      self.assertEqual(spans["output"]["lastMs"], 4.0)
+
+      invalid = await self.runtime.handle_line(
+        request_line(method="system.hello", params={"trace": {"stamps": "yes"}})
+      )
+      self.assertEqual(invalid["error"]["code"], "INVALID_PARAMS")
+
+    asyncio.run(scenario())
+
   def test_encoded_response_is_one_json_line(self):
     encoded = encode_message({"message": "计分"})
     self.assertEqual(encoded.count("\n"), 1)
     self.assertTrue(encoded.endswith("\n"))
     self.assertEqual(json.loads(encoded), {"message": "计分"})
 
+  def test_template_encoder_matches_generic_encoding(self):
+    def counter(connection_id="judge-1", device_id="AA:BB:CC:DD:EE:FF", **overrides):
+      payload = {
+        "connectionId": connection_id,
+        "deviceId": device_id,
+        "transport": "BLE",
+        "currentTotal": -3,
+        "eventType": -1,
+        "totalPlus": 4,
+        "totalMinus": 7,
+        "deviceTimestampMs": 4294967295,
+      }
+      payload.update(overrides)
+      return event_message("device.counter", payload, "0123456789abcdef0123456789abcdef")
+
+    traced = counter()
+    traced["trace"] = {"receivedMs": 1.5}
+    odd_id = counter()
+    odd_id["eventId"] = "id \"quoted\""
+    messages = [
+      counter(),
+      counter(),
+      counter("裁判-1", "usb:AABBCCDDEEFF"),
+      counter(totalPlus=True),
+      counter(currentTotal=2.5),
+      odd_id,
+      traced,
+      event_message("device.status", {"connectionId": "judge-1", "deviceId": "x", "status": "connected"}),
+      event_message("device.status", {"connectionId": "judge-1", "deviceId": "x", "status": "error"}),
+      event_message("device.status", {"connectionId": "judge-1", "status": "error"}),
+      event_message("device.discovered", {"deviceId": "x"}),
+      success_response("request-1", {"ok": True}),
+    ]
+    encoder = MessageEncoder()
+    for message in messages:
+      self.assertEqual(encoder.encode(message), encode_message(message))
+    self.assertEqual(len(encoder.counter_prefixes), 2)
+    self.assertEqual(len(encoder.status_lines), 2)
+
 
 if __name__ == "__main__":
   unittest.main()
@@ -0,0 +1,51 @@
+import argparse
+import struct
+import time
+import tracemalloc
+
+from ..ft_worker.device_protocol import ClickerEventBatch, parse_notification_data
+
+
+def build_payloads(count: int) -> list[bytes]:
+  return [
+    struct.pack("<ibiiI", index, 1, 100000 + index, index // 5, index * 10 & 0xFFFFFFFF)
+    for index in range(count)
+  ]
+
+
+def parse_events(payloads):
+  return [parse_notification_data(payload) for payload in payloads]
+
+
+def parse_batch(payloads):
+  return ClickerEventBatch.from_payloads(payloads)
+
+
+def measure(parser, payloads) -> dict:
+  started = time.perf_counter()
+  parser(payloads)
+  seconds = time.perf_counter() - started
+  tracemalloc.start()
+  parsed = parser(payloads)
+  retained, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del parsed
+  return {
+    "eventsPerSecond": round(len(payloads) / seconds),
+    "retainedBytesPerEvent": round(retained / len(payloads), 1),
+    "peakBytesPerEvent": round(peak / len(payloads), 1),
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="ClickerEvent objects versus columnar batches")
+  parser.add_argument("--events", type=int, default=100000)
+  args = parser.parse_args(argv)
+  payloads = build_payloads(args.events)
+  for name, runner in (("ClickerEvent", parse_events), ("ClickerEventBatch", parse_batch)):
+    result = measure(runner, payloads)
+    print(f"{name:18s} " + " ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+  main()
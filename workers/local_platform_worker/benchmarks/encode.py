@@ -0,0 +1,56 @@
+import argparse
+import time
+
+from ..ft_worker.protocol import MessageEncoder, encode_message, event_message
+
+
+def build_messages(count: int, connections: int = 32) -> list[dict]:
+  messages = []
+  for index in range(count):
+    connection = index % connections
+    if index % 50 == 49:
+      messages.append(event_message("device.status", {
+        "connectionId": f"match-ref-{connection}-primary",
+        "deviceId": f"usb:5E1A0B0000{connection:02X}",
+        "status": "connected",
+      }))
+      continue
+    messages.append(event_message("device.counter", {
+      "connectionId": f"match-ref-{connection}-primary",
+      "deviceId": f"usb:5E1A0B0000{connection:02X}",
+      "transport": "USB",
+      "currentTotal": index - 3 * (index // 5),
+      "eventType": 1 if index % 5 else -1,
+      "totalPlus": index,
+      "totalMinus": index // 5,
+      "deviceTimestampMs": 1000 + index * 7,
+    }, f"{index:032x}"))
+  return messages
+
+
+def measure(encode, messages, repeat: int) -> float:
+  best = float("inf")
+  for _ in range(repeat):
+    started = time.perf_counter()
+    for message in messages:
+      encode(message)
+    best = min(best, time.perf_counter() - started)
+  return best
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Generic versus template JSON encoding of worker events")
+  parser.add_argument("--messages", type=int, default=100000)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args(argv)
+  messages = build_messages(args.messages)
+  encoder = MessageEncoder()
+  mismatches = sum(1 for message in messages if encoder.encode(message) != encode_message(message))
+  print(f"messages={len(messages)} mismatches={mismatches}")
+  for name, encode in (("encode_message", encode_message), ("MessageEncoder", encoder.encode)):
+    seconds = measure(encode, messages, args.repeat)
+    print(f"{name:16s} {len(messages) / seconds:12,.0f} messages/s {seconds / len(messages) * 1e9:8.0f} ns/message")
+
+
+if __name__ == "__main__":
+  main()
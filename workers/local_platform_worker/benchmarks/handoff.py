@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import threading
+import time
+import tracemalloc
+
+from ..ft_worker.handoff import LoopHandoff
+
+
+class Counts:
+  def __init__(self):
+    self.consumed = 0
+    self.wakeups = 0
+    self.tasks = 0
+
+
+async def run_per_event(events: int) -> Counts:
+  loop = asyncio.get_running_loop()
+  counts = Counts()
+  done = loop.create_future()
+
+  async def consume(_item, _received_at, _dispatched_at):
+    counts.consumed += 1
+    if counts.consumed == events:
+      done.set_result(None)
+
+  def dispatch(item, received_at):
+    counts.tasks += 1
+    asyncio.create_task(consume(item, received_at, time.perf_counter()))
+
+  def produce():
+    for index in range(events):
+      counts.wakeups += 1
+      loop.call_soon_threadsafe(dispatch, index, time.perf_counter())
+
+  threading.Thread(target=produce, daemon=True).start()
+  await done
+  return counts
+
+
+async def run_handoff(events: int) -> Counts:
+  loop = asyncio.get_running_loop()
+  counts = Counts()
+  done = loop.create_future()
+
+  async def consume(_item, _received_at, _dispatched_at):
+    counts.consumed += 1
+    if counts.consumed == events:
+      done.set_result(None)
+
+  handoff = LoopHandoff(loop, consume)
+
+  def produce():
+    for index in range(events):
+      handoff.push(index, time.perf_counter())
+
+  threading.Thread(target=produce, daemon=True).start()
+  await done
+  counts.wakeups = handoff.wakeups
+  counts.tasks = handoff.drains
+  return counts
+
+
+def measure(runner, events: int) -> dict:
+  started = time.perf_counter()
+  counts = asyncio.run(runner(events))
+  seconds = time.perf_counter() - started
+  tracemalloc.start()
+  asyncio.run(runner(min(events, 20000)))
+  _current, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return {
+    "eventsPerSecond": round(counts.consumed / seconds, 1),
+    "events": counts.consumed,
+    "wakeups": counts.wakeups,
+    "tasks": counts.tasks,
+    "peakKbPer1kEvents": round(peak / 1024 / (min(events, 20000) / 1000), 2),
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Thread-to-loop counter handoff cost")
+  parser.add_argument("--events", type=int, default=200000)
+  args = parser.parse_args(argv)
+  for name, runner in (("call_soon_threadsafe+task", run_per_event), ("LoopHandoff", run_handoff)):
+    result = measure(runner, args.events)
+    print(f"{name:26s} " + " ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+
+def project_root() -> str:
+  return os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def percentile(values, fraction):
+  ordered = sorted(values)
+  if not ordered:
+    return 0.0
+  return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(count: int, window: int, command=None) -> dict:
+  process = subprocess.Popen(
+    command or [sys.executable, "-m", "workers.local_platform_worker.worker_entry"],
+    cwd=project_root(),
+    stdin=subprocess.PIPE,
+    stdout=subprocess.PIPE,
+    stderr=subprocess.DEVNULL,
+  )
+  sent_at = {}
+  latencies = []
+  credits = threading.Semaphore(window)
+
+  def read_responses():
+    for line in process.stdout:
+      message = json.loads(line)
+      started = sent_at.pop(message.get("id"), None)
+      if started is None:
+        continue
+      latencies.append(time.perf_counter() - started)
+      credits.release()
+      if len(latencies) == count:
+        return
+
+  reader = threading.Thread(target=read_responses, daemon=True)
+  reader.start()
+  started = time.perf_counter()
+  for index in range(count):
+    credits.acquire()
+    request_id = f"ping-{index}"
+    line = json.dumps({
+      "protocolVersion": 1, "id": request_id, "method": "system.ping", "params": {"echo": index},
+    }) + "\n"
+    sent_at[request_id] = time.perf_counter()
+    process.stdin.write(line.encode("utf-8"))
+    process.stdin.flush()
+  reader.join()
+  elapsed = time.perf_counter() - started
+  process.stdin.close()
+  process.wait(timeout=10)
+  return {
+    "requests": count,
+    "window": window,
+    "requestsPerSecond": round(count / elapsed, 1),
+    "p50Ms": round(percentile(latencies, 0.5) * 1000, 3),
+    "p99Ms": round(percentile(latencies, 0.99) * 1000, 3),
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="system.ping throughput and round trip over stdio")
+  parser.add_argument("--count", type=int, default=5000)
+  parser.add_argument("--window", type=int, action="append")
+  args = parser.parse_args(argv)
+  for window in args.window or [1, 32]:
+    print(json.dumps(run(args.count, window)))
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+
+from ..ft_worker.platform.contract import PlatformServices
+from ..ft_worker.platform.simulated.clicker import SimulationConfig
+from ..ft_worker.platform.simulated.device_adapter import SimulatedDeviceAdapter
+from ..ft_worker.platform.unsupported import UnsupportedWindowTracker
+from ..ft_worker.runtime import WorkerRuntime
+from ..ft_worker.tracing import TRACE_KEY
+from .stdio_ping import percentile, project_root
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+LATENCY_DEVICES = (1, 8, 32)
+# Direction and absolute slack per metric; slack keeps sub-millisecond noise
+# from being reported as a regression.
+METRICS = {
+  "eventsPerSecond": ("higher", 0.0),
+  "p50Ms": ("lower", 1.0),
+  "p99Ms": ("lower", 2.0),
+  "wallMs": ("lower", 50.0),
+  "rssGrowthKb": ("lower", 4096.0),
+}
+# Below this many samples a p99 is one or two outliers, so it is reported
+# but not compared; --quick runs compare only p50 and throughput.
+MIN_P99_EVENTS = 500
+
+
+def rss_kb(pid: int | str = "self") -> int | None:
+  try:
+    with open(f"/proc/{pid}/status", encoding="ascii") as status:
+      for line in status:
+        if line.startswith("VmRSS:"):
+          return int(line.split()[1])
+  except OSError:
+    return None
+  return None
+
+
+def request_line(request_id: str, method: str, params=None) -> bytes:
+  return (json.dumps({
+    "protocolVersion": 1, "id": request_id, "method": method, "params": params or {},
+  }) + "\n").encode("utf-8")
+
+
+def connections(devices) -> list[dict]:
+  return [
+    {"connectionId": f"judge-{index}", "deviceId": device["deviceId"]}
+    for index, device in enumerate(devices)
+  ]
+
+
+def latency_summary(latencies) -> dict:
+  return {
+    "events": len(latencies),
+    "p50Ms": round(percentile(latencies, 0.5) * 1000, 3),
+    "p99Ms": round(percentile(latencies, 0.99) * 1000, 3),
+  }
+
+
+async def run_in_process(config: SimulationConfig, seconds: float) -> dict:
+  adapter = SimulatedDeviceAdapter(config)
+  services = PlatformServices(
+    "simulated", UnsupportedWindowTracker(), adapter.ble_available, adapter.usb_available, adapter,
+  )
+  latencies = []
+  counted = 0
+  measuring = False
+
+  async def sink(message):
+    nonlocal counted
+    stamps = message.pop(TRACE_KEY, None)
+    if not measuring or message.get("event") != "device.counter":
+      return
+    counted += 1
+    if stamps:
+      latencies.append(time.perf_counter() - stamps[0][0])
+
+  runtime = WorkerRuntime(services, event_sink=sink)
+  await runtime.handle_line(request_line("hello", "system.hello", {"trace": True}))
+  scanned = await runtime.handle_line(request_line("scan", "device.scan"))
+  await runtime.handle_line(request_line(
+    "connect", "device.connectMany", {"connections": connections(scanned["result"]["devices"])},
+  ))
+  measuring = True
+  started = time.perf_counter()
+  await asyncio.sleep(seconds)
+  measuring = False
+  elapsed = time.perf_counter() - started
+  await runtime.close()
+  return {"eventsPerSecond": round(counted / elapsed, 1), **latency_summary(latencies)}
+
+
+class WorkerProcess:
+  def __init__(self, simulation: str):
+    self.simulation = simulation
+    self.process = None
+    self.pending = {}
+    self.counter_latencies = []
+    self.counters = 0
+    self.measuring = False
+    self._reader = None
+    self._next_id = 0
+
+  async def start(self):
+    self.process = await asyncio.create_subprocess_exec(
+      sys.executable, "-m", "workers.local_platform_worker.ft_worker", "--platform", "simulated",
+      cwd=project_root(), env={**os.environ, "FT_WORKER_SIMULATION": self.simulation},
+      stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, limit=1024 * 1024,
+    )
+    self._reader = asyncio.create_task(self._read())
+    # perf_counter is a system-wide monotonic clock, so the worker's receive
+    # stamp and this reader's stamp are directly comparable.
+    await self.request("system.hello", {"trace": {"stamps": True}})
+
+  async def _read(self):
+    while True:
+      line = await self.process.stdout.readline()
+      if not line:
+        return
+      read_at = time.perf_counter()
+      message = json.loads(line)
+      future = self.pending.pop(message.get("id"), None)
+      if future is not None:
+        future.set_result(message)
+      elif self.measuring and message.get("event") == "device.counter":
+        self.counters += 1
+        trace = message.get("trace")
+        if trace:
+          self.counter_latencies.append(read_at - trace["receivedMs"] / 1000.0)
+
+  async def request(self, method: str, params=None) -> dict:
+    self._next_id += 1
+    request_id = f"bench-{self._next_id}"
+    future = asyncio.get_running_loop().create_future()
+    self.pending[request_id] = future
+    self.process.stdin.write(request_line(request_id, method, params))
+    await self.process.stdin.drain()
+    return await future
+
+  async def timed(self, method: str, params=None) -> tuple[dict, float]:
+    started = time.perf_counter()
+    response = await self.request(method, params)
+    return response, (time.perf_counter() - started) * 1000.0
+
+  async def stop(self):
+    try:
+      await self.request("system.shutdown")
+    finally:
+      self.process.stdin.close()
+      await self.process.wait()
+      await self._reader
+
+
+async def run_stdio(simulation: str, seconds: float, soak_seconds: float = 0.0) -> dict:
+  worker = WorkerProcess(simulation)
+  await worker.start()
+  try:
+    scanned, scan_ms = await worker.timed("device.scan")
+    devices = scanned["result"]["devices"]
+    _response, connect_ms = await worker.timed("device.connectMany", {"connections": connections(devices)})
+    worker.measuring = True
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    rss_before = rss_kb(worker.process.pid)
+    if soak_seconds:
+      await asyncio.sleep(soak_seconds)
+    rss_after = rss_kb(worker.process.pid)
+    worker.measuring = False
+    elapsed = time.perf_counter() - started
+    result = {
+      "devices": len(devices),
+      "scanMs": round(scan_ms, 1),
+      "connectManyMs": round(connect_ms, 1),
+      "eventsPerSecond": round(worker.counters / elapsed, 1),
+      **latency_summary(worker.counter_latencies),
+    }
+    if soak_seconds and rss_before is not None and rss_after is not None:
+      result["rssGrowthKb"] = rss_after - rss_before
+    return result
+  finally:
+    await worker.stop()
+
+
+async def run_suite(quick: bool = False) -> dict:
+  seconds = 1.0 if quick else 5.0
+  results = {}
+  saturation = await run_in_process(SimulationConfig(ble=0, usb=32, rate=5000.0, burst=10), seconds)
+  results["inprocess.saturation.32"] = {"eventsPerSecond": saturation["eventsPerSecond"]}
+  for devices in LATENCY_DEVICES:
+    in_process = await run_in_process(SimulationConfig(ble=0, usb=devices, rate=20.0), seconds)
+    results[f"inprocess.latency.{devices}"] = {key: in_process[key] for key in ("events", "p50Ms", "p99Ms")}
+    stdio = await run_stdio(f"ble=0,usb={devices},rate=20", seconds)
+    results[f"stdio.latency.{devices}"] = {
+      key: stdio[key] for key in ("eventsPerSecond", "events", "p50Ms", "p99Ms")
+    }
+  stdio = await run_stdio("ble=16,usb=16,rate=20", 0.5)
+  results["stdio.scan.32"] = {"wallMs": stdio["scanMs"]}
+  results["stdio.connectMany.32"] = {"wallMs": stdio["connectManyMs"]}
+  # 9600 presses/s offered; beyond the worker's capacity the run measures
+  # drops rather than throughput.
+  throughput = await run_stdio("ble=16,usb=16,rate=300,burst=10", seconds)
+  results["stdio.throughput.32"] = {
+    key: throughput[key] for key in ("eventsPerSecond", "events", "p50Ms", "p99Ms")
+  }
+  soak = await run_stdio("ble=16,usb=16,rate=50,burst=2,disconnectEvery=20", 1.0, 10.0 if quick else 60.0)
+  if "rssGrowthKb" in soak:
+    results["stdio.soak.32"] = {"rssGrowthKb": soak["rssGrowthKb"]}
+  return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25, p99: bool = True) -> list[dict]:
+  regressions = []
+  for scenario, metrics in results.items():
+    expected = baseline.get(scenario, {})
+    for metric, value in metrics.items():
+      if metric not in METRICS or metric not in expected:
+        continue
+      if metric == "p99Ms" and (not p99 or metrics.get("events", 0) < MIN_P99_EVENTS):
+        continue
+      direction, slack = METRICS[metric]
+      reference = expected[metric]
+      if direction == "higher":
+        regressed = value < reference * (1.0 - tolerance) - slack
+      else:
+        regressed = value > reference * (1.0 + tolerance) + slack
+      if regressed:
+        regressions.append({"scenario": scenario, "metric": metric, "baseline": reference, "current": value})
+  return regressions
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="End-to-end worker throughput and latency suite")
+  parser.add_argument("--quick", action="store_true", help="shorter runs for CI smoke checks")
+  parser.add_argument("--output", help="write results JSON to this path")
+  parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+  parser.add_argument("--update-baseline", action="store_true")
+  parser.add_argument("--tolerance", type=float, default=0.25)
+  args = parser.parse_args(argv)
+
+  report = {
+    "meta": {
+      "python": platform.python_version(),
+      "platform": sys.platform,
+      "machine": platform.machine(),
+      "quick": args.quick,
+    },
+    "results": asyncio.run(run_suite(args.quick)),
+  }
+  if os.path.exists(args.baseline) and not args.update_baseline:
+    with open(args.baseline, encoding="utf-8") as source:
+      report["regressions"] = compare(
+        report["results"], json.load(source)["results"], args.tolerance, p99=not args.quick,
+      )
+  encoded = json.dumps(report, indent=2)
+  print(encoded)
+  if args.output:
+    with open(args.output, "w", encoding="utf-8") as target:
+      target.write(encoded + "\n")
+  if args.update_baseline:
+    with open(args.baseline, "w", encoding="utf-8") as target:
+      target.write(encoded + "\n")
+  return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
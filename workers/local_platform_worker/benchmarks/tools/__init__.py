@@ -0,0 +1 @@
+"""Development-only helpers used by the benchmarks."""
@@ -0,0 +1,152 @@
+import argparse
+import os
+import selectors
+import sys
+import threading
+import time
+
+from ...ft_worker.device_protocol import UsbFrameParser
+from ...ft_worker.platform.simulated.clicker import SimulationConfig, VirtualClicker
+from ...ft_worker.platform.simulated.device_adapter import SimulationDriver
+
+try:
+  import pty
+  import tty
+except ImportError:
+  pty = None
+  tty = None
+
+
+class PtyClicker:
+  def __init__(self, farm, clicker: VirtualClicker):
+    self.farm = farm
+    self.clicker = clicker
+    self.master, self.slave = pty.openpty()
+    tty.setraw(self.slave)
+    os.set_blocking(self.master, False)
+    self.path = os.ttyname(self.slave)
+    self.command_parser = UsbFrameParser(512)
+    self.lock = threading.Lock()
+    self.overruns = 0
+
+  def deliver(self, payload: bytes):
+    frame = bytearray(self.clicker.counter_frame(payload))
+    if self.farm.noisy(self.clicker):
+      frame[-1] ^= 0x5A
+    elif self.farm.sent is not None:
+      self.farm.sent[(self.clicker.mac, payload[5:13])] = time.perf_counter()
+    self.write(frame)
+
+  def write(self, data):
+    with self.lock:
+      if self.master is None:
+        return
+      try:
+        os.write(self.master, data)
+      except (BlockingIOError, OSError):
+        self.overruns += 1
+
+  def handle_input(self):
+    try:
+      data = os.read(self.master, 4096)
+    except (BlockingIOError, OSError):
+      return
+    for frame_type, payload in self.command_parser.feed(data):
+      response = self.clicker.handle_usb_command(frame_type, payload)
+      if response is not None:
+        self.write(response)
+
+  def close(self):
+    with self.lock:
+      master, slave = self.master, self.slave
+      self.master = self.slave = None
+    if master is not None:
+      os.close(master)
+      os.close(slave)
+
+
+# Virtual USB clickers on Linux pseudo-terminals. Each port runs the FTE1
+# firmware command handler and streams counter frames, so pyserial, the
+# selector I/O engine and identify run against real tty file descriptors.
+class PtyClickerFarm:
+  def __init__(self, count: int, config: SimulationConfig | None = None, record_sent: bool = False):
+    if pty is None:
+      raise RuntimeError("Pseudo-terminals are unavailable on this platform")
+    self.config = config or SimulationConfig(ble=0, usb=count)
+    self.driver = SimulationDriver(self.config)
+    self.sent = {} if record_sent else None
+    self.ports = [
+      PtyClicker(self, VirtualClicker("USB", index, self.config.seed)) for index in range(1, count + 1)
+    ]
+    self._selector = selectors.DefaultSelector()
+    self._wake_read, self._wake_write = os.pipe()
+    self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+    for port in self.ports:
+      self._selector.register(port.master, selectors.EVENT_READ, port)
+    self._stopping = False
+    self._thread = None
+
+  @property
+  def paths(self) -> list[str]:
+    return [port.path for port in self.ports]
+
+  @property
+  def overruns(self) -> int:
+    return sum(port.overruns for port in self.ports)
+
+  def noisy(self, clicker: VirtualClicker) -> bool:
+    return self.config.noise > 0 and clicker.random.random() < self.config.noise
+
+  def start(self):
+    self._thread = threading.Thread(target=self._serve, name="ft-pty-clickers", daemon=True)
+    self._thread.start()
+    for port in self.ports:
+      self.driver.add(port, port.clicker, port.deliver, lambda: None)
+
+  def stop(self):
+    for port in self.ports:
+      self.driver.remove(port)
+    self._stopping = True
+    os.write(self._wake_write, b"\0")
+    if self._thread is not None:
+      self._thread.join(1.0)
+    for port in self.ports:
+      port.close()
+    self._selector.close()
+    os.close(self._wake_read)
+    os.close(self._wake_write)
+
+  def _serve(self):
+    while not self._stopping:
+      for key, _events in self._selector.select():
+        if key.data is not None:
+          key.data.handle_input()
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *_error):
+    self.stop()
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Serve virtual FTE1 USB clickers on pseudo-terminals")
+  parser.add_argument("--ports", type=int, default=4)
+  parser.add_argument("--rate", type=float, default=5.0, help="presses per second per port")
+  parser.add_argument("--burst", type=int, default=1)
+  parser.add_argument("--noise", type=float, default=0.0, help="fraction of frames with a bad checksum")
+  args = parser.parse_args(argv)
+  config = SimulationConfig(ble=0, usb=args.ports, rate=args.rate, burst=args.burst, noise=args.noise)
+  with PtyClickerFarm(args.ports, config) as farm:
+    for port in farm.ports:
+      print(f"{port.path}\tusb:{port.clicker.mac.hex().upper()}", flush=True)
+    try:
+      while True:
+        time.sleep(1.0)
+    except KeyboardInterrupt:
+      return
+
+
+if __name__ == "__main__":
+  sys.exit(main())
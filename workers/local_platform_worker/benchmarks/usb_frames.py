@@ -0,0 +1,98 @@
+import argparse
+import random
+import struct
+import time
+
+from ..ft_worker.device_protocol import (
+  USB_EVT_COUNTER,
+  UsbFrameParser,
+  build_usb_frame,
+  extract_usb_frames,
+)
+
+
+def build_noisy_reads(size: int, seed: int = 7, noise_ratio: float = 0.25) -> tuple[list[bytes], int]:
+  # One entry per frame or noise burst, as a latency-mode read would see them.
+  rng = random.Random(seed)
+  reads = []
+  length = 0
+  frames = 0
+  while length < size:
+    roll = rng.random()
+    if roll < noise_ratio:
+      noise = rng.randbytes(rng.randint(1, 24))
+      if rng.random() < 0.1:
+        noise += b"FTE1"
+      reads.append(noise)
+      length += len(noise)
+      continue
+    frame = bytearray(build_usb_frame(USB_EVT_COUNTER, struct.pack(
+      "<ibiiI", frames, 1, frames, 0, frames * 10 & 0xFFFFFFFF
+    )))
+    if roll < noise_ratio + 0.02:
+      frame[-1] ^= 0x5A
+    else:
+      frames += 1
+    reads.append(bytes(frame))
+    length += len(frame)
+  return reads, frames
+
+
+def build_noisy_stream(size: int, seed: int = 7, noise_ratio: float = 0.25) -> tuple[bytes, int]:
+  reads, frames = build_noisy_reads(size, seed, noise_ratio)
+  return b"".join(reads), frames
+
+
+def chunks(stream: bytes, chunk_size: int):
+  return [stream[index:index + chunk_size] for index in range(0, len(stream), chunk_size)]
+
+
+def run_legacy(parts) -> int:
+  buffer = bytearray()
+  frames = 0
+  for part in parts:
+    buffer.extend(part)
+    frames += len(extract_usb_frames(buffer))
+  return frames
+
+
+def run_parser(parts) -> int:
+  parser = UsbFrameParser()
+  frames = 0
+  for part in parts:
+    frames += len(parser.feed(part))
+  return frames
+
+
+def measure(runner, parts, repeat: int) -> tuple[int, float]:
+  best = float("inf")
+  frames = 0
+  for _ in range(repeat):
+    started = time.perf_counter()
+    frames = runner(parts)
+    best = min(best, time.perf_counter() - started)
+  return frames, best
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="USB frame parser throughput on a noisy stream")
+  parser.add_argument("--size", type=int, default=1024 * 1024)
+  parser.add_argument(
+    "--chunk", type=int, nargs="+", default=[24, 64, 4096],
+    help="fixed read sizes to replay; 24 bytes is one counter frame",
+  )
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args(argv)
+
+  reads, expected = build_noisy_reads(args.size)
+  stream = b"".join(reads)
+  scenarios = [(f"chunk={chunk}", chunks(stream, chunk)) for chunk in args.chunk]
+  scenarios.append(("chunk=per-frame", reads))
+  for label, parts in scenarios:
+    print(f"stream={len(stream)} bytes {label} expected_frames~{expected}")
+    for name, runner in (("extract_usb_frames", run_legacy), ("UsbFrameParser", run_parser)):
+      frames, seconds = measure(runner, parts, args.repeat)
+      print(f"{name:20s} frames={frames:7d} {frames / seconds:12,.0f} frames/s {seconds * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+  main()
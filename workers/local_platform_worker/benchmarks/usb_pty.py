@@ -0,0 +1,99 @@
+import argparse
+import asyncio
+import json
+import struct
+import time
+
+from ..ft_worker.devices import DeviceService
+from ..ft_worker.platform.device_adapter import BleakSerialDeviceAdapter, serial
+from ..ft_worker.platform.simulated.clicker import SimulationConfig
+from ..ft_worker.serial_io import SERIAL_READ_BULK, SERIAL_READ_LATENCY
+from .stdio_ping import percentile
+from .tools.pty_clickers import PtyClickerFarm
+
+
+class PtyPort:
+  def __init__(self, path: str):
+    self.device = path
+    self.description = "Virtual FT Counter"
+
+
+# The production pyserial adapter pointed at the farm's pseudo-terminals.
+class PtySerialAdapter(BleakSerialDeviceAdapter):
+  def __init__(self, paths):
+    self.paths = list(paths)
+
+  @property
+  def ble_available(self) -> bool:
+    return False
+
+  def list_serial_ports(self):
+    return [PtyPort(path) for path in self.paths]
+
+  def is_supported_serial_port(self, port_info) -> bool:
+    return True
+
+
+async def run(ports: int, rate: float, seconds: float, read_mode: str = SERIAL_READ_LATENCY) -> dict:
+  if serial is None:
+    raise RuntimeError("pyserial is required for the PTY benchmark")
+  config = SimulationConfig(ble=0, usb=ports, rate=rate)
+  with PtyClickerFarm(ports, config, record_sent=True) as farm:
+    latencies = []
+    measuring_since = None
+
+    async def emit(event, payload, event_id=None, stamps=None):
+      if event != "device.counter" or measuring_since is None:
+        return
+      key = (
+        bytes.fromhex(payload["deviceId"].removeprefix("usb:")),
+        struct.pack("<ii", payload["totalPlus"], payload["totalMinus"]),
+      )
+      sent_at = farm.sent.pop(key, None)
+      if sent_at is not None and sent_at >= measuring_since:
+        latencies.append(time.perf_counter() - sent_at)
+
+    service = DeviceService(PtySerialAdapter(farm.paths), emit, read_mode)
+    scan_started = time.perf_counter()
+    scanned = await service.scan()
+    scan_seconds = time.perf_counter() - scan_started
+    connected = await service.connect_many([
+      {"connectionId": f"judge-{index}", "deviceId": device["deviceId"]}
+      for index, device in enumerate(scanned["devices"])
+    ])
+    measuring_since = time.perf_counter()
+    await asyncio.sleep(seconds)
+    elapsed = time.perf_counter() - measuring_since
+    measuring_since = None
+    metrics = service.metrics()
+    await service.close()
+
+  return {
+    "ports": ports,
+    "connected": sum(1 for value in connected["connections"] if value["status"] == "connected"),
+    "readMode": read_mode,
+    "scanMs": round(scan_seconds * 1000, 1),
+    "expectedEvents": int(ports * rate * elapsed),
+    "events": len(latencies),
+    "eventsPerSecond": round(len(latencies) / elapsed, 1),
+    "p50Ms": round(percentile(latencies, 0.5) * 1000, 3),
+    "p99Ms": round(percentile(latencies, 0.99) * 1000, 3),
+    "maxMs": round(max(latencies, default=0.0) * 1000, 3),
+    "checksumFailures": sum(value["frames"]["checksumFailures"] for value in metrics.values()),
+    "overruns": farm.overruns,
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="pyserial throughput and latency against PTY clickers")
+  parser.add_argument("--ports", type=int, default=32)
+  parser.add_argument("--rate", type=float, default=20.0, help="presses per second per port")
+  parser.add_argument("--seconds", type=float, default=5.0)
+  parser.add_argument("--read-mode", choices=(SERIAL_READ_LATENCY, SERIAL_READ_BULK), action="append")
+  args = parser.parse_args(argv)
+  for read_mode in args.read_mode or [SERIAL_READ_LATENCY, SERIAL_READ_BULK]:
+    print(json.dumps(asyncio.run(run(args.ports, args.rate, args.seconds, read_mode))))
+
+
+if __name__ == "__main__":
+  main()
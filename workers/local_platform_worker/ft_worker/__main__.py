@@ -1,7 +1,5 @@
-import asyncio
-
-from .runtime import run_stdio
+from .runtime import main
 
 
 if __name__ == "__main__":
-  asyncio.run(run_stdio())
+  main()
@@ -0,0 +1,88 @@
+import asyncio
+
+from .protocol import ProtocolError, event_message
+from .tracing import TRACE_KEY
+
+
+DEFAULT_BATCH_LATENCY_MS = 2.0
+DEFAULT_BATCH_MAX_EVENTS = 64
+MAX_BATCH_LATENCY_MS = 100.0
+MAX_BATCH_EVENTS = 512
+
+
+def parse_counter_batch_options(value) -> dict | None:
+  if value is None or value is False:
+    return None
+  if value is True:
+    value = {}
+  if not isinstance(value, dict):
+    raise ProtocolError("INVALID_PARAMS", "counterBatch must be an object")
+  latency_ms = value.get("latencyMs", DEFAULT_BATCH_LATENCY_MS)
+  max_events = value.get("maxEvents", DEFAULT_BATCH_MAX_EVENTS)
+  if (
+    isinstance(latency_ms, bool) or not isinstance(latency_ms, (int, float)) or
+    not 0 < latency_ms <= MAX_BATCH_LATENCY_MS
+  ):
+    raise ProtocolError("INVALID_PARAMS", "counterBatch.latencyMs is out of range")
+  if isinstance(max_events, bool) or not isinstance(max_events, int) or not 1 <= max_events <= MAX_BATCH_EVENTS:
+    raise ProtocolError("INVALID_PARAMS", "counterBatch.maxEvents is out of range")
+  return {"latencyMs": latency_ms, "maxEvents": max_events}
+
+
+class CounterBatcher:
+  def __init__(self, sink, latency_ms=DEFAULT_BATCH_LATENCY_MS, max_events=DEFAULT_BATCH_MAX_EVENTS):
+    self.sink = sink
+    self.latency = latency_ms / 1000.0
+    self.max_events = max_events
+    self.events = []
+    self.stamps = []
+    self.batches = 0
+    self._timer = None
+    self.task = None
+
+  @property
+  def pending(self) -> int:
+    return len(self.events)
+
+  async def add(self, payload, event_id, stamps=None, trace=None):
+    entry = {"eventId": event_id, "payload": payload}
+    if trace is not None:
+      entry["trace"] = trace
+    self.events.append(entry)
+    if stamps is not None:
+      self.stamps.append(stamps)
+    if len(self.events) >= self.max_events:
+      await self.flush()
+    elif self._timer is None:
+      self._timer = asyncio.get_running_loop().call_later(self.latency, self._on_timer)
+
+  def _on_timer(self):
+    # A flush still awaiting the sink picks up these events when it loops.
+    self._timer = None
+    if self.events and (self.task is None or self.task.done()):
+      self.task = asyncio.get_running_loop().create_task(self._flush_pending())
+
+  async def _flush_pending(self):
+    while self.events:
+      await self.flush()
+
+  async def flush(self):
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+    if not self.events:
+      return
+    message = event_message("device.counterBatch", {"events": self.events})
+    if self.stamps:
+      message[TRACE_KEY] = self.stamps
+    self.events = []
+    self.stamps = []
+    self.batches += 1
+    await self.sink(message)
+
+  async def close(self):
+    task = self.task
+    self.task = None
+    if task is not None and not task.done():
+      await task
+    await self.flush()
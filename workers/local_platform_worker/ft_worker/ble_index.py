@@ -0,0 +1,56 @@
+import time
+
+
+BLE_INDEX_TTL = 10.0
+RSSI_SMOOTHING = 0.3
+
+
+class BleIndexEntry:
+  __slots__ = ("device", "name", "rssi", "last_seen")
+
+  def __init__(self, device, name: str, rssi: float, last_seen: float):
+    self.device = device
+    self.name = name
+    self.rssi = rssi
+    self.last_seen = last_seen
+
+
+# Latest advertisement per BLE address, fed by a passive scanner. RSSI is an
+# exponential moving average so the scan list does not reshuffle on every
+# packet; addresses silent for longer than the TTL are evicted.
+class BleAdvertisementIndex:
+  def __init__(self, ttl: float = BLE_INDEX_TTL, smoothing: float = RSSI_SMOOTHING):
+    self.ttl = ttl
+    self.smoothing = smoothing
+    self.entries = {}
+
+  def observe(self, device, name: str, rssi: float | None, now: float | None = None):
+    now = time.monotonic() if now is None else now
+    address = str(device.address)
+    entry = self.entries.get(address)
+    if entry is None or now - entry.last_seen > self.ttl:
+      self.entries[address] = BleIndexEntry(device, name, -1000.0 if rssi is None else float(rssi), now)
+      return
+    entry.device = device
+    entry.name = name
+    entry.last_seen = now
+    if rssi is not None:
+      entry.rssi += self.smoothing * (rssi - entry.rssi)
+
+  def get(self, address: str, now: float | None = None) -> BleIndexEntry | None:
+    entry = self.entries.get(address)
+    now = time.monotonic() if now is None else now
+    if entry is None or now - entry.last_seen > self.ttl:
+      return None
+    return entry
+
+  def snapshot(self, now: float | None = None) -> list[BleIndexEntry]:
+    now = time.monotonic() if now is None else now
+    for address in [
+      address for address, entry in self.entries.items() if now - entry.last_seen > self.ttl
+    ]:
+      del self.entries[address]
+    return list(self.entries.values())
+
+  def clear(self):
+    self.entries.clear()
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import struct
+from typing import Any
+
+from .protocol import (
+  MAX_LINE_BYTES,
+  MessageEncoder,
+  ProtocolError,
+  WorkerRequest,
+  event_message,
+  parse_request_line,
+)
+
+
+TRANSPORT_JSONL = "jsonl"
+TRANSPORT_BINARY = "binary"
+
+FRAME_HEADER = struct.Struct(">IB")
+FRAME_JSON = 0x01
+FRAME_COUNTER = 0x02
+COUNTER_BODY = struct.Struct("<B16sibiiI")
+COUNTER_TRANSPORTS = {"BLE": 1, "USB": 2}
+COUNTER_TRANSPORT_NAMES = {code: name for name, code in COUNTER_TRANSPORTS.items()}
+
+
+class JsonLineCodec:
+  name = TRANSPORT_JSONL
+
+  def __init__(self):
+    self.encoder = MessageEncoder()
+
+  async def read_request(self, reader: asyncio.StreamReader) -> bytes:
+    try:
+      return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as error:
+      return error.partial
+    except asyncio.LimitOverrunError as error:
+      consumed = error.consumed
+    # Drop the rest of the oversized line, through its newline, so its tail is
+    # not read as another request.
+    while consumed is not None:
+      await reader.readexactly(consumed)
+      consumed = None
+      try:
+        await reader.readuntil(b"\n")
+      except asyncio.IncompleteReadError:
+        pass
+      except asyncio.LimitOverrunError as error:
+        consumed = error.consumed
+    raise ProtocolError("MESSAGE_TOO_LARGE", "Worker request exceeds the size limit")
+
+  def decode_request(self, data: bytes) -> WorkerRequest:
+    return parse_request_line(data)
+
+  def encode(self, message: dict[str, Any]) -> bytes:
+    return self.encoder.encode(message).encode("utf-8")
+
+
+# Length-prefixed frames: a 4-byte big-endian body length and a 1-byte kind,
+# followed by the body. Requests and most messages carry compact JSON; counter
+# events use a fixed struct plus the two length-prefixed ids.
+class BinaryFrameCodec:
+  name = TRANSPORT_BINARY
+
+  async def read_request(self, reader: asyncio.StreamReader) -> bytes:
+    try:
+      length, kind = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+      if length > MAX_LINE_BYTES:
+        while length > 0:
+          length -= len(await reader.readexactly(min(length, 65536)))
+        raise ProtocolError("MESSAGE_TOO_LARGE", "Worker request exceeds the size limit")
+      body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+      return b""
+    if kind != FRAME_JSON:
+      raise ProtocolError("INVALID_REQUEST", "Worker request frame kind is invalid")
+    return body
+
+  def decode_request(self, data: bytes) -> WorkerRequest:
+    return parse_request_line(data)
+
+  def encode(self, message: dict[str, Any]) -> bytes:
+    body = _encode_counter_body(message)
+    if body is not None:
+      return FRAME_HEADER.pack(len(body), FRAME_COUNTER) + body
+    body = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(body), FRAME_JSON) + body
+
+
+def _encode_counter_body(message: dict[str, Any]) -> bytes | None:
+  if message.get("event") != "device.counter" or "trace" in message:
+    return None
+  payload = message["payload"]
+  event_id = message.get("eventId")
+  transport = COUNTER_TRANSPORTS.get(payload.get("transport"))
+  if transport is None or not isinstance(event_id, str) or len(event_id) != 32 or len(payload) != 8:
+    return None
+  try:
+    raw_id = bytes.fromhex(event_id)
+    connection_id = payload["connectionId"].encode("utf-8")
+    device_id = payload["deviceId"].encode("utf-8")
+    if len(connection_id) > 255 or len(device_id) > 255:
+      return None
+    return COUNTER_BODY.pack(
+      transport,
+      raw_id,
+      payload["currentTotal"],
+      payload["eventType"],
+      payload["totalPlus"],
+      payload["totalMinus"],
+      payload["deviceTimestampMs"],
+    ) + bytes((len(connection_id),)) + connection_id + bytes((len(device_id),)) + device_id
+  except (KeyError, TypeError, ValueError, struct.error):
+    return None
+
+
+def decode_frame(data: bytes) -> tuple[dict[str, Any], int]:
+  if len(data) < FRAME_HEADER.size:
+    raise ValueError("Frame header is incomplete")
+  length, kind = FRAME_HEADER.unpack_from(data)
+  end = FRAME_HEADER.size + length
+  if len(data) < end:
+    raise ValueError("Frame body is incomplete")
+  body = data[FRAME_HEADER.size:end]
+  if kind == FRAME_JSON:
+    return json.loads(body.decode("utf-8")), end
+  if kind != FRAME_COUNTER:
+    raise ValueError("Frame kind is unknown")
+  transport, raw_id, current_total, event_type, total_plus, total_minus, timestamp_ms = (
+    COUNTER_BODY.unpack_from(body)
+  )
+  offset = COUNTER_BODY.size
+  connection_id = body[offset + 1:offset + 1 + body[offset]].decode("utf-8")
+  offset += 1 + body[offset]
+  device_id = body[offset + 1:offset + 1 + body[offset]].decode("utf-8")
+  return event_message("device.counter", {
+    "connectionId": connection_id,
+    "deviceId": device_id,
+    "transport": COUNTER_TRANSPORT_NAMES[transport],
+    "currentTotal": current_total,
+    "eventType": event_type,
+    "totalPlus": total_plus,
+    "totalMinus": total_minus,
+    "deviceTimestampMs": timestamp_ms,
+  }, raw_id.hex()), end
+
+
+def create_codec(name: str):
+  if name == TRANSPORT_JSONL:
+    return JsonLineCodec()
+  if name == TRANSPORT_BINARY:
+    return BinaryFrameCodec()
+  raise ProtocolError("INVALID_PARAMS", "Unsupported worker transport")
+
@@ -1,4 +1,5 @@
 import struct
+from array import array
 from dataclasses import dataclass
 
 
@@ -11,6 +12,7 @@ USB_RSP_IDENTIFY = 0x12
 USB_RSP_COMMAND = 0x13
 USB_SERIAL_PREFIX = "usb:"
 USB_PORT_PREFIX = "usbport:"
+COUNTER_PAYLOAD = struct.Struct("<ibiiI")
 
 
 @dataclass(frozen=True)
@@ -22,6 +24,51 @@ class ClickerEvent:
   timestamp_ms: int
 
 
+# Columnar counter events for bulk reads, replay and journaling: one array
+# per field instead of an object per event.
+class ClickerEventBatch:
+  __slots__ = ("current_total", "event_type", "total_plus", "total_minus", "timestamp_ms")
+
+  def __init__(self):
+    self.current_total = array("i")
+    self.event_type = array("b")
+    self.total_plus = array("i")
+    self.total_minus = array("i")
+    self.timestamp_ms = array("I")
+
+  @classmethod
+  def from_payloads(cls, payloads) -> "ClickerEventBatch":
+    batch = cls()
+    batch.extend(b"".join(payloads))
+    return batch
+
+  def extend(self, data):
+    if len(data) % COUNTER_PAYLOAD.size:
+      raise ValueError("Data mismatch")
+    for current_total, event_type, total_plus, total_minus, timestamp_ms in COUNTER_PAYLOAD.iter_unpack(data):
+      self.current_total.append(current_total)
+      self.event_type.append(event_type)
+      self.total_plus.append(total_plus)
+      self.total_minus.append(total_minus)
+      self.timestamp_ms.append(timestamp_ms)
+
+  def __len__(self) -> int:
+    return len(self.timestamp_ms)
+
+  def rows(self):
+    return zip(self.current_total, self.event_type, self.total_plus, self.total_minus, self.timestamp_ms)
+
+  def event(self, index: int) -> ClickerEvent:
+    return ClickerEvent(
+      self.current_total[index], self.event_type[index], self.total_plus[index],
+      self.total_minus[index], self.timestamp_ms[index],
+    )
+
+  def to_bytes(self) -> bytes:
+    pack = COUNTER_PAYLOAD.pack
+    return b"".join(pack(*row) for row in self.rows())
+
+
 def build_usb_frame(frame_type: int, payload: bytes = b"") -> bytes:
   if not 0 <= frame_type <= 255:
     raise ValueError("USB frame type is out of range")
@@ -69,6 +116,208 @@ def extract_usb_frames(buffer: bytearray) -> list[tuple[int, bytes]]:
   return frames
 
 
+def _xor_fold_steps(size: int) -> tuple[tuple[int, int], ...]:
+  steps = []
+  bits = size * 8
+  while bits > 8:
+    bits = (bits + 15) // 16 * 8
+    steps.append((bits, (1 << bits) - 1))
+  return tuple(steps)
+
+
+# Shift and mask pairs that fold an n-byte little-endian integer down to the
+# XOR of its bytes, indexed by n; a frame's checked span (type, length,
+# payload, checksum) is at most 258 bytes.
+XOR_FOLD_STEPS = tuple(_xor_fold_steps(size) for size in range(259))
+# A whole counter frame: magic, then type, length, the 17-byte payload and
+# the checksum as two 64-bit words and one 32-bit word.
+COUNTER_FRAME = struct.Struct("<IQQI")
+COUNTER_FRAME_MAGIC = int.from_bytes(USB_FRAME_MAGIC, "little")
+COUNTER_FRAME_HEADER = USB_EVT_COUNTER | COUNTER_PAYLOAD.size << 8
+# Longest first, so the first match is the partial magic worth keeping.
+USB_FRAME_MAGIC_PREFIXES = tuple(USB_FRAME_MAGIC[:size] for size in range(len(USB_FRAME_MAGIC) - 1, 0, -1))
+
+
+class UsbFrameParser:
+  __slots__ = (
+    "_buffer", "_view", "_start", "_end", "frames", "resyncs", "discarded_bytes", "checksum_failures",
+  )
+
+  def __init__(self, capacity: int = 4096):
+    self._buffer = bytearray(capacity)
+    self._view = memoryview(self._buffer)
+    self._start = 0
+    self._end = 0
+    self.frames = 0
+    self.resyncs = 0
+    self.discarded_bytes = 0
+    self.checksum_failures = 0
+
+  @property
+  def pending(self) -> int:
+    return self._end - self._start
+
+  def clear(self):
+    self._start = self._end = 0
+
+  def feed(self, data) -> list[tuple[int, memoryview]]:
+    # Payload views point into the parser buffer, or into data itself, and
+    # stay valid only until the next feed(); callers copy what they keep.
+    size = len(data)
+    if self._start == self._end and isinstance(data, bytes):
+      if size == COUNTER_FRAME.size:
+        # Latency-mode reads usually deliver exactly one counter frame.
+        magic, first, second, third = COUNTER_FRAME.unpack_from(data)
+        checksum = first ^ second ^ third
+        checksum ^= checksum >> 32
+        checksum ^= checksum >> 16
+        if (
+          magic == COUNTER_FRAME_MAGIC and first & 0xFFFF == COUNTER_FRAME_HEADER and
+          not (checksum ^ checksum >> 8) & 0xFF
+        ):
+          self.frames += 1
+          return [(USB_EVT_COUNTER, memoryview(data)[6:23])]
+      # Nothing pending: parse the chunk in place and keep only its tail.
+      buffer = data
+      view = memoryview(data)
+      start = 0
+      end = size
+      in_place = True
+      discarded = resyncs = 0
+      if not data.startswith(USB_FRAME_MAGIC):
+        # Skip leading noise in one search.
+        start = data.find(USB_FRAME_MAGIC)
+        if start < 0:
+          # No frame starts here: keep at most a partial magic for the next read.
+          tail = 0
+          if data.endswith(USB_FRAME_MAGIC_PREFIXES):
+            tail = next(len(prefix) for prefix in USB_FRAME_MAGIC_PREFIXES if data.endswith(prefix))
+            self._buffer[:tail] = data[size - tail:]
+            self.resyncs += tail < size
+          self._start = 0
+          self._end = tail
+          self.discarded_bytes += size - tail
+          return []
+        resyncs = 1
+        discarded = start
+    else:
+      end = self._end
+      if end + size > len(self._buffer):
+        self._compact(size)
+        end = self._end
+      buffer = self._buffer
+      view = self._view
+      buffer[end:end + size] = data
+      end += size
+      start = self._start
+      in_place = False
+      discarded = resyncs = 0
+    unpack_counter = COUNTER_FRAME.unpack_from
+    frames = []
+    append = frames.append
+    failures = 0
+    # XOR over type, length, payload and checksum is zero for a valid frame.
+    while end - start >= 7:
+      if end - start >= 24:
+        # Counter frames are validated from a single unpack: magic and
+        # header compare as integers and the checksum folds from three words.
+        magic, first, second, third = unpack_counter(buffer, start)
+        if magic == COUNTER_FRAME_MAGIC and first & 0xFFFF == COUNTER_FRAME_HEADER:
+          checksum = first ^ second ^ third
+          checksum ^= checksum >> 32
+          checksum ^= checksum >> 16
+          if (checksum ^ checksum >> 8) & 0xFF:
+            failures += 1
+            discarded += 1
+            start += 1
+          else:
+            append((USB_EVT_COUNTER, view[start + 6:start + 23]))
+            start += 24
+          continue
+        at_magic = magic == COUNTER_FRAME_MAGIC
+      elif buffer[start + 5] == COUNTER_PAYLOAD.size and buffer[start + 4] == USB_EVT_COUNTER:
+        # Looks like the head of a counter frame: wait for the rest, which
+        # the unpack above then checks in full.
+        break
+      else:
+        at_magic = buffer.startswith(USB_FRAME_MAGIC, start)
+      if not at_magic:
+        index = buffer.find(USB_FRAME_MAGIC, start + 1, end)
+        if index < 0:
+          # Keep a possible partial magic at the tail for the next chunk.
+          index = max(start, end - 3)
+          discarded += index - start
+          start = index
+          break
+        resyncs += 1
+        discarded += index - start
+        start = index
+        continue
+      length = buffer[start + 5]
+      frame_end = start + 7 + length
+      if frame_end > end:
+        break
+      checksum = int.from_bytes(view[start + 4:frame_end], "little")
+      for bits, mask in XOR_FOLD_STEPS[length + 3]:
+        checksum = checksum >> bits ^ checksum & mask
+      if checksum:
+        failures += 1
+        discarded += 1
+        start += 1
+        continue
+      append((buffer[start + 4], view[start + 6:frame_end - 1]))
+      start = frame_end
+    if start < end < start + 7 and buffer[start] != USB_FRAME_MAGIC[0]:
+      # A short leftover that cannot begin a frame is noise; dropping it lets
+      # the next read parse in place.
+      index = buffer.find(USB_FRAME_MAGIC[:1], start + 1, end)
+      if index < 0:
+        index = end
+      else:
+        resyncs += 1
+      discarded += index - start
+      start = index
+    if discarded:
+      self.discarded_bytes += discarded
+      self.checksum_failures += failures
+      self.resyncs += resyncs
+    self.frames += len(frames)
+    if in_place:
+      tail = end - start
+      if tail > len(self._buffer):
+        self._compact(tail)
+      self._buffer[:tail] = data[start:]
+      self._start = 0
+      self._end = tail
+    else:
+      if start == end:
+        start = end = 0
+      self._start = start
+      self._end = end
+    return frames
+
+  def snapshot(self) -> dict:
+    return {
+      "frames": self.frames,
+      "resyncs": self.resyncs,
+      "discardedBytes": self.discarded_bytes,
+      "checksumFailures": self.checksum_failures,
+    }
+
+  def _compact(self, incoming: int):
+    pending = self._end - self._start
+    if pending + incoming > len(self._buffer):
+      # Growing swaps in a new buffer, so views handed out earlier stay intact.
+      grown = bytearray(max(len(self._buffer) * 2, pending + incoming))
+      grown[:pending] = self._buffer[self._start:self._end]
+      self._buffer = grown
+      self._view = memoryview(grown)
+    elif pending:
+      self._buffer[:pending] = self._buffer[self._start:self._end]
+    self._start = 0
+    self._end = pending
+
+
 def parse_identify_payload(payload: bytes) -> tuple[str, str]:
   if len(payload) < 7:
     raise ValueError("identify payload too short")
@@ -92,4 +341,4 @@ def build_usb_port_address(port_path: str) -> str:
 def parse_notification_data(data: bytes) -> ClickerEvent:
   if len(data) != 17:
     raise ValueError("Data mismatch")
-  return ClickerEvent(*struct.unpack("<ibiiI", data))
+  return ClickerEvent(*COUNTER_PAYLOAD.unpack(data))
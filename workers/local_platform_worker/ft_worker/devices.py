@@ -1,23 +1,33 @@
 import asyncio
 import hashlib
+import struct
+import sys
 import threading
 import time
 import uuid
+from collections import deque
 from typing import Any, Awaitable, Callable
 
 from .device_protocol import (
+  COUNTER_PAYLOAD,
   USB_CMD_IDENTIFY,
   USB_CMD_RENAME,
   USB_CMD_RESET,
   USB_EVT_COUNTER,
   USB_RSP_COMMAND,
   USB_RSP_IDENTIFY,
+  ClickerEventBatch,
+  UsbFrameParser,
   build_usb_frame,
   build_usb_port_address,
-  extract_usb_frames,
   parse_identify_payload,
   parse_notification_data,
 )
+from .ble_index import BleAdvertisementIndex
+from .handoff import LoopHandoff
+from .identity_cache import UsbIdentityCache, port_hardware_key
+from .metrics import LatencyHistogram, RateMeter
+from .serial_io import SERIAL_READ_LATENCY, SerialIoEngine, _read_serial_chunk
 
 
 # UUIDs are derived from the NimBLE BLE_UUID128_INIT declarations in
@@ -28,6 +38,17 @@ CHARACTERISTIC_UUID = "025018d0-6951-4a81-de4f-453d8dae9128"
 ACTIVATION_UUID = "035018d0-6951-4a81-de4f-453d8dae9128"
 DEVICE_NAME_UUID = "00002a00-0000-1000-8000-00805f9b34fb"
 DEVICE_NAME_PREFIX = "Counter-"
+USB_IDENTIFY_TIMEOUT = 0.35
+USB_IDENTIFY_CONCURRENCY = 16
+USB_SCAN_DEADLINE = 1.0
+USB_RECONNECT_DELAY = 3.0
+BLE_INDEX_SETTLE = 1.5
+BLE_CONNECT_CONCURRENCY = 8
+USB_CONNECT_CONCURRENCY = 16
+CONNECT_RETRY_DELAY = 0.5
+RETRYABLE_CONNECT_ERRORS = frozenset((
+  "BLE_CONNECTION_TIMEOUT", "BLE_DEVICE_NOT_FOUND", "BLE_UNAVAILABLE", "USB_DEVICE_NOT_FOUND", "USB_PORT_BUSY",
+))
 
 
 class DeviceError(Exception):
@@ -37,28 +58,60 @@ class DeviceError(Exception):
     self.message = message
 
 
-def _event_id(device_id: str, event) -> str:
-  identity = (
-    f"{device_id}:{event.timestamp_ms}:{event.event_type}:"
-    f"{event.total_plus}:{event.total_minus}"
-  )
-  return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+# Packed event identity: a 3-byte device tag, then the device timestamp,
+# cumulative totals and event type. 16 bytes render as the 32-hex eventId.
+EVENT_ID_FORMAT = struct.Struct("<3sIiib")
+EVENT_DEDUPE_WINDOW = 64
+
+
+def _device_tag(device_id: str) -> bytes:
+  return hashlib.blake2b(device_id.encode("utf-8"), digest_size=3).digest()
+
+
+def _event_id(device_tag: bytes, timestamp_ms: int, total_plus: int, total_minus: int, event_type: int) -> str:
+  return EVENT_ID_FORMAT.pack(device_tag, timestamp_ms, total_plus, total_minus, event_type).hex()
+
+
+# Ids of one device's most recent counters. A reconnect can redeliver the
+# last notification; exact repeats inside the window are dropped.
+class RecentEventIds:
+  def __init__(self, size: int = EVENT_DEDUPE_WINDOW):
+    self.order = deque(maxlen=size)
+    self.ids = set()
+    self.duplicates = 0
+
+  def seen(self, event_id: str) -> bool:
+    if event_id in self.ids:
+      self.duplicates += 1
+      return True
+    if len(self.order) == self.order.maxlen:
+      self.ids.discard(self.order[0])
+    self.order.append(event_id)
+    self.ids.add(event_id)
+    return False
 
 
 def _read_usb_frame(ser, expect_type: int, timeout: float = 0.5):
-  buffer = bytearray()
+  parser = UsbFrameParser(512)
   deadline = time.monotonic() + timeout
   while time.monotonic() < deadline:
-    chunk = ser.read(128)
+    chunk = _read_serial_chunk(ser)
     if not chunk:
       continue
-    buffer.extend(chunk)
-    for frame_type, payload in extract_usb_frames(buffer):
+    for frame_type, payload in parser.feed(chunk):
       if frame_type == expect_type:
-        return payload
+        return bytes(payload)
   raise DeviceError("USB_DEVICE_NOT_FOUND", "USB device did not respond")
 
 
+def _counter_advertisement_name(device, advertisement) -> str | None:
+  name = advertisement.local_name or device.name or "Unknown"
+  service_uuids = [str(value).lower() for value in advertisement.service_uuids or []]
+  if not name.startswith(DEVICE_NAME_PREFIX) and SERVICE_UUID not in service_uuids:
+    return None
+  return name
+
+
 def _identify_serial(adapter, port_path: str, timeout: float = 0.5):
   ser = adapter.open_serial(port_path)
   try:
@@ -86,6 +139,12 @@ class BleSession:
     self.heartbeat_task = None
     self.loop = asyncio.get_running_loop()
     self.connect_lock = asyncio.Lock()
+    self.receive_latency = LatencyHistogram()
+    self.counter_rate = RateMeter()
+    self.counter_handoff = LoopHandoff(self.loop, self._emit_counter)
+    self.device_tag = _device_tag(device_id)
+    self.recent_ids = RecentEventIds()
+    self.reconnect_attempts = 0
 
   async def connect(self):
     self.intentional_disconnect = False
@@ -124,15 +183,18 @@ class BleSession:
         self.heartbeat_task = asyncio.create_task(self._heartbeat())
 
   def _on_notification(self, _sender, data):
+    received_at = time.perf_counter()
     try:
       event = parse_notification_data(bytes(data))
     except ValueError:
       return
-    self.loop.call_soon_threadsafe(
-      lambda: asyncio.create_task(self._emit_counter(event))
-    )
+    self.counter_handoff.push(event, received_at)
 
-  async def _emit_counter(self, event):
+  async def _emit_counter(self, event, received_at, dispatched_at):
+    event_id = _event_id(self.device_tag, event.timestamp_ms, event.total_plus, event.total_minus, event.event_type)
+    if self.recent_ids.seen(event_id):
+      return
+    emitted_at = time.perf_counter()
     await self.emit("device.counter", {
       "connectionId": self.connection_id,
       "deviceId": self.device_id,
@@ -142,7 +204,20 @@ class BleSession:
       "totalPlus": event.total_plus,
       "totalMinus": event.total_minus,
       "deviceTimestampMs": event.timestamp_ms,
-    }, _event_id(self.device_id, event))
+    }, event_id, (received_at, dispatched_at, emitted_at))
+    now = time.perf_counter()
+    self.receive_latency.record_since(received_at, now)
+    self.counter_rate.mark(now)
+
+  def metrics(self, now: float) -> dict:
+    return {
+      "transport": "BLE",
+      "counters": self.counter_rate.snapshot(now),
+      "receiveLatency": self.receive_latency.snapshot(),
+      "reconnectAttempts": self.reconnect_attempts,
+      "handoff": self.counter_handoff.snapshot(),
+      "duplicates": self.recent_ids.duplicates,
+    }
 
   def _on_disconnected(self, _client):
     if self.intentional_disconnect:
@@ -161,6 +236,7 @@ class BleSession:
     })
     while not self.intentional_disconnect:
       await asyncio.sleep(3.0)
+      self.reconnect_attempts += 1
       try:
         await self._connect_once()
         return
@@ -226,7 +302,10 @@ class BleSession:
 
 
 class SerialSession:
-  def __init__(self, connection_id, device_id, port_path, adapter, resolve_path, emit):
+  def __init__(
+    self, connection_id, device_id, port_path, adapter, resolve_path, emit,
+    read_mode=SERIAL_READ_LATENCY, io_engine=None, identity_cache=None,
+  ):
     self.connection_id = connection_id
     self.device_id = device_id
     self.port_path = port_path
@@ -234,17 +313,34 @@ class SerialSession:
     self.resolve_path = resolve_path
     self.emit = emit
     self.serial = None
-    self.reader_thread = None
-    self.stop_event = threading.Event()
-    self.io_lock = threading.Lock()
+    self.frame_parser = UsbFrameParser()
+    self.io_engine = io_engine or SerialIoEngine()
+    self.identity_cache = identity_cache
+    self.write_lock = threading.Lock()
+    self.pending_responses = {}
     self.intentional_disconnect = False
     self.reconnect_task = None
     self.loop = asyncio.get_running_loop()
+    self.read_mode = read_mode
+    self.receive_latency = LatencyHistogram()
+    self.counter_rate = RateMeter()
+    self.counter_handoff = LoopHandoff(self.loop, self._emit_counters)
+    self.device_tag = _device_tag(device_id)
+    self.recent_ids = RecentEventIds()
+    self.reconnect_attempts = 0
+    self.reconnect_wakeup = asyncio.Event()
 
   async def connect(self):
     self.intentional_disconnect = False
     await self._connect_once()
 
+  @property
+  def reconnecting(self) -> bool:
+    return self.reconnect_task is not None and not self.reconnect_task.done()
+
+  def retry_now(self):
+    self.reconnect_wakeup.set()
+
   async def _connect_once(self):
     await self.emit("device.status", {
       "connectionId": self.connection_id,
@@ -255,13 +351,11 @@ class SerialSession:
     if latest_path:
       self.port_path = latest_path
     await asyncio.to_thread(self._open_sync)
-    self.stop_event.clear()
-    self.reader_thread = threading.Thread(
-      target=self._reader_worker,
-      name=f"ft-worker-{self.connection_id}",
-      daemon=True,
+    self.frame_parser.clear()
+    await asyncio.to_thread(
+      self.io_engine.register,
+      self.serial, self._on_serial_data, self._on_serial_error, self.read_mode,
     )
-    self.reader_thread.start()
     await self.emit("device.status", {
       "connectionId": self.connection_id,
       "deviceId": self.device_id,
@@ -272,13 +366,14 @@ class SerialSession:
     try:
       self.serial = self.adapter.open_serial(self.port_path)
       time.sleep(0.05)
-      with self.io_lock:
-        self.serial.reset_input_buffer()
-        self.serial.write(build_usb_frame(USB_CMD_IDENTIFY))
-        self.serial.flush()
-        payload = _read_usb_frame(self.serial, USB_RSP_IDENTIFY, 0.8)
+      self.serial.reset_input_buffer()
+      self.serial.write(build_usb_frame(USB_CMD_IDENTIFY))
+      self.serial.flush()
+      payload = _read_usb_frame(self.serial, USB_RSP_IDENTIFY, 0.8)
       stable_id, _name = parse_identify_payload(payload)
       if self.device_id.startswith("usb:") and stable_id != self.device_id:
+        if self.identity_cache is not None:
+          self.identity_cache.invalidate(self.device_id, self.port_path)
         raise DeviceError("USB_DEVICE_NOT_FOUND", "USB identity changed")
     except DeviceError:
       self._close_sync()
@@ -289,40 +384,52 @@ class SerialSession:
         self.adapter.map_serial_error(error), "USB connection failed"
       ) from error
 
-  def _reader_worker(self):
-    buffer = bytearray()
-    try:
-      while not self.stop_event.is_set() and self.serial:
-        with self.io_lock:
-          chunk = self.serial.read(128)
-        if not chunk:
-          continue
-        buffer.extend(chunk)
-        for frame_type, payload in extract_usb_frames(buffer):
-          if frame_type != USB_EVT_COUNTER:
-            continue
-          try:
-            event = parse_notification_data(payload)
-          except ValueError:
-            continue
-          self.loop.call_soon_threadsafe(
-            lambda value=event: asyncio.create_task(self._emit_counter(value))
-          )
-    except Exception:
-      if not self.intentional_disconnect:
-        self.loop.call_soon_threadsafe(self._start_reconnect)
+  def _on_serial_data(self, chunk, received_at):
+    counters = []
+    for frame_type, payload in self.frame_parser.feed(chunk):
+      if frame_type in (USB_RSP_COMMAND, USB_RSP_IDENTIFY):
+        self.loop.call_soon_threadsafe(self._resolve_response, frame_type, bytes(payload))
+        continue
+      if frame_type == USB_EVT_COUNTER and len(payload) == COUNTER_PAYLOAD.size:
+        counters.append(payload)
+    if counters:
+      # Every counter frame of a chunk crosses to the loop as one batch.
+      self.counter_handoff.push(ClickerEventBatch.from_payloads(counters), received_at)
 
-  async def _emit_counter(self, event):
-    await self.emit("device.counter", {
-      "connectionId": self.connection_id,
-      "deviceId": self.device_id,
+  def _on_serial_error(self, _error):
+    if not self.intentional_disconnect:
+      self.loop.call_soon_threadsafe(self._start_reconnect)
+
+  async def _emit_counters(self, batch, received_at, dispatched_at):
+    for current_total, event_type, total_plus, total_minus, timestamp_ms in batch.rows():
+      event_id = _event_id(self.device_tag, timestamp_ms, total_plus, total_minus, event_type)
+      if self.recent_ids.seen(event_id):
+        continue
+      emitted_at = time.perf_counter()
+      await self.emit("device.counter", {
+        "connectionId": self.connection_id,
+        "deviceId": self.device_id,
+        "transport": "USB",
+        "currentTotal": current_total,
+        "eventType": event_type,
+        "totalPlus": total_plus,
+        "totalMinus": total_minus,
+        "deviceTimestampMs": timestamp_ms,
+      }, event_id, (received_at, dispatched_at, emitted_at))
+      now = time.perf_counter()
+      self.receive_latency.record_since(received_at, now)
+      self.counter_rate.mark(now)
+
+  def metrics(self, now: float) -> dict:
+    return {
       "transport": "USB",
-      "currentTotal": event.current_total,
-      "eventType": event.event_type,
-      "totalPlus": event.total_plus,
-      "totalMinus": event.total_minus,
-      "deviceTimestampMs": event.timestamp_ms,
-    }, _event_id(self.device_id, event))
+      "counters": self.counter_rate.snapshot(now),
+      "receiveLatency": self.receive_latency.snapshot(),
+      "reconnectAttempts": self.reconnect_attempts,
+      "handoff": self.counter_handoff.snapshot(),
+      "duplicates": self.recent_ids.duplicates,
+      "frames": self.frame_parser.snapshot(),
+    }
 
   def _start_reconnect(self):
     if self.reconnect_task is None or self.reconnect_task.done():
@@ -336,27 +443,67 @@ class SerialSession:
       "status": "error",
     })
     while not self.intentional_disconnect:
-      await asyncio.sleep(3.0)
+      # The port watcher cuts the wait short when the port comes back.
+      self.reconnect_wakeup.clear()
+      try:
+        await asyncio.wait_for(self.reconnect_wakeup.wait(), USB_RECONNECT_DELAY)
+      except asyncio.TimeoutError:
+        pass
+      self.reconnect_attempts += 1
       try:
         await self._connect_once()
         return
       except Exception:
         continue
 
-  def _send_command_sync(self, command: int, payload: bytes = b"", expect_response=False):
+  @staticmethod
+  def _response_key(frame_type: int, payload: bytes):
+    # Command acknowledgements echo the command byte, so concurrent commands
+    # of different kinds resolve independently; identical ones resolve FIFO.
+    if frame_type == USB_RSP_COMMAND:
+      return frame_type, payload[0] if payload else None
+    return frame_type, None
+
+  def _resolve_response(self, frame_type: int, payload: bytes):
+    waiters = self.pending_responses.get(self._response_key(frame_type, payload))
+    while waiters:
+      future = waiters.popleft()
+      if not future.done():
+        future.set_result(payload)
+        return
+
+  def _write_sync(self, frame: bytes):
+    serial_handle = self.serial
+    if not serial_handle:
+      raise DeviceError("USB_DEVICE_NOT_FOUND", "USB device is disconnected")
+    with self.write_lock:
+      serial_handle.write(frame)
+      serial_handle.flush()
+
+  async def _send_command(self, command: int, payload: bytes = b"", response_type=None):
     if not self.serial:
       raise DeviceError("USB_DEVICE_NOT_FOUND", "USB device is disconnected")
-    with self.io_lock:
-      self.serial.reset_input_buffer()
-      self.serial.write(build_usb_frame(command, payload))
-      self.serial.flush()
-      if not expect_response:
+    future = None
+    waiters = None
+    if response_type is not None:
+      future = self.loop.create_future()
+      key = self._response_key(response_type, bytes((command,)))
+      waiters = self.pending_responses.setdefault(key, deque())
+      waiters.append(future)
+    try:
+      await asyncio.to_thread(self._write_sync, build_usb_frame(command, payload))
+      if future is None:
         return None
-      return _read_usb_frame(self.serial, USB_RSP_COMMAND, 0.8)
+      return await asyncio.wait_for(future, 0.8)
+    except asyncio.TimeoutError as error:
+      raise DeviceError("USB_DEVICE_NOT_FOUND", "USB device did not respond") from error
+    finally:
+      if future is not None and future in waiters:
+        waiters.remove(future)
 
   async def reset(self):
     try:
-      await asyncio.to_thread(self._send_command_sync, USB_CMD_RESET)
+      await self._send_command(USB_CMD_RESET)
     except DeviceError:
       raise
     except Exception as error:
@@ -364,8 +511,8 @@ class SerialSession:
 
   async def rename(self, name: str):
     try:
-      response = await asyncio.to_thread(
-        self._send_command_sync, USB_CMD_RENAME, name.encode("utf-8"), True
+      response = await self._send_command(
+        USB_CMD_RENAME, name.encode("utf-8"), USB_RSP_COMMAND
       )
     except DeviceError:
       raise
@@ -373,6 +520,8 @@ class SerialSession:
       raise DeviceError(self.adapter.map_serial_error(error), "USB rename failed") from error
     if not response or len(response) < 2 or response[0] != USB_CMD_RENAME or response[1] != 0:
       raise DeviceError("USB_COMMAND_REJECTED", "USB rename was rejected")
+    if self.identity_cache is not None:
+      self.identity_cache.rename(self.device_id, name)
 
   async def disconnect(self):
     self.intentional_disconnect = True
@@ -381,12 +530,7 @@ class SerialSession:
     if reconnect_task and reconnect_task is not asyncio.current_task() and not reconnect_task.done():
       reconnect_task.cancel()
       await asyncio.gather(reconnect_task, return_exceptions=True)
-    self.stop_event.set()
     await asyncio.to_thread(self._close_sync)
-    thread = self.reader_thread
-    self.reader_thread = None
-    if thread and thread.is_alive():
-      await asyncio.to_thread(thread.join, 0.5)
     await self.emit("device.status", {
       "connectionId": self.connection_id,
       "deviceId": self.device_id,
@@ -397,6 +541,7 @@ class SerialSession:
     serial_handle = self.serial
     self.serial = None
     if serial_handle:
+      self.io_engine.unregister(serial_handle)
       try:
         serial_handle.close()
       except Exception:
@@ -404,85 +549,306 @@ class SerialSession:
 
 
 class DeviceService:
-  def __init__(self, adapter, emit: Callable[..., Awaitable[None]]):
+  def __init__(
+    self, adapter, emit: Callable[..., Awaitable[None]], serial_read_mode=SERIAL_READ_LATENCY,
+    identity_cache=None,
+  ):
     self.adapter = adapter
     self.emit = emit
+    self.serial_read_mode = serial_read_mode
+    self.serial_io = SerialIoEngine()
+    self.usb_scan_deadline = USB_SCAN_DEADLINE
+    self.identity_cache = identity_cache or UsbIdentityCache()
     self.ble_devices = {}
     self.usb_devices = {}
     self.sessions = {}
+    self.watch_task = None
+    self.watch_remarks = {}
+    self.ble_index = None
+    self.ble_watch = None
+    self.ble_index_lock = asyncio.Lock()
+    self.connect_limits = {"BLE": BLE_CONNECT_CONCURRENCY, "USB": USB_CONNECT_CONCURRENCY}
 
-  async def scan(self, flush=False, remarks=None):
+  async def scan(self, flush=False, remarks=None, on_device=None):
     if flush:
       self.ble_devices.clear()
       self.usb_devices.clear()
     remarks = remarks if isinstance(remarks, dict) else {}
     errors = []
+    reports = []
+
+    def report(device):
+      if on_device is not None:
+        reports.append(asyncio.create_task(on_device(device)))
+
+    # BLE and USB discovery run side by side; with on_device every device is
+    # reported as soon as it is seen, while the result keeps the usual order.
+    ble_devices, usb_devices = await asyncio.gather(
+      self._scan_ble(flush, remarks, errors, report, on_device is not None),
+      self._scan_usb(flush, remarks, report),
+    )
+    if reports:
+      await asyncio.gather(*reports)
+    devices = ble_devices + usb_devices
+    devices.sort(key=lambda value: value.get("rssi", -1000), reverse=True)
+    return {"devices": devices, "errors": errors}
+
+  async def _scan_ble(self, flush, remarks, errors, report, streaming):
     devices = []
+    if not self.adapter.ble_available:
+      return devices
 
-    if self.adapter.ble_available:
-      try:
-        discovered = await self.adapter.scan_ble(1.5 if flush else 0.8)
-        for device, advertisement in discovered:
-          name = advertisement.local_name or device.name or "Unknown"
-          service_uuids = [str(value).lower() for value in advertisement.service_uuids or []]
-          if not name.startswith(DEVICE_NAME_PREFIX) and SERVICE_UUID not in service_uuids:
-            continue
-          device_id = str(device.address)
-          rssi = advertisement.rssi if isinstance(advertisement.rssi, (int, float)) else -1000
-          self.ble_devices[device_id] = device
-          devices.append({
-            "name": name,
-            "address": device_id,
-            "deviceId": device_id,
-            "rssi": rssi,
-            "remark": str(remarks.get(device_id) or ""),
-            "transport": "BLE",
-          })
-      except Exception as error:
-        errors.append({"transport": "BLE", "code": self.adapter.map_ble_error(error)})
-
-    if self.adapter.usb_available:
-      ports = await asyncio.to_thread(self.adapter.list_serial_ports)
-      for port_info in ports:
-        if not self.adapter.is_supported_serial_port(port_info):
-          continue
-        port_path = str(port_info.device)
+    def found(device, name, rssi):
+      device_id = str(device.address)
+      self.ble_devices[device_id] = device
+      entry = {
+        "name": name,
+        "address": device_id,
+        "deviceId": device_id,
+        "rssi": rssi,
+        "remark": str(remarks.get(device_id) or ""),
+        "transport": "BLE",
+      }
+      devices.append(entry)
+      report(entry)
+
+    try:
+      if streaming and self.ble_index is None:
+        await self._stream_ble(1.5 if flush else 0.8, found)
+      else:
+        for device, name, rssi in await self._discover_ble(flush):
+          found(device, name, rssi)
+    except Exception as error:
+      errors.append({"transport": "BLE", "code": self.adapter.map_ble_error(error)})
+    return devices
+
+  async def _stream_ble(self, timeout: float, found):
+    seen = set()
+
+    def observe(device, advertisement):
+      name = _counter_advertisement_name(device, advertisement)
+      if name is None or str(device.address) in seen:
+        return
+      seen.add(str(device.address))
+      found(device, name, advertisement.rssi if isinstance(advertisement.rssi, (int, float)) else -1000)
+
+    watch = await self.adapter.watch_ble(observe)
+    try:
+      await asyncio.sleep(timeout)
+    finally:
+      await watch.stop()
+
+  async def _discover_ble(self, flush: bool):
+    if self.ble_index is not None:
+      if flush:
+        # A flush waits for the passive scanner to refill the index instead
+        # of starting a second scanner next to it.
+        self.ble_index.clear()
+        await asyncio.sleep(BLE_INDEX_SETTLE)
+      return [(entry.device, entry.name, round(entry.rssi)) for entry in self.ble_index.snapshot()]
+    discovered = []
+    for device, advertisement in await self.adapter.scan_ble(1.5 if flush else 0.8):
+      name = _counter_advertisement_name(device, advertisement)
+      if name is not None:
+        rssi = advertisement.rssi if isinstance(advertisement.rssi, (int, float)) else -1000
+        discovered.append((device, name, rssi))
+    return discovered
+
+  async def _scan_usb(self, flush, remarks, report):
+    devices = []
+    if not self.adapter.usb_available:
+      return devices
+    ports = await asyncio.to_thread(self.adapter.list_serial_ports)
+    ports = [port_info for port_info in ports if self.adapter.is_supported_serial_port(port_info)]
+    by_path = {str(port_info.device): port_info for port_info in ports}
+    # A flush probes every port again, except the ones open in a session.
+    identities = await self._usb_identities(
+      ports, self._owned_ports() if flush else (),
+      on_identity=lambda port_path, identity: report(self._usb_device(by_path[port_path], identity, remarks)),
+      refresh=flush,
+    )
+    for port_info in ports:
+      identity = identities.get(str(port_info.device))
+      device = self._usb_device(port_info, identity, remarks)
+      if identity is None:
+        report(device)
+      self.usb_devices[device["deviceId"]] = str(port_info.device)
+      devices.append(device)
+    return devices
+
+  async def _usb_identities(self, ports, skip_paths=(), on_identity=None, refresh=False):
+    identities = {}
+    probes = []
+    for port_info in ports:
+      port_path = str(port_info.device)
+      probe = port_path not in skip_paths
+      cached = None if refresh and probe else self.identity_cache.lookup(port_info)
+      if cached is not None:
+        identities[port_path] = cached
+        if on_identity is not None:
+          on_identity(port_path, cached)
+      elif probe:
+        probes.append(port_info)
+    identities.update(await self._identify_ports(probes, on_identity))
+    for port_info in ports:
+      port_path = str(port_info.device)
+      identity = identities.get(port_path)
+      if identity is not None:
+        self.identity_cache.store(port_info, *identity)
+      elif refresh and port_path not in skip_paths:
+        self.identity_cache.invalidate(port_path=port_path)
+    return identities
+
+  def _owned_ports(self) -> dict[str, str]:
+    owned = {}
+    for session in self.sessions.values():
+      if isinstance(session, SerialSession) and session.serial is not None:
+        owned[session.port_path] = session.device_id
+    return owned
+
+  def _usb_device(self, port_info, identity, remarks) -> dict[str, Any]:
+    if identity is not None:
+      device_id, name = identity
+    else:
+      device_id = build_usb_port_address(str(port_info.device))
+      name = str(
+        getattr(port_info, "description", None) or
+        getattr(port_info, "product", None) or
+        "USB Serial/JTAG"
+      )
+    return {
+      "name": name,
+      "address": device_id,
+      "deviceId": device_id,
+      "rssi": -1000,
+      "remark": str(remarks.get(device_id) or ""),
+      "transport": "USB",
+    }
+
+  async def _identify_ports(self, ports, on_identity=None):
+    # Probes run in parallel threads; a probe still running at the deadline is
+    # left to finish and close its port in the background.
+    limiter = asyncio.Semaphore(USB_IDENTIFY_CONCURRENCY)
+    identities = {}
+
+    async def identify(port_path):
+      async with limiter:
         try:
-          device_id, name = await asyncio.to_thread(
-            _identify_serial, self.adapter, port_path, 0.35
+          identity = await asyncio.to_thread(
+            _identify_serial, self.adapter, port_path, USB_IDENTIFY_TIMEOUT
           )
         except Exception:
-          device_id = build_usb_port_address(port_path)
-          name = str(
-            getattr(port_info, "description", None) or
-            getattr(port_info, "product", None) or
-            "USB Serial/JTAG"
-          )
-        self.usb_devices[device_id] = port_path
-        devices.append({
-          "name": name,
-          "address": device_id,
-          "deviceId": device_id,
-          "rssi": -1000,
-          "remark": str(remarks.get(device_id) or ""),
-          "transport": "USB",
-        })
+          return
+      identities[port_path] = identity
+      if on_identity is not None:
+        on_identity(port_path, identity)
 
-    devices.sort(key=lambda value: value.get("rssi", -1000), reverse=True)
-    return {"devices": devices, "errors": errors}
+    tasks = [asyncio.create_task(identify(str(port_info.device))) for port_info in ports]
+    if tasks:
+      _done, pending = await asyncio.wait(tasks, timeout=self.usb_scan_deadline)
+      for task in pending:
+        task.cancel()
+    return dict(identities)
+
+  async def watch(self, interval: float, remarks=None, ble=False):
+    if self.watch_task is not None:
+      self.watch_task.cancel()
+      self.watch_task = None
+    self.watch_remarks = remarks if isinstance(remarks, dict) else {}
+    if interval > 0 and self.adapter.usb_available:
+      self.watch_task = asyncio.create_task(self._watch_ports(interval))
+    # The BLE index follows ble alone; interval 0 only stops the port poll.
+    await self._set_ble_index(ble)
+    return {"watching": self.watch_task is not None, "ble": self.ble_index is not None}
+
+  async def stop_watch(self):
+    task = self.watch_task
+    self.watch_task = None
+    if task is not None and not task.done():
+      task.cancel()
+      await asyncio.gather(task, return_exceptions=True)
+    await self._set_ble_index(False)
+
+  async def _set_ble_index(self, enabled: bool):
+    async with self.ble_index_lock:
+      if enabled and self.ble_index is None and self.adapter.ble_available:
+        index = BleAdvertisementIndex()
+
+        def observe(device, advertisement):
+          name = _counter_advertisement_name(device, advertisement)
+          if name is not None:
+            rssi = advertisement.rssi if isinstance(advertisement.rssi, (int, float)) else None
+            index.observe(device, name, rssi)
+
+        try:
+          self.ble_watch = await self.adapter.watch_ble(observe)
+        except Exception as error:
+          raise DeviceError(self.adapter.map_ble_error(error), "BLE advertisement watch failed") from error
+        self.ble_index = index
+      elif not enabled and self.ble_index is not None:
+        ble_watch = self.ble_watch
+        self.ble_index = None
+        self.ble_watch = None
+        try:
+          await ble_watch.stop()
+        except Exception:
+          pass
+
+  async def _watch_ports(self, interval: float):
+    # Diffs port listings by path and hardware key, so only ports that
+    # appeared since the last listing are identified.
+    known = {}
+    while True:
+      try:
+        ports = await asyncio.to_thread(self.adapter.list_serial_ports)
+        ports = [port_info for port_info in ports if self.adapter.is_supported_serial_port(port_info)]
+        current = {(str(port_info.device), port_hardware_key(port_info)): port_info for port_info in ports}
+        for key in [key for key in known if key not in current]:
+          device = known.pop(key)
+          if self.usb_devices.get(device["deviceId"]) == key[0]:
+            del self.usb_devices[device["deviceId"]]
+          await self.emit("device.lost", {
+            "deviceId": device["deviceId"], "address": device["address"], "transport": "USB",
+          })
+        appeared = [port_info for key, port_info in current.items() if key not in known]
+        if appeared:
+          await self._discover_ports(appeared, known)
+      except Exception as error:
+        print(f"[Worker] Serial port watch failed: {error}", file=sys.stderr)
+      await asyncio.sleep(interval)
+
+  async def _discover_ports(self, ports, known):
+    owned = self._owned_ports()
+    identities = await self._usb_identities(ports, owned)
+    for port_info in ports:
+      port_path = str(port_info.device)
+      identity = identities.get(port_path)
+      if identity is None and port_path in owned:
+        identity = (owned[port_path], str(getattr(port_info, "description", None) or owned[port_path]))
+      device = self._usb_device(port_info, identity, self.watch_remarks)
+      known[(port_path, port_hardware_key(port_info))] = device
+      self.usb_devices[device["deviceId"]] = port_path
+      await self.emit("device.discovered", device)
+      for session in self.sessions.values():
+        if isinstance(session, SerialSession) and session.device_id == device["deviceId"] and session.reconnecting:
+          session.retry_now()
 
   async def connect(self, connection_id: str, device_id: str):
     if connection_id in self.sessions:
       raise DeviceError("DEVICE_ALREADY_CONNECTED", "Connection id is already active")
-    if device_id in self.usb_devices or device_id.startswith("usb:") or device_id.startswith("usbport:"):
+    if self._is_usb(device_id):
       port_path = await self._resolve_usb_path(device_id)
       if not port_path:
         raise DeviceError("USB_DEVICE_NOT_FOUND", "USB device was not found")
       session = SerialSession(
-        connection_id, device_id, port_path, self.adapter, self._resolve_usb_path, self.emit
+        connection_id, device_id, port_path, self.adapter, self._resolve_usb_path, self.emit,
+        self.serial_read_mode, self.serial_io, self.identity_cache,
       )
     else:
       device = self.ble_devices.get(device_id)
+      if device is None and self.ble_index is not None:
+        entry = self.ble_index.get(device_id)
+        device = entry.device if entry is not None else None
       session = BleSession(connection_id, device_id, device, self.adapter, self.emit)
     self.sessions[connection_id] = session
     try:
@@ -499,20 +865,49 @@ class DeviceService:
       await session.disconnect()
     return {"connectionId": connection_id}
 
-  async def connect_many(self, connections):
-    async def connect_one(value):
-      try:
-        result = await self.connect(value["connectionId"], value["deviceId"])
-        return {**result, "status": "connected"}
-      except DeviceError as error:
-        return {
-          "connectionId": value["connectionId"],
-          "deviceId": value["deviceId"],
-          "status": "error",
-          "error": error.code,
-        }
-
-    results = await asyncio.gather(*(connect_one(value) for value in connections))
+  def _is_usb(self, device_id: str) -> bool:
+    return device_id in self.usb_devices or device_id.startswith("usb:") or device_id.startswith("usbport:")
+
+  async def connect_many(self, connections, retries=0, limits=None, on_progress=None):
+    # Connections start in priority order (higher first, then list order)
+    # under a per-transport limit, since a burst of simultaneous GATT
+    # connects times out on real BLE adapters. Retryable failures go back
+    # to the end of their transport's queue.
+    limits = {**self.connect_limits, **(limits or {})}
+    limiters = {transport: asyncio.Semaphore(limit) for transport, limit in limits.items()}
+    results = [None] * len(connections)
+    completed = 0
+
+    async def connect_one(index):
+      nonlocal completed
+      value = connections[index]
+      limiter = limiters["USB" if self._is_usb(value["deviceId"]) else "BLE"]
+      attempts = 0
+      while True:
+        attempts += 1
+        async with limiter:
+          try:
+            result = {**await self.connect(value["connectionId"], value["deviceId"]), "status": "connected"}
+            break
+          except DeviceError as error:
+            result = {
+              "connectionId": value["connectionId"],
+              "deviceId": value["deviceId"],
+              "status": "error",
+              "error": error.code,
+            }
+        if attempts > retries or result["error"] not in RETRYABLE_CONNECT_ERRORS:
+          break
+        await asyncio.sleep(CONNECT_RETRY_DELAY)
+      if retries:
+        result["attempts"] = attempts
+      results[index] = result
+      completed += 1
+      if on_progress is not None:
+        await on_progress({**result, "completed": completed, "total": len(connections)})
+
+    order = sorted(range(len(connections)), key=lambda index: -connections[index].get("priority", 0))
+    await asyncio.gather(*(connect_one(index) for index in order))
     return {"connections": results}
 
   async def reset(self, connection_id: str):
@@ -547,12 +942,24 @@ class DeviceService:
     finally:
       await self.disconnect(connection_id)
 
-  async def close(self):
+  async def disconnect_all(self):
     sessions = list(self.sessions.values())
     self.sessions.clear()
     if sessions:
       await asyncio.gather(*(session.disconnect() for session in sessions), return_exceptions=True)
 
+  async def close(self):
+    await self.stop_watch()
+    await self.disconnect_all()
+    await asyncio.to_thread(self.serial_io.close)
+
+  def metrics(self):
+    now = time.perf_counter()
+    return {
+      connection_id: session.metrics(now)
+      for connection_id, session in self.sessions.items()
+    }
+
   def _session(self, connection_id: str):
     session = self.sessions.get(connection_id)
     if session is None:
@@ -560,11 +967,63 @@ class DeviceService:
     return session
 
   async def _resolve_usb_path(self, device_id: str):
-    if device_id in self.usb_devices:
-      return self.usb_devices[device_id]
     if device_id.startswith("usbport:"):
       return device_id.removeprefix("usbport:")
-    result = await self.scan(flush=True)
-    if result["errors"]:
+    known_path = self.usb_devices.get(device_id)
+    if not self.adapter.usb_available:
+      return known_path
+    ports = await asyncio.to_thread(self.adapter.list_serial_ports)
+    ports = [port_info for port_info in ports if self.adapter.is_supported_serial_port(port_info)]
+    for port_info in ports:
+      if str(port_info.device) == known_path:
+        cached = self.identity_cache.lookup(port_info)
+        if cached is None or cached[0] == device_id:
+          return known_path
+    port_path = self.identity_cache.find_path(device_id, ports)
+    if port_path is None:
+      port_path = await self._probe_for(device_id, ports)
+    if port_path is not None:
+      self.usb_devices[device_id] = port_path
+    return port_path
+
+  async def _probe_for(self, device_id: str, ports):
+    # Only ports that no open session owns and that are not cached as another
+    # clicker are probed; the first match wins and the remaining probes are
+    # left to close their ports in the background.
+    owned = {
+      session.port_path for session in self.sessions.values()
+      if isinstance(session, SerialSession) and session.serial is not None
+    }
+    candidates = []
+    for port_info in ports:
+      cached = self.identity_cache.lookup(port_info)
+      if str(port_info.device) not in owned and (cached is None or cached[0] == device_id):
+        candidates.append(port_info)
+    limiter = asyncio.Semaphore(USB_IDENTIFY_CONCURRENCY)
+
+    async def identify(port_info):
+      async with limiter:
+        identity = await asyncio.to_thread(
+          _identify_serial, self.adapter, str(port_info.device), USB_IDENTIFY_TIMEOUT
+        )
+      self.identity_cache.store(port_info, *identity)
+      return str(port_info.device), identity[0]
+
+    pending = {asyncio.create_task(identify(port_info)) for port_info in candidates}
+    deadline = time.monotonic() + self.usb_scan_deadline
+    try:
+      while pending:
+        done, pending = await asyncio.wait(
+          pending, timeout=max(0.0, deadline - time.monotonic()), return_when=asyncio.FIRST_COMPLETED,
+        )
+        if not done:
+          return None
+        for task in done:
+          if task.exception() is None:
+            port_path, stable_id = task.result()
+            if stable_id == device_id:
+              return port_path
       return None
-    return self.usb_devices.get(device_id)
+    finally:
+      for task in pending:
+        task.cancel()
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from collections import deque
+
+
+DRAIN_YIELD_EVERY = 256
+
+# Hands items from one transport thread to the event loop. The producer
+# appends to a deque and wakes the loop only when no drain is already
+# scheduled; a single task then consumes everything pending, in order.
+# deque.append and popleft are atomic, so no lock is taken on either side.
+class LoopHandoff:
+  def __init__(self, loop: asyncio.AbstractEventLoop, consume):
+    self.loop = loop
+    self.consume = consume
+    self.items = deque()
+    self.scheduled = False
+    self.task = None
+    self.pushed = 0
+    self.wakeups = 0
+    self.drains = 0
+
+  def push(self, *item):
+    self.items.append(item)
+    self.pushed += 1
+    if not self.scheduled:
+      self.scheduled = True
+      self.wakeups += 1
+      self.loop.call_soon_threadsafe(self._wake)
+
+  def _wake(self):
+    # Cleared before draining: an item pushed after this point either is
+    # seen by the running drain or schedules another wakeup.
+    self.scheduled = False
+    if self.task is None or self.task.done():
+      self.drains += 1
+      self.task = self.loop.create_task(self._drain())
+
+  async def _drain(self):
+    # Consumers rarely suspend, so the drain yields every few hundred items
+    # to keep a flooding transport from starving the stdout writer.
+    items = self.items
+    consumed = 0
+    while items:
+      await self.consume(*items.popleft(), time.perf_counter())
+      consumed += 1
+      if consumed % DRAIN_YIELD_EVERY == 0:
+        await asyncio.sleep(0)
+
+  def snapshot(self) -> dict:
+    return {
+      "items": self.pushed, "wakeups": self.wakeups, "drains": self.drains, "pending": len(self.items),
+    }
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import os
+import threading
+
+
+IDENTITY_CACHE_VERSION = 1
+IDENTITY_CACHE_FILE = "usb-identities.json"
+
+
+def default_identity_cache_path() -> str | None:
+  data_root = os.environ.get("FT_ENGINE_DATA_ROOT")
+  if not data_root:
+    return None
+  return os.path.join(data_root, "worker", IDENTITY_CACHE_FILE)
+
+
+def port_hardware_key(port_info) -> str | None:
+  attributes = [
+    getattr(port_info, name, None)
+    for name in ("vid", "pid", "serial_number", "location", "hwid")
+  ]
+  if attributes[2] is None and attributes[3] is None and attributes[4] is None:
+    # Without a serial number, location or hwid the key cannot tell two
+    # boards of the same model apart.
+    return None
+  return "|".join("" if value is None else str(value) for value in attributes)
+
+
+# Maps a serial port's hardware attributes to the usb:<MAC> identity its
+# firmware reported, so unchanged ports skip the identify probe until a
+# flushed scan probes them again. Entries are dropped when a port's identity
+# no longer matches. Changes made on the event loop are written from the
+# default executor; a save snapshots the newest revision under the write
+# lock, so writes never land out of order.
+class UsbIdentityCache:
+  def __init__(self, path: str | None = None):
+    self.path = path
+    self.entries = {}
+    self.lock = threading.Lock()
+    self.write_lock = threading.Lock()
+    self.revision = 0
+    self.saved_revision = 0
+    self.pending_save = None
+    self._load()
+
+  def _load(self):
+    if not self.path:
+      return
+    try:
+      with open(self.path, encoding="utf-8") as source:
+        data = json.load(source)
+    except (OSError, ValueError):
+      return
+    if not isinstance(data, dict) or data.get("version") != IDENTITY_CACHE_VERSION:
+      return
+    entries = data.get("entries")
+    if isinstance(entries, dict):
+      self.entries = {
+        key: value for key, value in entries.items()
+        if isinstance(value, dict) and isinstance(value.get("deviceId"), str) and isinstance(value.get("name"), str)
+      }
+
+  def _schedule_save(self):
+    if not self.path:
+      return
+    try:
+      loop = asyncio.get_running_loop()
+    except RuntimeError:
+      self._save()
+      return
+    self.pending_save = loop.run_in_executor(None, self._save)
+
+  def _save(self):
+    with self.write_lock:
+      with self.lock:
+        revision = self.revision
+        if revision == self.saved_revision:
+          return
+        payload = json.dumps({"version": IDENTITY_CACHE_VERSION, "entries": self.entries}, ensure_ascii=False)
+      try:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as target:
+          target.write(payload)
+        os.replace(temporary, self.path)
+      except OSError:
+        return
+      self.saved_revision = revision
+
+  def lookup(self, port_info) -> tuple[str, str] | None:
+    key = port_hardware_key(port_info)
+    if key is None:
+      return None
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      return entry["deviceId"], entry["name"]
+
+  def store(self, port_info, device_id: str, name: str):
+    key = port_hardware_key(port_info)
+    if key is None:
+      return
+    entry = {"deviceId": device_id, "name": name, "path": str(port_info.device)}
+    with self.lock:
+      if self.entries.get(key) == entry:
+        return
+      self.entries[key] = entry
+      self.revision += 1
+    self._schedule_save()
+
+  def find_path(self, device_id: str, ports) -> str | None:
+    keys = [(port_hardware_key(port_info), port_info) for port_info in ports]
+    with self.lock:
+      for key, port_info in keys:
+        entry = self.entries.get(key)
+        if entry is not None and entry["deviceId"] == device_id:
+          return str(port_info.device)
+    return None
+
+  def rename(self, device_id: str, name: str):
+    with self.lock:
+      changed = False
+      for entry in self.entries.values():
+        if entry["deviceId"] == device_id and entry["name"] != name:
+          entry["name"] = name
+          changed = True
+      if changed:
+        self.revision += 1
+    if changed:
+      self._schedule_save()
+
+  def invalidate(self, device_id: str | None = None, port_path: str | None = None):
+    with self.lock:
+      keys = [
+        key for key, entry in self.entries.items()
+        if entry["deviceId"] == device_id or port_path is not None and entry.get("path") == port_path
+      ]
+      for key in keys:
+        del self.entries[key]
+      if keys:
+        self.revision += 1
+    if keys:
+      self._schedule_save()
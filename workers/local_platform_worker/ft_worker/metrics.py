@@ -0,0 +1,111 @@
+import asyncio
+import bisect
+
+
+LATENCY_BUCKETS_MS = (
+  0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 10000.0,
+)
+
+
+class LatencyHistogram:
+  __slots__ = ("bounds", "counts", "count", "total_ms", "max_ms", "last_ms")
+
+  def __init__(self, bounds=LATENCY_BUCKETS_MS):
+    self.bounds = tuple(bounds)
+    self.counts = [0] * (len(self.bounds) + 1)
+    self.count = 0
+    self.total_ms = 0.0
+    self.max_ms = 0.0
+    self.last_ms = 0.0
+
+  def record(self, value_ms: float):
+    self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+    self.count += 1
+    self.total_ms += value_ms
+    self.last_ms = value_ms
+    if value_ms > self.max_ms:
+      self.max_ms = value_ms
+
+  def record_since(self, started_at: float, finished_at: float):
+    self.record((finished_at - started_at) * 1000.0)
+
+  def quantile(self, fraction: float) -> float:
+    if not self.count:
+      return 0.0
+    target = fraction * self.count
+    seen = 0
+    for index, count in enumerate(self.counts):
+      seen += count
+      if count and seen >= target:
+        return min(self.bounds[index], self.max_ms) if index < len(self.bounds) else self.max_ms
+    return self.max_ms
+
+  def snapshot(self) -> dict:
+    return {
+      "count": self.count,
+      "meanMs": round(self.total_ms / self.count, 3) if self.count else 0.0,
+      "lastMs": round(self.last_ms, 3),
+      "maxMs": round(self.max_ms, 3),
+      "p50Ms": round(self.quantile(0.5), 3),
+      "p99Ms": round(self.quantile(0.99), 3),
+    }
+
+
+# Events per second over a rolling window. A window that has gone quiet for
+# longer than its length decays towards zero instead of repeating the last rate.
+class RateMeter:
+  __slots__ = ("window", "total", "rate", "_window_start", "_window_count")
+
+  def __init__(self, window: float = 1.0):
+    self.window = window
+    self.total = 0
+    self.rate = None
+    self._window_start = None
+    self._window_count = 0
+
+  def mark(self, now: float, count: int = 1):
+    self.total += count
+    if self._window_start is None:
+      self._window_start = now
+    elif now - self._window_start >= self.window:
+      self.rate = self._window_count / (now - self._window_start)
+      self._window_start = now
+      self._window_count = 0
+    self._window_count += count
+
+  def per_second(self, now: float) -> float:
+    if self._window_start is None:
+      return 0.0
+    elapsed = now - self._window_start
+    if elapsed >= self.window or self.rate is None and elapsed > 0:
+      return self._window_count / elapsed
+    return self.rate or 0.0
+
+  def snapshot(self, now: float) -> dict:
+    return {"total": self.total, "perSecond": round(self.per_second(now), 2)}
+
+
+class LoopLagMonitor:
+  def __init__(self, interval: float = 0.25):
+    self.interval = interval
+    self.histogram = LatencyHistogram()
+    self._task = None
+
+  def start(self):
+    if self._task is None:
+      self._task = asyncio.get_running_loop().create_task(self._run())
+
+  def stop(self):
+    if self._task is not None:
+      self._task.cancel()
+      self._task = None
+
+  async def _run(self):
+    loop = asyncio.get_running_loop()
+    while True:
+      expected = loop.time() + self.interval
+      await asyncio.sleep(self.interval)
+      self.histogram.record(max(0.0, loop.time() - expected) * 1000.0)
+
+  def snapshot(self) -> dict:
+    return self.histogram.snapshot()
@@ -0,0 +1,105 @@
+import asyncio
+from collections import deque
+
+
+DEFAULT_EVENT_CAPACITY = 4096
+PRIORITY_EVENTS = frozenset((
+  "device.counter", "device.counterBatch", "device.discovered", "device.lost", "device.connectProgress",
+))
+UNDROPPABLE_EVENTS = frozenset(("device.counter", "device.counterBatch", "device.lost"))
+
+
+# Output lanes drained in priority order: responses, counter and discovery
+# events, then the latest status per connection, then every other event.
+# Discovery and connect progress events share the priority lane so a
+# streamed scan's devices, or a connectMany's progress, are written before
+# the request's summary response. Responses are never dropped, and neither
+# are statuses: they coalesce per connection, which already bounds them. At
+# capacity a priority event evicts the oldest normal-lane event; counters
+# and device.lost are admitted past the capacity when nothing can be
+# evicted. Other events that do not fit are dropped and counted. The None
+# shutdown marker is returned only once every lane is empty.
+class OutputQueue:
+  def __init__(self, event_capacity: int = DEFAULT_EVENT_CAPACITY):
+    self.event_capacity = event_capacity
+    self._priority = deque()
+    self._status = {}
+    self._normal = deque()
+    self._events = 0
+    self._closing = False
+    self._ready = asyncio.Event()
+    self.high_water = 0
+    self.coalesced = 0
+    self.dropped = {}
+
+  def __len__(self) -> int:
+    return len(self._priority) + len(self._status) + len(self._normal)
+
+  async def put(self, message):
+    self.put_nowait(message)
+
+  def put_nowait(self, message):
+    event = message.get("event") if isinstance(message, dict) else None
+    if message is None:
+      self._closing = True
+    elif event is None:
+      self._priority.append(message)
+    elif event == "device.status" and isinstance(message.get("payload"), dict):
+      key = message["payload"].get("connectionId")
+      if key in self._status:
+        self.coalesced += 1
+      else:
+        self._events += 1
+      self._status[key] = message
+    elif self._admit(event):
+      (self._priority if event in PRIORITY_EVENTS else self._normal).append(message)
+    depth = len(self)
+    if depth > self.high_water:
+      self.high_water = depth
+    self._ready.set()
+
+  def _admit(self, event: str) -> bool:
+    if self._events < self.event_capacity or event in UNDROPPABLE_EVENTS and not self._normal:
+      self._events += 1
+      return True
+    if event in PRIORITY_EVENTS and self._normal:
+      evicted = self._normal.popleft()["event"]
+      self.dropped[evicted] = self.dropped.get(evicted, 0) + 1
+      return True
+    self.dropped[event] = self.dropped.get(event, 0) + 1
+    return False
+
+  def get_nowait(self):
+    if self._priority:
+      message = self._priority.popleft()
+      if isinstance(message, dict) and "event" in message:
+        self._events -= 1
+      return message
+    if self._status:
+      key = next(iter(self._status))
+      self._events -= 1
+      return self._status.pop(key)
+    if self._normal:
+      self._events -= 1
+      return self._normal.popleft()
+    if self._closing:
+      self._closing = False
+      return None
+    raise asyncio.QueueEmpty
+
+  async def get(self):
+    while True:
+      try:
+        return self.get_nowait()
+      except asyncio.QueueEmpty:
+        self._ready.clear()
+        await self._ready.wait()
+
+  def stats(self) -> dict:
+    return {
+      "depth": len(self),
+      "highWater": self.high_water,
+      "eventCapacity": self.event_capacity,
+      "coalescedStatus": self.coalesced,
+      "dropped": dict(self.dropped),
+    }
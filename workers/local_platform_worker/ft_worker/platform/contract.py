@@ -34,6 +34,8 @@ class DevicePlatformAdapter(Protocol):
 
   async def find_ble(self, device_id: str, timeout: float): ...
 
+  async def watch_ble(self, callback): ...
+
   def create_ble_client(self, device, disconnected_callback): ...
 
   def list_serial_ports(self): ...
@@ -36,6 +36,13 @@ class BleakSerialDeviceAdapter:
       return None
     return await BleakScanner.find_device_by_address(device_id, timeout=timeout)
 
+  async def watch_ble(self, callback):
+    if not self.ble_available:
+      raise RuntimeError("BLE is unavailable")
+    scanner = BleakScanner(detection_callback=callback)
+    await scanner.start()
+    return scanner
+
   def create_ble_client(self, device, disconnected_callback):
     if not self.ble_available:
       raise RuntimeError("BLE is unavailable")
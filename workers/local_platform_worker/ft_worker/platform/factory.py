@@ -1,3 +1,4 @@
+import os
 import sys
 
 from .contract import PlatformServices
@@ -5,6 +6,14 @@ from .contract import PlatformServices
 
 def create_platform_services(platform_name: str | None = None) -> PlatformServices:
   selected = sys.platform if platform_name is None else platform_name
+  if selected == "simulated":
+    from .simulated.clicker import parse_simulation_config
+    from .simulated.device_adapter import SimulatedDeviceAdapter
+    from .unsupported import UnsupportedWindowTracker
+    adapter = SimulatedDeviceAdapter(parse_simulation_config(os.environ.get("FT_WORKER_SIMULATION")))
+    return PlatformServices(
+      "simulated", UnsupportedWindowTracker(), adapter.ble_available, adapter.usb_available, adapter
+    )
   if selected == "win32":
     from .windows.device_adapter import WindowsDeviceAdapter
     from .windows.window_tracker import WindowsWindowTracker
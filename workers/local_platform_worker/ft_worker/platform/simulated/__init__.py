@@ -0,0 +1 @@
+"""Simulated platform implementations."""
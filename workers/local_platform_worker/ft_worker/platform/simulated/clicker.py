@@ -0,0 +1,130 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+
+from ...device_protocol import (
+  COUNTER_PAYLOAD,
+  USB_CMD_IDENTIFY,
+  USB_CMD_RENAME,
+  USB_CMD_RESET,
+  USB_EVT_COUNTER,
+  USB_RSP_COMMAND,
+  USB_RSP_IDENTIFY,
+  build_usb_frame,
+)
+
+
+MAX_SIMULATED_DEVICES = 256
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+  ble: int = 2
+  usb: int = 2
+  rate: float = 5.0
+  burst: int = 1
+  plus_ratio: float = 0.8
+  disconnect_every: float = 0.0
+  noise: float = 0.0
+  seed: int = 1
+
+
+_CONFIG_FIELDS = {
+  "ble": ("ble", int),
+  "usb": ("usb", int),
+  "rate": ("rate", float),
+  "burst": ("burst", int),
+  "plusRatio": ("plus_ratio", float),
+  "disconnectEvery": ("disconnect_every", float),
+  "noise": ("noise", float),
+  "seed": ("seed", int),
+}
+
+
+# "ble=4,usb=8,rate=20,burst=5,disconnectEvery=30,noise=0.01"
+def parse_simulation_config(spec: str | None) -> SimulationConfig:
+  values = {}
+  for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+    key, separator, raw = item.partition("=")
+    field = _CONFIG_FIELDS.get(key.strip())
+    if field is None or not separator:
+      raise ValueError(f"Unknown simulation option: {item}")
+    name, cast = field
+    try:
+      values[name] = cast(raw.strip())
+    except ValueError as error:
+      raise ValueError(f"Invalid simulation option: {item}") from error
+  config = SimulationConfig(**values)
+  if not 0 <= config.ble <= MAX_SIMULATED_DEVICES or not 0 <= config.usb <= MAX_SIMULATED_DEVICES:
+    raise ValueError("Simulated device counts are out of range")
+  if config.rate <= 0 or config.burst < 1:
+    raise ValueError("Simulated press rate and burst must be positive")
+  if not 0 <= config.plus_ratio <= 1 or not 0 <= config.noise <= 1 or config.disconnect_every < 0:
+    raise ValueError("Simulated ratios are out of range")
+  return config
+
+
+# Firmware-side state of one clicker: cumulative totals, the uptime clock used
+# for event timestamps and the FTE1 command handling.
+class VirtualClicker:
+  def __init__(self, transport: str, index: int, seed: int = 1):
+    transport_byte = 0xB1 if transport == "BLE" else 0x0B
+    self.transport = transport
+    self.mac = bytes((0x5E, 0x1A, transport_byte, 0x00, (index >> 8) & 0xFF, index & 0xFF))
+    self.address = ":".join(f"{part:02X}" for part in self.mac)
+    self.name = f"Counter-S{transport[0]}{index:02d}"
+    self.random = random.Random(seed * 1000003 + index * 2 + (transport == "USB"))
+    self.lock = threading.Lock()
+    self.booted_at = time.monotonic()
+    self.available_at = 0.0
+    self.total_plus = 0
+    self.total_minus = 0
+
+  def available(self, now: float | None = None) -> bool:
+    return (time.monotonic() if now is None else now) >= self.available_at
+
+  def press(self, plus: bool) -> bytes:
+    with self.lock:
+      if plus:
+        self.total_plus += 1
+      else:
+        self.total_minus += 1
+      timestamp_ms = int((time.monotonic() - self.booted_at) * 1000.0) & 0xFFFFFFFF
+      return COUNTER_PAYLOAD.pack(
+        self.total_plus - self.total_minus, 1 if plus else -1,
+        self.total_plus, self.total_minus, timestamp_ms,
+      )
+
+  def reset(self):
+    with self.lock:
+      self.total_plus = 0
+      self.total_minus = 0
+
+  def rename(self, name: bytes) -> bool:
+    try:
+      decoded = name.decode("utf-8")
+    except UnicodeDecodeError:
+      return False
+    if not decoded or len(name) > 32:
+      return False
+    self.name = decoded
+    return True
+
+  def identify_payload(self) -> bytes:
+    name = self.name.encode("utf-8")
+    return self.mac + bytes((len(name),)) + name
+
+  def counter_frame(self, payload: bytes) -> bytes:
+    return build_usb_frame(USB_EVT_COUNTER, payload)
+
+  def handle_usb_command(self, frame_type: int, payload) -> bytes | None:
+    if frame_type == USB_CMD_IDENTIFY:
+      return build_usb_frame(USB_RSP_IDENTIFY, self.identify_payload())
+    if frame_type == USB_CMD_RESET:
+      self.reset()
+      return build_usb_frame(USB_RSP_COMMAND, bytes((USB_CMD_RESET, 0)))
+    if frame_type == USB_CMD_RENAME:
+      status = 0 if self.rename(bytes(payload)) else 1
+      return build_usb_frame(USB_RSP_COMMAND, bytes((USB_CMD_RENAME, status)))
+    return None
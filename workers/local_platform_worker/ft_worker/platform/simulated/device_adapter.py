@@ -0,0 +1,351 @@
+import asyncio
+import os
+import select
+import struct
+import threading
+import time
+
+from ...device_protocol import UsbFrameParser
+from ...devices import SERVICE_UUID
+from .clicker import SimulationConfig, VirtualClicker
+
+try:
+  import fcntl
+  import termios
+except ImportError:
+  fcntl = None
+  termios = None
+
+
+ESPRESSIF_USB_VID = 0x303A
+UNPLUGGED_SECONDS = 1.0
+IDLE_POLL_SECONDS = 0.05
+ADVERTISING_INTERVAL = 0.1
+
+
+class SimulatedBleDevice:
+  def __init__(self, clicker: VirtualClicker):
+    self.clicker = clicker
+    self.address = clicker.address
+    self.name = clicker.name
+
+
+class SimulatedAdvertisement:
+  def __init__(self, clicker: VirtualClicker, rssi: int):
+    self.local_name = clicker.name
+    self.service_uuids = [SERVICE_UUID]
+    self.rssi = rssi
+
+
+class SimulatedPort:
+  def __init__(self, clicker: VirtualClicker, index: int):
+    self.device = f"sim-usb-{index}"
+    self.vid = ESPRESSIF_USB_VID
+    self.pid = 0x1001
+    self.serial_number = clicker.mac.hex().upper()
+    self.description = "Simulated FT Counter"
+    self.product = "Simulated FT Counter"
+    self.manufacturer = "Espressif"
+    self.hwid = f"USB VID:PID=303A:1001 SER={self.serial_number}"
+
+
+# A press stream for one open BLE notification or serial handle. Presses are
+# spread evenly at the configured rate and delivered in bursts.
+class _Stream:
+  def __init__(self, clicker, config: SimulationConfig, deliver, unplug, now: float):
+    self.clicker = clicker
+    self.config = config
+    self.deliver = deliver
+    self.unplug = unplug
+    self.interval = config.burst / config.rate
+    self.next_press_at = now + clicker.random.random() * self.interval
+    self.disconnect_at = (
+      now + clicker.random.expovariate(1.0 / config.disconnect_every)
+      if config.disconnect_every > 0 else None
+    )
+
+  def poll(self, now: float) -> float | None:
+    if self.disconnect_at is not None and now >= self.disconnect_at:
+      self.clicker.available_at = now + UNPLUGGED_SECONDS
+      self.unplug()
+      return None
+    if now - self.next_press_at > 1.0:
+      # The driver fell behind; skip ahead instead of replaying a backlog.
+      self.next_press_at = now
+    config = self.config
+    while now >= self.next_press_at:
+      for _ in range(config.burst):
+        self.deliver(self.clicker.press(self.clicker.random.random() < config.plus_ratio))
+      self.next_press_at += self.interval
+    if self.disconnect_at is not None:
+      return min(self.next_press_at, self.disconnect_at)
+    return self.next_press_at
+
+
+# One thread generates presses for every open simulated handle, like the
+# radio and UART interrupts of the real devices. It exits when idle and is
+# restarted by the next stream.
+class SimulationDriver:
+  def __init__(self, config: SimulationConfig):
+    self.config = config
+    self._lock = threading.Lock()
+    self._streams = {}
+    self._thread = None
+    self._changed = threading.Event()
+
+  def add(self, owner, clicker, deliver, unplug):
+    stream = _Stream(clicker, self.config, deliver, unplug, time.monotonic())
+    with self._lock:
+      self._streams[id(owner)] = stream
+      if self._thread is None:
+        self._thread = threading.Thread(target=self._run, name="ft-worker-simulation", daemon=True)
+        self._thread.start()
+    self._changed.set()
+
+  def remove(self, owner):
+    with self._lock:
+      self._streams.pop(id(owner), None)
+
+  def _run(self):
+    while True:
+      with self._lock:
+        streams = list(self._streams.items())
+        if not streams:
+          self._thread = None
+          return
+      now = time.monotonic()
+      next_due = now + IDLE_POLL_SECONDS
+      for key, stream in streams:
+        due = stream.poll(now)
+        if due is None:
+          with self._lock:
+            if self._streams.get(key) is stream:
+              del self._streams[key]
+          continue
+        next_due = min(next_due, due)
+      self._changed.clear()
+      self._changed.wait(max(0.0, next_due - time.monotonic()))
+
+
+# Passive advertisement scanner; reports every clicker in range once per
+# advertising interval, on the event loop like bleak's detection callback.
+class SimulatedBleWatch:
+  def __init__(self, adapter, callback):
+    self.adapter = adapter
+    self.callback = callback
+    self.task = asyncio.create_task(self._run())
+
+  async def _run(self):
+    while True:
+      for device, advertisement in await self.adapter.scan_ble(0.0):
+        self.callback(device, advertisement)
+      await asyncio.sleep(ADVERTISING_INTERVAL)
+
+  async def stop(self):
+    self.task.cancel()
+    await asyncio.gather(self.task, return_exceptions=True)
+
+
+class SimulatedBleClient:
+  def __init__(self, adapter, clicker: VirtualClicker, disconnected_callback):
+    self.adapter = adapter
+    self.clicker = clicker
+    self.disconnected_callback = disconnected_callback
+    self.is_connected = False
+    self.callback = None
+
+  async def connect(self):
+    if not self.clicker.available():
+      raise asyncio.TimeoutError("Simulated device is out of range")
+    self.is_connected = True
+
+  async def start_notify(self, _uuid, callback):
+    self.callback = callback
+    self.adapter.driver.add(self, self.clicker, self._notify, self._drop)
+
+  def _notify(self, payload: bytes):
+    if self.adapter.noisy(self.clicker):
+      payload = payload[:-1]
+    self.callback(None, bytearray(payload))
+
+  def _drop(self):
+    self.is_connected = False
+    self.disconnected_callback(self)
+
+  async def write_gatt_char(self, _uuid, payload, response=False):
+    if not self.is_connected:
+      raise OSError("Simulated device is disconnected")
+    payload = bytes(payload)
+    if payload[:1] == b"\x01":
+      self.clicker.reset()
+    elif payload[:1] == b"\x02":
+      self.clicker.rename(payload[1:])
+
+  async def read_gatt_char(self, _uuid):
+    if not self.is_connected:
+      raise OSError("Simulated device is disconnected")
+    return self.clicker.name.encode("utf-8")
+
+  async def disconnect(self):
+    self.adapter.driver.remove(self)
+    self.is_connected = False
+
+
+# Serial handle backed by an OS pipe so the selector engine can wait on it
+# exactly like a tty. Writes run the firmware command handler and queue the
+# response; a full pipe drops bytes the way a UART overrun would.
+class SimulatedSerial:
+  def __init__(self, adapter, clicker: VirtualClicker, timeout: float = 0.1):
+    self.adapter = adapter
+    self.clicker = clicker
+    self.timeout = timeout
+    self.command_parser = UsbFrameParser(512)
+    self.unplugged = False
+    self.overruns = 0
+    self._lock = threading.Lock()
+    self._read_fd, self._write_fd = os.pipe()
+    os.set_blocking(self._write_fd, False)
+    adapter.driver.add(self, clicker, self._deliver, self._unplug)
+
+  @property
+  def is_open(self) -> bool:
+    return self._read_fd is not None
+
+  def fileno(self) -> int:
+    if self._read_fd is None:
+      raise OSError("Simulated serial port is closed")
+    return self._read_fd
+
+  @property
+  def in_waiting(self) -> int:
+    if self.unplugged:
+      raise OSError("Simulated device disconnected")
+    return struct.unpack("i", fcntl.ioctl(self.fileno(), termios.FIONREAD, b"\0\0\0\0"))[0]
+
+  def read(self, size: int = 1) -> bytes:
+    if self.unplugged:
+      raise OSError("Simulated device disconnected")
+    ready, _, _ = select.select([self.fileno()], [], [], self.timeout)
+    if self.unplugged:
+      raise OSError("Simulated device disconnected")
+    if not ready:
+      return b""
+    return os.read(self._read_fd, size)
+
+  def write(self, data) -> int:
+    if self.unplugged:
+      raise OSError("Simulated device disconnected")
+    for frame_type, payload in self.command_parser.feed(data):
+      response = self.clicker.handle_usb_command(frame_type, payload)
+      if response is not None:
+        self._inject(response)
+    return len(data)
+
+  def flush(self):
+    return None
+
+  def reset_input_buffer(self):
+    while select.select([self.fileno()], [], [], 0)[0]:
+      if not os.read(self._read_fd, 4096):
+        return
+
+  def close(self):
+    self.adapter.driver.remove(self)
+    with self._lock:
+      read_fd, write_fd = self._read_fd, self._write_fd
+      self._read_fd = self._write_fd = None
+    if read_fd is not None:
+      os.close(read_fd)
+      os.close(write_fd)
+
+  def _deliver(self, payload: bytes):
+    frame = bytearray(self.clicker.counter_frame(payload))
+    if self.adapter.noisy(self.clicker):
+      frame[-1] ^= 0x5A
+    self._inject(frame)
+
+  def _unplug(self):
+    self.unplugged = True
+    # Wake a selector waiting on the pipe so the next read reports the loss.
+    self._inject(b"\0")
+
+  def _inject(self, data):
+    with self._lock:
+      if self._write_fd is None:
+        return
+      try:
+        os.write(self._write_fd, data)
+      except BlockingIOError:
+        self.overruns += 1
+
+
+class SimulatedDeviceAdapter:
+  use_ble_heartbeat = False
+
+  def __init__(self, config: SimulationConfig | None = None):
+    self.config = config or SimulationConfig()
+    self.driver = SimulationDriver(self.config)
+    self.ble_clickers = [
+      VirtualClicker("BLE", index, self.config.seed) for index in range(1, self.config.ble + 1)
+    ]
+    self.usb_clickers = [
+      VirtualClicker("USB", index, self.config.seed) for index in range(1, self.config.usb + 1)
+    ]
+    self.ports = {
+      port.device: (port, clicker)
+      for port, clicker in (
+        (SimulatedPort(clicker, index), clicker)
+        for index, clicker in enumerate(self.usb_clickers, start=1)
+      )
+    }
+
+  @property
+  def ble_available(self) -> bool:
+    return bool(self.ble_clickers)
+
+  @property
+  def usb_available(self) -> bool:
+    return bool(self.usb_clickers) and fcntl is not None
+
+  def noisy(self, clicker: VirtualClicker) -> bool:
+    return self.config.noise > 0 and clicker.random.random() < self.config.noise
+
+  async def scan_ble(self, timeout: float):
+    await asyncio.sleep(0)
+    return [
+      (SimulatedBleDevice(clicker), SimulatedAdvertisement(clicker, -40 - index % 40))
+      for index, clicker in enumerate(self.ble_clickers)
+      if clicker.available()
+    ]
+
+  async def find_ble(self, device_id: str, timeout: float):
+    for clicker in self.ble_clickers:
+      if clicker.address == device_id and clicker.available():
+        return SimulatedBleDevice(clicker)
+    return None
+
+  async def watch_ble(self, callback):
+    return SimulatedBleWatch(self, callback)
+
+  def create_ble_client(self, device, disconnected_callback):
+    return SimulatedBleClient(self, device.clicker, disconnected_callback)
+
+  def list_serial_ports(self):
+    return [port for port, clicker in self.ports.values() if clicker.available()]
+
+  def is_supported_serial_port(self, port_info) -> bool:
+    return getattr(port_info, "vid", None) == ESPRESSIF_USB_VID
+
+  def open_serial(self, port_path: str):
+    entry = self.ports.get(port_path)
+    if entry is None or not entry[1].available():
+      raise OSError(f"Simulated port {port_path} was not found")
+    return SimulatedSerial(self, entry[1])
+
+  def map_ble_error(self, error: Exception) -> str:
+    if isinstance(error, asyncio.TimeoutError):
+      return "BLE_CONNECTION_TIMEOUT"
+    return "BLE_UNAVAILABLE"
+
+  def map_serial_error(self, error: Exception) -> str:
+    return "USB_DEVICE_NOT_FOUND"
@@ -7,6 +7,14 @@ PROTOCOL_VERSION = 1
 MAX_LINE_BYTES = 1024 * 1024
 MAX_ID_LENGTH = 128
 MAX_METHOD_LENGTH = 128
+TEMPLATE_CACHE_LIMIT = 1024
+COUNTER_MESSAGE_KEYS = ("protocolVersion", "event", "payload", "eventId")
+COUNTER_PAYLOAD_KEYS = (
+  "connectionId", "deviceId", "transport",
+  "currentTotal", "eventType", "totalPlus", "totalMinus", "deviceTimestampMs",
+)
+STATUS_MESSAGE_KEYS = ("protocolVersion", "event", "payload")
+STATUS_PAYLOAD_KEYS = ("connectionId", "deviceId", "status")
 
 
 class ProtocolError(Exception):
@@ -91,3 +99,85 @@ def event_message(event: str, payload: Any, event_id: Optional[str] = None) -> d
 
 def encode_message(message: dict[str, Any]) -> str:
   return json.dumps(message, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _json_string(value: str) -> str:
+  if value.isascii() and value.isalnum():
+    return f'"{value}"'
+  return json.dumps(value, ensure_ascii=False)
+
+
+# Encodes device.counter and device.status from cached constant parts: the
+# counter prefix per (connectionId, deviceId, transport) and the whole status
+# line per (connectionId, deviceId, status). Any other shape falls back to
+# encode_message, so the output is always identical to it.
+class MessageEncoder:
+  def __init__(self):
+    self.counter_prefixes = {}
+    self.status_lines = {}
+
+  def encode(self, message: dict[str, Any]) -> str:
+    event = message.get("event")
+    if event == "device.counter":
+      line = self._encode_counter(message)
+    elif event == "device.status":
+      line = self._encode_status(message)
+    else:
+      line = None
+    return encode_message(message) if line is None else line
+
+  def _encode_counter(self, message) -> str | None:
+    payload = message.get("payload")
+    if (
+      tuple(message) != COUNTER_MESSAGE_KEYS or message["protocolVersion"] != PROTOCOL_VERSION or
+      type(payload) is not dict or tuple(payload) != COUNTER_PAYLOAD_KEYS
+    ):
+      return None
+    event_id = message["eventId"]
+    connection_id = payload["connectionId"]
+    device_id = payload["deviceId"]
+    transport = payload["transport"]
+    current_total = payload["currentTotal"]
+    event_type = payload["eventType"]
+    total_plus = payload["totalPlus"]
+    total_minus = payload["totalMinus"]
+    timestamp_ms = payload["deviceTimestampMs"]
+    if (
+      type(event_id) is not str or type(connection_id) is not str or
+      type(device_id) is not str or type(transport) is not str or
+      type(current_total) is not int or type(event_type) is not int or type(total_plus) is not int or
+      type(total_minus) is not int or type(timestamp_ms) is not int
+    ):
+      return None
+    key = (connection_id, device_id, transport)
+    prefix = self.counter_prefixes.get(key)
+    if prefix is None:
+      if len(self.counter_prefixes) >= TEMPLATE_CACHE_LIMIT:
+        self.counter_prefixes.clear()
+      prefix = self.counter_prefixes[key] = (
+        f'{{"protocolVersion":{PROTOCOL_VERSION},"event":"device.counter","payload":{{'
+        f'"connectionId":{_json_string(connection_id)},"deviceId":{_json_string(device_id)},'
+        f'"transport":{_json_string(transport)},"currentTotal":'
+      )
+    return (
+      f'{prefix}{current_total},"eventType":{event_type},"totalPlus":{total_plus},'
+      f'"totalMinus":{total_minus},"deviceTimestampMs":{timestamp_ms}}},'
+      f'"eventId":{_json_string(event_id)}}}\n'
+    )
+
+  def _encode_status(self, message) -> str | None:
+    payload = message.get("payload")
+    if (
+      tuple(message) != STATUS_MESSAGE_KEYS or message["protocolVersion"] != PROTOCOL_VERSION or
+      type(payload) is not dict or tuple(payload) != STATUS_PAYLOAD_KEYS
+    ):
+      return None
+    key = (payload["connectionId"], payload["deviceId"], payload["status"])
+    if type(key[0]) is not str or type(key[1]) is not str or type(key[2]) is not str:
+      return None
+    line = self.status_lines.get(key)
+    if line is None:
+      if len(self.status_lines) >= TEMPLATE_CACHE_LIMIT:
+        self.status_lines.clear()
+      line = self.status_lines[key] = encode_message(message)
+    return line
@@ -1,22 +1,57 @@
+import argparse
 import asyncio
+import contextvars
+import os
 import sys
+import time
 from typing import Any, Awaitable, Callable
 
+from .batching import CounterBatcher, parse_counter_batch_options
+from .codec import TRANSPORT_BINARY, TRANSPORT_JSONL, JsonLineCodec, create_codec
 from .devices import DeviceError, DeviceService
+from .identity_cache import UsbIdentityCache, default_identity_cache_path
+from .metrics import LatencyHistogram, LoopLagMonitor
+from .output import OutputQueue
 from .platform import create_platform_services
 from .platform.contract import PlatformCapabilityError, PlatformServices
 from .protocol import (
   ProtocolError,
   WorkerRequest,
-  encode_message,
   error_response,
   event_message,
-  parse_request_line,
   success_response,
 )
+from .stdio import close_stdout_writer, open_stdin_reader, open_stdout_writer
+from .tracing import TRACE_KEY, EventTracer, parse_trace_options
 
 
 Handler = Callable[[dict[str, Any]], Awaitable[Any]]
+# Id of the request whose handler is running; streamed events are tagged
+# with it.
+current_request_id = contextvars.ContextVar("current_request_id", default=None)
+
+# Requests run as independent tasks. "control" methods run inline so the
+# reader observes codec switches and shutdown before the next request; the
+# other classes cap how many requests of that kind may run at once.
+CONCURRENCY_CONTROL = "control"
+CONCURRENCY_UNLIMITED = "unlimited"
+METHOD_CONCURRENCY = {
+  "system.hello": CONCURRENCY_CONTROL,
+  "system.shutdown": CONCURRENCY_CONTROL,
+  "device.scan": "scan",
+  "device.connect": "session",
+  "device.connectMany": "session",
+  "device.disconnect": "session",
+  "device.disconnectAll": "session",
+  "device.renameDiscovered": "session",
+}
+CONCURRENCY_LIMITS = {"scan": 1, "session": 1}
+MIN_METRICS_INTERVAL_MS = 100
+MAX_METRICS_INTERVAL_MS = 60000
+MIN_WATCH_INTERVAL_MS = 250
+MAX_WATCH_INTERVAL_MS = 60000
+MAX_CONNECT_RETRIES = 3
+MAX_CONNECTIONS = 32
 
 
 class WorkerRuntime:
@@ -24,17 +59,34 @@ class WorkerRuntime:
     self.services = services or create_platform_services()
     self.event_sink = event_sink
     self.should_stop = False
+    self.counter_batcher = None
+    self.tracer = None
+    self.codec = JsonLineCodec()
+    self.requested_codec = None
+    self.output_queue = None
+    self.loop_lag = None
+    self.method_latency = {}
+    self.method_errors = {}
+    self.metrics_task = None
     self.device_service = (
-      DeviceService(self.services.device_adapter, self._emit_device_event)
+      DeviceService(
+        self.services.device_adapter, self._emit_device_event,
+        identity_cache=UsbIdentityCache(default_identity_cache_path()),
+      )
       if self.services.device_adapter is not None else None
     )
+    self._limiters = {
+      name: asyncio.Semaphore(limit) for name, limit in CONCURRENCY_LIMITS.items()
+    }
     self._handlers: dict[str, Handler] = {
       "system.hello": self._hello,
       "system.ping": self._ping,
+      "system.metrics": self._metrics,
       "system.shutdown": self._shutdown,
       "window.list": self._list_windows,
       "window.getBounds": self._get_window_bounds,
       "device.scan": self._scan_devices,
+      "device.watch": self._watch_devices,
       "device.connect": self._connect_device,
       "device.connectMany": self._connect_many_devices,
       "device.disconnect": self._disconnect_device,
@@ -47,15 +99,38 @@ class WorkerRuntime:
 
   async def handle_line(self, line: bytes | str) -> dict[str, Any]:
     try:
-      request = parse_request_line(line)
-      return await self._dispatch(request)
+      request = self.codec.decode_request(line)
     except ProtocolError as error:
       return error_response(error.request_id, error.code, error.message)
+    return await self.handle_request(request)
+
+  async def handle_request(self, request: WorkerRequest) -> dict[str, Any]:
+    limiter = self._limiters.get(self.concurrency_class(request.method))
+    if limiter is None:
+      return await self._dispatch(request)
+    async with limiter:
+      return await self._dispatch(request)
+
+  @staticmethod
+  def concurrency_class(method: str) -> str:
+    return METHOD_CONCURRENCY.get(method, CONCURRENCY_UNLIMITED)
 
   async def _dispatch(self, request: WorkerRequest) -> dict[str, Any]:
     handler = self._handlers.get(request.method)
     if handler is None:
       return error_response(request.request_id, "METHOD_NOT_FOUND", "Unknown worker method")
+    started_at = time.perf_counter()
+    response = await self._invoke(handler, request)
+    histogram = self.method_latency.get(request.method)
+    if histogram is None:
+      histogram = self.method_latency[request.method] = LatencyHistogram()
+    histogram.record_since(started_at, time.perf_counter())
+    if "error" in response:
+      self.method_errors[request.method] = self.method_errors.get(request.method, 0) + 1
+    return response
+
+  async def _invoke(self, handler: Handler, request: WorkerRequest) -> dict[str, Any]:
+    token = current_request_id.set(request.request_id)
     try:
       result = await handler(request.params)
       return success_response(request.request_id, result)
@@ -68,17 +143,80 @@ class WorkerRuntime:
     except Exception as error:
       print(f"[Worker] Unhandled {request.method} error: {error}", file=sys.stderr)
       return error_response(request.request_id, "WORKER_INTERNAL_ERROR", "Worker command failed")
+    finally:
+      current_request_id.reset(token)
 
   async def _hello(self, params):
-    return {
+    batch_options = parse_counter_batch_options(params.get("counterBatch"))
+    trace_options = parse_trace_options(params.get("trace"))
+    transport = params.get("transport", TRANSPORT_JSONL)
+    if transport not in (TRANSPORT_JSONL, TRANSPORT_BINARY):
+      raise ProtocolError("INVALID_PARAMS", "Unsupported worker transport")
+    if self.counter_batcher is not None:
+      await self.counter_batcher.close()
+      self.counter_batcher = None
+    result = {
       "protocolVersion": 1,
       "platform": self.services.platform,
       "capabilities": await self.services.capabilities(),
     }
+    if batch_options is not None:
+      self.counter_batcher = CounterBatcher(
+        self._send_event, batch_options["latencyMs"], batch_options["maxEvents"]
+      )
+      result["counterBatch"] = batch_options
+    self.tracer = EventTracer(trace_options["stamps"]) if trace_options is not None else None
+    if trace_options is not None:
+      result["trace"] = trace_options
+    if transport != self.codec.name:
+      # The hello response still goes out in the current codec; run_stdio
+      # switches both directions right after writing it.
+      self.requested_codec = create_codec(transport)
+    if "transport" in params:
+      result["transport"] = transport
+    return result
 
   async def _ping(self, params):
     return {"echo": params.get("echo")}
 
+  async def _metrics(self, params):
+    interval_ms = params.get("intervalMs")
+    if "intervalMs" in params:
+      if (
+        isinstance(interval_ms, bool) or not isinstance(interval_ms, int) or
+        interval_ms != 0 and not MIN_METRICS_INTERVAL_MS <= interval_ms <= MAX_METRICS_INTERVAL_MS
+      ):
+        raise ProtocolError("INVALID_PARAMS", "intervalMs is out of range")
+      self.stop_metrics()
+      if interval_ms:
+        self.metrics_task = asyncio.create_task(self._publish_metrics(interval_ms / 1000.0))
+    result = self.metrics_snapshot()
+    if "intervalMs" in params:
+      result["intervalMs"] = interval_ms
+    return result
+
+  def metrics_snapshot(self) -> dict[str, Any]:
+    return {
+      "methods": {
+        method: {**histogram.snapshot(), "errors": self.method_errors.get(method, 0)}
+        for method, histogram in self.method_latency.items()
+      },
+      "connections": self.device_service.metrics() if self.device_service is not None else {},
+      "outputQueue": self.output_queue.stats() if self.output_queue is not None else None,
+      "eventLoopLag": self.loop_lag.snapshot() if self.loop_lag is not None else None,
+      "trace": self.tracer.snapshot() if self.tracer is not None else None,
+    }
+
+  async def _publish_metrics(self, interval: float):
+    while True:
+      await asyncio.sleep(interval)
+      await self._send_event(event_message("system.metrics", self.metrics_snapshot()))
+
+  def stop_metrics(self):
+    if self.metrics_task is not None:
+      self.metrics_task.cancel()
+      self.metrics_task = None
+
   async def _shutdown(self, params):
     await self.close()
     self.should_stop = True
@@ -98,9 +236,32 @@ class WorkerRuntime:
     service = self._devices()
     flush = params.get("flush", False)
     remarks = params.get("remarks", {})
-    if not isinstance(flush, bool) or not isinstance(remarks, dict):
+    stream = params.get("stream", False)
+    if not isinstance(flush, bool) or not isinstance(remarks, dict) or not isinstance(stream, bool):
       raise ProtocolError("INVALID_PARAMS", "Invalid device scan options")
-    return await service.scan(flush=flush, remarks=remarks)
+    if not stream:
+      return await service.scan(flush=flush, remarks=remarks)
+    scan_id = current_request_id.get()
+
+    async def discovered(device):
+      await self._emit_device_event("device.discovered", {**device, "scanId": scan_id})
+
+    result = await service.scan(flush=flush, remarks=remarks, on_device=discovered)
+    return {"scanId": scan_id, "deviceCount": len(result["devices"]), "errors": result["errors"]}
+
+  async def _watch_devices(self, params):
+    service = self._devices()
+    interval_ms = params.get("intervalMs", 1000)
+    remarks = params.get("remarks", {})
+    ble = params.get("ble", False)
+    if (
+      isinstance(interval_ms, bool) or not isinstance(interval_ms, int) or
+      interval_ms != 0 and not MIN_WATCH_INTERVAL_MS <= interval_ms <= MAX_WATCH_INTERVAL_MS
+    ):
+      raise ProtocolError("INVALID_PARAMS", "intervalMs is out of range")
+    if not isinstance(remarks, dict) or not isinstance(ble, bool):
+      raise ProtocolError("INVALID_PARAMS", "Invalid device watch options")
+    return {**await service.watch(interval_ms / 1000.0, remarks, ble), "intervalMs": interval_ms}
 
   async def _connect_device(self, params):
     service = self._devices()
@@ -110,8 +271,23 @@ class WorkerRuntime:
 
   async def _connect_many_devices(self, params):
     connections = params.get("connections")
-    if not isinstance(connections, list) or len(connections) > 32:
+    if not isinstance(connections, list) or len(connections) > MAX_CONNECTIONS:
       raise ProtocolError("INVALID_PARAMS", "connections must be a bounded list")
+    retries = params.get("retries", 0)
+    limits = params.get("limits", {})
+    progress = params.get("progress", False)
+    if isinstance(retries, bool) or not isinstance(retries, int) or not 0 <= retries <= MAX_CONNECT_RETRIES:
+      raise ProtocolError("INVALID_PARAMS", "retries is out of range")
+    if not isinstance(limits, dict) or not isinstance(progress, bool):
+      raise ProtocolError("INVALID_PARAMS", "Invalid connection options")
+    transport_limits = {}
+    for key, value in limits.items():
+      if (
+        key not in ("ble", "usb") or isinstance(value, bool) or not isinstance(value, int) or
+        not 1 <= value <= MAX_CONNECTIONS
+      ):
+        raise ProtocolError("INVALID_PARAMS", "limits must map ble/usb to 1-32")
+      transport_limits[key.upper()] = value
     normalized = []
     connection_ids = set()
     device_ids = set()
@@ -122,10 +298,25 @@ class WorkerRuntime:
       device_id = self._required_id(value, "deviceId")
       if connection_id in connection_ids or device_id in device_ids:
         raise ProtocolError("INVALID_PARAMS", "Connections must use unique ids and devices")
+      priority = value.get("priority", 0)
+      if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ProtocolError("INVALID_PARAMS", "priority must be an integer")
       connection_ids.add(connection_id)
       device_ids.add(device_id)
-      normalized.append({"connectionId": connection_id, "deviceId": device_id})
-    return await self._devices().connect_many(normalized)
+      entry = {"connectionId": connection_id, "deviceId": device_id}
+      if priority:
+        entry["priority"] = priority
+      normalized.append(entry)
+    on_progress = None
+    if progress:
+      request_id = current_request_id.get()
+
+      async def on_progress(result):
+        await self._emit_device_event("device.connectProgress", {**result, "requestId": request_id})
+
+    return await self._devices().connect_many(
+      normalized, retries=retries, limits=transport_limits, on_progress=on_progress,
+    )
 
   async def _disconnect_device(self, params):
     return await self._devices().disconnect(self._required_id(params, "connectionId"))
@@ -151,16 +342,49 @@ class WorkerRuntime:
     return await self._devices().rename_discovered(device_id, name.strip())
 
   async def _disconnect_all_devices(self, params):
-    await self.close()
+    # Match stops send this; the watcher, BLE index and serial engine keep
+    # running for the next connect and are only torn down by close().
+    if self.device_service is not None:
+      await self.device_service.disconnect_all()
+    if self.counter_batcher is not None:
+      await self.counter_batcher.flush()
     return {"disconnected": True}
 
-  async def _emit_device_event(self, event, payload, event_id=None):
+  async def _emit_device_event(self, event, payload, event_id=None, stamps=None):
+    tracer = self.tracer
+    if tracer is None or stamps is None:
+      stamps = trace = None
+    else:
+      stamps = list(stamps)
+      trace = tracer.payload_stamps(stamps)
+    batcher = self.counter_batcher
+    if batcher is not None:
+      if event == "device.counter":
+        await batcher.add(payload, event_id, stamps, trace)
+        return
+      # Keep counters ahead of the status change that follows them.
+      await batcher.flush()
+    message = event_message(event, payload, event_id)
+    if stamps is not None:
+      message[TRACE_KEY] = [stamps]
+      if trace is not None:
+        message["trace"] = trace
+    await self._send_event(message)
+
+  async def _send_event(self, message):
+    traced = message.get(TRACE_KEY)
+    if traced:
+      queued_at = time.perf_counter()
+      for stamps in traced:
+        stamps.append(queued_at)
     if self.event_sink is not None:
-      await self.event_sink(event_message(event, payload, event_id))
+      await self.event_sink(message)
 
   async def close(self):
     if self.device_service is not None:
       await self.device_service.close()
+    if self.counter_batcher is not None:
+      await self.counter_batcher.close()
 
   def _devices(self):
     if self.device_service is None:
@@ -175,28 +399,97 @@ class WorkerRuntime:
     return value
 
 
-async def run_stdio():
-  output_queue = asyncio.Queue()
-  runtime = WorkerRuntime(event_sink=output_queue.put)
+class _CodecSwitch:
+  def __init__(self, codec):
+    self.codec = codec
+
 
-  async def write_output():
+async def run_stdio(platform_name: str | None = None):
+  output_queue = OutputQueue()
+  runtime = WorkerRuntime(create_platform_services(platform_name), event_sink=output_queue.put)
+  runtime.output_queue = output_queue
+  runtime.loop_lag = LoopLagMonitor()
+  runtime.loop_lag.start()
+  stdin = await open_stdin_reader()
+  stdout = await open_stdout_writer()
+
+  async def write_output(codec):
+    traced = []
     while True:
       message = await output_queue.get()
-      if message is None:
-        return
-      sys.stdout.buffer.write(encode_message(message).encode("utf-8"))
-      sys.stdout.buffer.flush()
+      while True:
+        if message is None:
+          await stdout.drain()
+          return
+        if isinstance(message, _CodecSwitch):
+          codec = message.codec
+        else:
+          stamps = message.pop(TRACE_KEY, None)
+          if stamps:
+            traced.extend(stamps)
+          stdout.write(codec.encode(message))
+        try:
+          message = output_queue.get_nowait()
+        except asyncio.QueueEmpty:
+          break
+      await stdout.drain()
+      if traced:
+        written_at = time.perf_counter()
+        tracer = runtime.tracer
+        for stamps in traced:
+          stamps.append(written_at)
+          if tracer is not None:
+            tracer.record(stamps)
+        traced.clear()
 
-  writer = asyncio.create_task(write_output())
+  async def respond(request):
+    await output_queue.put(await runtime.handle_request(request))
+
+  writer = asyncio.create_task(write_output(runtime.codec))
+  in_flight = set()
+  stopped = False
   try:
     while True:
-      line = await asyncio.to_thread(sys.stdin.buffer.readline)
-      if not line:
-        break
-      await output_queue.put(await runtime.handle_line(line))
+      try:
+        line = await runtime.codec.read_request(stdin)
+        if not line:
+          break
+        request = runtime.codec.decode_request(line)
+      except ProtocolError as error:
+        await output_queue.put(error_response(error.request_id, error.code, error.message))
+        continue
+      if runtime.concurrency_class(request.method) != CONCURRENCY_CONTROL:
+        task = asyncio.create_task(respond(request))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        continue
+      await output_queue.put(await runtime.handle_request(request))
+      if runtime.requested_codec is not None:
+        runtime.codec = runtime.requested_codec
+        runtime.requested_codec = None
+        await output_queue.put(_CodecSwitch(runtime.codec))
       if runtime.should_stop:
+        stopped = True
         break
   finally:
+    runtime.stop_metrics()
+    runtime.loop_lag.stop()
+    if in_flight:
+      if stopped:
+        for task in in_flight:
+          task.cancel()
+      await asyncio.gather(*in_flight, return_exceptions=True)
     await runtime.close()
     await output_queue.put(None)
     await writer
+    await close_stdout_writer(stdout)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="FT-Engine local platform worker")
+  parser.add_argument(
+    "--platform", default=os.environ.get("FT_WORKER_PLATFORM") or None,
+    help="platform services to load, e.g. simulated (defaults to the host platform)",
+  )
+  args = parser.parse_args(argv)
+  asyncio.run(run_stdio(args.platform))
@@ -0,0 +1,229 @@
+import os
+import selectors
+import threading
+import time
+
+
+SERIAL_READ_LATENCY = "latency"
+SERIAL_READ_BULK = "bulk"
+SERIAL_READ_SIZE = 128
+
+
+def _read_serial_chunk(ser, mode: str = SERIAL_READ_LATENCY) -> bytes:
+  if mode == SERIAL_READ_BULK:
+    return ser.read(SERIAL_READ_SIZE)
+  # Block for the first byte only, then take whatever the driver already
+  # buffered so a complete frame is parsed without waiting for the timeout.
+  chunk = ser.read(min(max(ser.in_waiting, 1), SERIAL_READ_SIZE))
+  waiting = ser.in_waiting if chunk else 0
+  if waiting:
+    chunk += ser.read(min(waiting, SERIAL_READ_SIZE))
+  return chunk
+
+
+def _selectable_fileno(handle):
+  if os.name == "nt":
+    return None
+  fileno = getattr(handle, "fileno", None)
+  if fileno is None:
+    return None
+  try:
+    return fileno()
+  except Exception:
+    return None
+
+
+class _Channel:
+  __slots__ = ("handle", "fd", "on_data", "on_error", "read_mode", "lock", "thread")
+
+  def __init__(self, handle, fd, on_data, on_error, read_mode):
+    self.handle = handle
+    self.fd = fd
+    self.on_data = on_data
+    self.on_error = on_error
+    self.read_mode = read_mode
+    self.lock = threading.Lock()
+    self.thread = None
+
+
+# Reads every open serial port from one selector thread. Ports without a
+# selectable file descriptor (Windows COM handles, test doubles) fall back to a
+# dedicated blocking reader thread per port.
+class SerialIoEngine:
+  def __init__(self, name="ft-worker-serial-io"):
+    self.name = name
+    self._lock = threading.Lock()
+    self._channels = {}
+    self._pending = []
+    self._selector = None
+    self._thread = None
+    self._wake_read = None
+    self._wake_write = None
+    self._stopping = False
+
+  @property
+  def selected_count(self) -> int:
+    with self._lock:
+      return sum(1 for channel in self._channels.values() if channel.fd is not None)
+
+  def register(self, handle, on_data, on_error, read_mode=SERIAL_READ_LATENCY):
+    channel = _Channel(handle, _selectable_fileno(handle), on_data, on_error, read_mode)
+    with self._lock:
+      if id(handle) in self._channels:
+        raise ValueError("Serial handle is already registered")
+      self._channels[id(handle)] = channel
+    if channel.fd is None:
+      channel.thread = threading.Thread(
+        target=self._thread_reader, args=(channel,), name=f"{self.name}-port", daemon=True,
+      )
+      channel.thread.start()
+      return
+    self._submit("register", channel).wait(1.0)
+
+  def unregister(self, handle, timeout: float = 1.0):
+    with self._lock:
+      channel = self._channels.pop(id(handle), None)
+    if channel is None:
+      return
+    if channel.fd is None:
+      # Taking the lock waits out an in-flight read on the fallback thread.
+      with channel.lock:
+        pass
+      if channel.thread and channel.thread is not threading.current_thread():
+        channel.thread.join(timeout)
+      return
+    if threading.current_thread() is self._thread:
+      self._apply("unregister", channel)
+      return
+    self._submit("unregister", channel).wait(timeout)
+
+  def close(self, timeout: float = 1.0):
+    with self._lock:
+      channels = list(self._channels.values())
+      self._channels.clear()
+      thread = self._thread
+      self._stopping = True
+    if thread is not None:
+      self._wake()
+      if thread is not threading.current_thread():
+        thread.join(timeout)
+    for channel in channels:
+      if channel.thread is not None and channel.thread is not threading.current_thread():
+        channel.thread.join(timeout)
+
+  def _submit(self, operation, channel):
+    done = threading.Event()
+    with self._lock:
+      self._pending.append((operation, channel, done))
+      self._ensure_thread()
+    self._wake()
+    return done
+
+  def _ensure_thread(self):
+    self._stopping = False
+    if self._thread is not None and self._thread.is_alive():
+      return
+    self._selector = selectors.DefaultSelector()
+    self._wake_read, self._wake_write = os.pipe()
+    os.set_blocking(self._wake_read, False)
+    os.set_blocking(self._wake_write, False)
+    self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+    self._thread = threading.Thread(target=self._select_loop, name=self.name, daemon=True)
+    self._thread.start()
+
+  def _wake(self):
+    with self._lock:
+      if self._wake_write is None:
+        return
+      try:
+        os.write(self._wake_write, b"\0")
+      except OSError:
+        pass
+
+  def _apply(self, operation, channel):
+    selector = self._selector
+    key = selector.get_map().get(channel.fd)
+    try:
+      if operation == "register":
+        with self._lock:
+          active = self._channels.get(id(channel.handle)) is channel
+        if active and key is None:
+          selector.register(channel.fd, selectors.EVENT_READ, channel)
+      elif key is not None and key.data is channel:
+        selector.unregister(channel.fd)
+    except (KeyError, ValueError, OSError):
+      pass
+
+  def _drain_pending(self):
+    with self._lock:
+      pending = self._pending
+      self._pending = []
+    for operation, channel, done in pending:
+      self._apply(operation, channel)
+      done.set()
+
+  def _select_loop(self):
+    selector = self._selector
+    wake_read = self._wake_read
+    try:
+      while True:
+        self._drain_pending()
+        if self._stopping:
+          return
+        for key, _events in selector.select():
+          if key.data is None:
+            try:
+              while os.read(wake_read, 512):
+                pass
+            except (BlockingIOError, OSError):
+              pass
+            continue
+          self._read_ready(key.data)
+    finally:
+      with self._lock:
+        wake_write = self._wake_write
+        self._thread = None
+        self._selector = None
+        self._wake_read = self._wake_write = None
+        os.close(wake_write)
+        if self._pending:
+          # Work submitted while this thread was stopping runs on a fresh one.
+          self._ensure_thread()
+      selector.close()
+      os.close(wake_read)
+
+  def _read_ready(self, channel):
+    try:
+      # The port is readable, so only read what is buffered: a bulk read
+      # waits for the full size or the timeout and would stall every port.
+      chunk = _read_serial_chunk(channel.handle)
+    except Exception as error:
+      self._drop(channel)
+      channel.on_error(error)
+      return
+    if chunk:
+      channel.on_data(chunk, time.perf_counter())
+
+  def _drop(self, channel):
+    with self._lock:
+      if self._channels.get(id(channel.handle)) is channel:
+        del self._channels[id(channel.handle)]
+    self._apply("unregister", channel)
+
+  def _thread_reader(self, channel):
+    try:
+      while True:
+        with self._lock:
+          if self._channels.get(id(channel.handle)) is not channel:
+            return
+        with channel.lock:
+          chunk = _read_serial_chunk(channel.handle, channel.read_mode)
+        if chunk:
+          channel.on_data(chunk, time.perf_counter())
+    except Exception as error:
+      with self._lock:
+        active = self._channels.get(id(channel.handle)) is channel
+        if active:
+          del self._channels[id(channel.handle)]
+      if active:
+        channel.on_error(error)
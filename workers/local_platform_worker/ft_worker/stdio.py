@@ -0,0 +1,92 @@
+import asyncio
+import os
+import sys
+import threading
+
+from .protocol import MAX_LINE_BYTES
+
+
+STDIN_CHUNK_SIZE = 64 * 1024
+
+
+# Anonymous pipes handed to the worker on Windows are not opened for
+# overlapped I/O, so the proactor loop cannot attach to them. There a thread
+# feeds the same StreamReader and stdout is written synchronously.
+def _native_pipes_supported() -> bool:
+  return os.name != "nt"
+
+
+async def open_stdin_reader(stream=None) -> asyncio.StreamReader:
+  loop = asyncio.get_running_loop()
+  stream = stream or sys.stdin.buffer
+  reader = asyncio.StreamReader(limit=MAX_LINE_BYTES + 1)
+  if _native_pipes_supported():
+    try:
+      await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), stream)
+      return reader
+    except (NotImplementedError, OSError, ValueError):
+      pass
+  _feed_from_thread(loop, reader, stream)
+  return reader
+
+
+def _feed_from_thread(loop, reader, stream):
+  read = getattr(stream, "read1", stream.read)
+
+  def pump():
+    try:
+      while True:
+        chunk = read(STDIN_CHUNK_SIZE)
+        if not chunk:
+          return
+        loop.call_soon_threadsafe(reader.feed_data, chunk)
+    except (OSError, ValueError):
+      return
+    finally:
+      try:
+        loop.call_soon_threadsafe(reader.feed_eof)
+      except RuntimeError:
+        pass
+
+  threading.Thread(target=pump, name="ft-worker-stdin", daemon=True).start()
+
+
+class BlockingStreamWriter:
+  def __init__(self, stream):
+    self.stream = stream
+
+  def write(self, data: bytes):
+    self.stream.write(data)
+
+  async def drain(self):
+    self.stream.flush()
+
+  def close(self):
+    try:
+      self.stream.flush()
+    except (OSError, ValueError):
+      pass
+
+
+async def open_stdout_writer(stream=None):
+  loop = asyncio.get_running_loop()
+  stream = stream or sys.stdout.buffer
+  if _native_pipes_supported():
+    try:
+      transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, stream)
+      return asyncio.StreamWriter(transport, protocol, None, loop)
+    except (NotImplementedError, OSError, ValueError):
+      pass
+  return BlockingStreamWriter(stream)
+
+
+async def close_stdout_writer(writer):
+  transport = getattr(writer, "transport", None)
+  if transport is not None and not transport.is_closing():
+    # A zero high-water mark makes drain() wait until the pipe took everything.
+    transport.set_write_buffer_limits(high=0)
+    try:
+      await writer.drain()
+    except (ConnectionError, OSError):
+      pass
+  writer.close()
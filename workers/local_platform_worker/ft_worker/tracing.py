@@ -0,0 +1,51 @@
+from .metrics import LatencyHistogram
+from .protocol import ProtocolError
+
+
+# Host perf_counter stamps taken along a counter event's path. Sessions supply
+# the first three; the runtime adds "queued" when the event (or its batch)
+# enters the output queue and the writer adds "written" after the drain.
+TRACE_STAGES = ("received", "dispatched", "emitted", "queued", "written")
+TRACE_SPANS = ("threadHop", "taskStart", "batching", "output")
+# Private message key holding the stamp lists; the writer pops it before encoding.
+TRACE_KEY = "_traceStamps"
+
+
+def parse_trace_options(value) -> dict | None:
+  if value is None or value is False:
+    return None
+  if value is True:
+    value = {}
+  if not isinstance(value, dict):
+    raise ProtocolError("INVALID_PARAMS", "trace must be an object")
+  stamps = value.get("stamps", False)
+  if not isinstance(stamps, bool):
+    raise ProtocolError("INVALID_PARAMS", "trace.stamps must be a boolean")
+  return {"stamps": stamps}
+
+
+class EventTracer:
+  def __init__(self, stamps_in_payload: bool = False):
+    self.stamps_in_payload = stamps_in_payload
+    self.spans = {name: LatencyHistogram() for name in TRACE_SPANS}
+    self.total = LatencyHistogram()
+
+  def payload_stamps(self, stamps) -> dict | None:
+    if not self.stamps_in_payload:
+      return None
+    return {
+      f"{stage}Ms": round(stamp * 1000.0, 3)
+      for stage, stamp in zip(TRACE_STAGES, stamps)
+    }
+
+  def record(self, stamps):
+    if len(stamps) != len(TRACE_STAGES):
+      return
+    for name, started_at, finished_at in zip(TRACE_SPANS, stamps, stamps[1:]):
+      self.spans[name].record_since(started_at, finished_at)
+    self.total.record_since(stamps[0], stamps[-1])
+
+  def snapshot(self) -> dict:
+    result = {name: histogram.snapshot() for name, histogram in self.spans.items()}
+    result["total"] = self.total.snapshot()
+    return result
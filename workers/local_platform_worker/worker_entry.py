@@ -1,7 +1,5 @@
-import asyncio
-
-from workers.local_platform_worker.ft_worker.runtime import run_stdio
+from workers.local_platform_worker.ft_worker.runtime import main
 
 
 if __name__ == "__main__":
-  asyncio.run(run_stdio())
+  main()